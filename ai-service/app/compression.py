@@ -0,0 +1,129 @@
+import asyncio
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import HTTP_COMPRESSION_BYTES
+
+try:
+    import brotli
+except ImportError:  # Brotli opsiyonel: yoksa sadece gzip sunulur
+    brotli = None
+
+# Sıkıştırılacak içerik tipleri (text/event-stream hiçbir zaman: stream parça parça gider)
+_COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html")
+
+# Bu boyuttan büyük gövdeler event loop'u bloklamamak için thread'de sıkıştırılır
+_THREAD_MIN_BYTES = 256 * 1024
+
+
+def negotiate_encoding(accept_encoding: str, brotli_available: bool) -> Optional[str]:
+    """
+    Accept-Encoding'e göre kullanılacak encoding: br | gzip | None
+
+    q değerleri dikkate alınır (q=0 reddedilmiş demektir); eşitlikte br tercih edilir.
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    wildcard = weights.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli_available else ["gzip"]
+    best, best_weight = None, 0.0
+    for encoding in candidates:
+        weight = weights.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Tek parça (streaming olmayan) yanıtları istemcinin kabul ettiği encoding'le sıkıştırır
+
+    Starlette'in GZipMiddleware'inden farkları: brotli desteği, streaming yanıtların
+    (SSE) hiç sıkıştırılmaması (event'ler gecikmeden gider) ve büyük gövdelerin
+    thread'de sıkıştırılması.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), brotli is not None)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                # Gövde görülene kadar header'lar bekletilir
+                start_message = message
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(_COMPRESSIBLE_TYPES)
+                or len(body) < self.minimum_size
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if len(body) >= _THREAD_MIN_BYTES:
+                compressed = await asyncio.to_thread(self._compress, body, encoding)
+            else:
+                compressed = self._compress(body, encoding)
+            HTTP_COMPRESSION_BYTES.inc(len(body), encoding=encoding, stage="original")
+            HTTP_COMPRESSION_BYTES.inc(len(compressed), encoding=encoding, stage="compressed")
+
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
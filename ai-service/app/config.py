@@ -9,9 +9,123 @@ class Settings(BaseSettings):
     Pydantic validation ile tip kontrolü yapar
     """
     
+    # LLM Backend
+    llm_backend: str = "gemini"  # gemini | fake (ağsız test / benchmark)
+    
     # Gemini API
-    gemini_api_key: str
+    gemini_api_key: str = ""  # llm_backend=gemini iken zorunlu
     gemini_model: str = "gemini-2.0-flash-exp"
+    gemini_fast_model: str = ""  # Boşsa fast backend yok (varsayılan model yavaşlayınca kullanılır)
+    gemini_strong_model: str = ""  # Boşsa strong backend yok (uzun metin / yüksek seviye)
+    gemini_max_concurrency: int = 32  # Aynı anda Gemini'de bekleyen en fazla istek (worker başına)
+    # Statik prompt kısmının gönderilme şekli:
+    #   inline             - her istekte tam prompt (eski davranış)
+    #   system_instruction - statik kısım seviye başına model'in system instruction'ı
+    #   cached_content     - statik kısım Gemini context cache'inde, istekte sadece kullanıcı metni
+    # SDK desteklemiyorsa bir alt moda düşülür
+    gemini_prompt_mode: str = "system_instruction"
+    gemini_context_cache_ttl_seconds: int = 60 * 60  # 1 saat
+    # JSON çıktıyı response_mime_type + RewriteResponse'tan üretilen response_schema ile iste
+    gemini_structured_output: bool = True
+    
+    # Admission Control (gemini_max_concurrency üst sınır)
+    admission_min_limit: int = 1
+    admission_initial_limit: int = 0  # 0 = gemini_max_concurrency'den başla
+    admission_latency_target_ms: float = 10000  # Üstündeki gecikmelerde limit düşürülür
+    admission_backoff_ratio: float = 0.9  # Düşüşte limit bu oranla çarpılır
+    admission_max_queue: int = 64  # Slot bekleyebilecek en fazla istek, fazlası 429
+    admission_queue_timeout_seconds: float = 30  # Kuyrukta bundan uzun bekleyen 429 alır
+    # Kuyruk kullanıcı başına adil, sınıflar (interactive / batch) ağırlıkları oranında pay alır
+    admission_fair_queue_enabled: bool = True  # false: geliş sırası (FIFO)
+    admission_interactive_weight: float = 4.0
+    admission_batch_weight: float = 1.0
+    admission_cost_chars: int = 2000  # Maliyet birimi: bundan uzun metinler orantılı olarak daha çok sıra harcar
+    
+    # Gemini Quota (RPM / TPM; 0 = sınırsız). Değerler proje kotasıdır, worker'lar arasında bölünür
+    gemini_quota_rpm: int = 0
+    gemini_quota_tpm: int = 0
+    gemini_quota_headroom: float = 0.97  # Herhangi bir dakikada kotanın bu oranı aşılmaz
+    gemini_quota_burst_seconds: float = 2.0  # Boştayken biriken en fazla kota (saniye cinsinden)
+    gemini_quota_max_wait_seconds: float = 20  # Kota bundan uzun süre açılmayacaksa 429
+    gemini_quota_output_tokens: int = 500  # Çıktı tahmininin sabit kısmı (metne orantılı kısım gerçek kullanımdan öğrenilir)
+    
+    # Resilience (deadline / retry / hedging / circuit breaker)
+    resilience_attempt_timeout_seconds: float = 45  # Tek bir Gemini denemesinin süresi
+    # İsteğin tüm denemeleri (backoff dahil) için toplam süre; backend'in AI_SERVICE_TIMEOUT_MS'inden (60 sn) kısa olmalı
+    resilience_total_timeout_seconds: float = 55
+    resilience_max_attempts: int = 3  # Geçici hata / bozuk yanıtta toplam deneme
+    resilience_backoff_base_ms: float = 250  # Denemeler arası jitter'lı üstel bekleme
+    resilience_backoff_max_ms: float = 4000
+    resilience_hedge_enabled: bool = False  # p95'i aşan isteğe ikinci istek gönder
+    resilience_hedge_min_delay_ms: float = 1000
+    circuit_failure_threshold: int = 5  # Art arda bu kadar hatada devre açılır
+    circuit_recovery_seconds: float = 30  # Açık devre bu süre sonra tek istekle denenir
+    
+    # Model Routing
+    router_long_text_chars: int = 4000  # Bu uzunluktan itibaren strong model
+    router_strong_min_level: int = 9  # Bu seviyeden itibaren strong model
+    router_max_p95_ms: float = 15000  # Üstündeyse backend sağlıksız sayılır
+    router_max_error_rate: float = 0.5
+    router_min_samples: int = 20  # Sağlık kararı için gereken en az kayıt
+    router_window_seconds: int = 300
+    
+    # Fake Backend (llm_backend=fake)
+    fake_latency_ms: float = 800
+    fake_latency_jitter_ms: float = 200
+    fake_failure_rate: float = 0.0
+    fake_malformed_rate: float = 0.0
+    
+    # Rewrite Cache
+    rewrite_cache_enabled: bool = True
+    rewrite_cache_max_entries: int = 1024
+    rewrite_cache_max_bytes: int = 32 * 1024 * 1024  # 32 MB
+    rewrite_cache_ttl_seconds: int = 24 * 60 * 60  # 1 gün
+    rewrite_cache_shared_enabled: bool = True  # Worker'lar arası SQLite cache (L2)
+    rewrite_cache_shared_path: str = ""  # Boşsa sistem temp dizini
+    rewrite_cache_shared_max_bytes: int = 256 * 1024 * 1024  # 256 MB
+    
+    # Long Text Chunking
+    chunking_enabled: bool = True
+    chunking_min_chars: int = 3000  # Bu uzunluktan itibaren metin parçalara bölünür
+    chunking_target_chars: int = 1500  # Parça başına en fazla karakter
+    
+    # Lexicon (new_words süzme ve kelime istatistikleri)
+    lexicon_enabled: bool = True
+    lexicon_path: str = ""  # Boşsa app/data/lexicon.bin (yoksa seed listesinden oluşturulur)
+    lexicon_min_new_word_rank: int = 1000  # Frekans sırası bundan küçük new_words atılır (A1-A2)
+    # Seed listesi ~1000 kelime (sadece A1-A2); bandlar tam frekans listesiyle (>= 8000 kelime) anlamlı
+    lexicon_stats_enabled: bool = False
+    
+    # Alignment (orijinal / yeniden yazılmış metin diff'i ve düzeltme konumları)
+    rewrite_alignment_enabled: bool = True
+    
+    # Idempotency (/rewrite Idempotency-Key header'ı)
+    idempotency_enabled: bool = True
+    idempotency_path: str = ""  # Boşsa sistem temp dizini (worker'lar arası SQLite)
+    idempotency_ttl_seconds: int = 24 * 60 * 60  # Başarılı yanıtın tekrar döndürüleceği süre
+    # Eşzamanlı tekrarın orijinali bekleyeceği en uzun süre; 0 = resilience_total_timeout_seconds
+    # (tekrar isteği de backend'in timeout'undan önce cevap alır)
+    idempotency_wait_seconds: float = 0
+    # Sahibi bu süre içinde bitirmezse key yeniden sahiplenilebilir; 0 = isteğin en uzun süresi
+    # (admission kuyruğu + kota beklemesi + resilience_total_timeout_seconds)
+    idempotency_lease_seconds: float = 0
+
+    # Rewrite Jobs (POST /rewrite/jobs)
+    jobs_enabled: bool = True
+    jobs_path: str = ""  # Boşsa sistem temp dizini; production'da restart'tan sağ çıkan volume
+    jobs_workers: int = 4  # Process başına kuyruğu boşaltan worker sayısı
+    jobs_max_queued: int = 10000  # Kuyruk doluysa POST 429 döner
+    jobs_max_attempts: int = 5  # Geçici hatalarda (429 / 503 / 504) iş en fazla bu kadar çalıştırılır
+    jobs_lease_seconds: float = 300  # Çalışan iş bu sürede bitmezse (process çöktü) tekrar alınır
+    jobs_result_ttl_seconds: int = 24 * 60 * 60  # Bitmiş işlerin saklanma süresi
+    jobs_max_wait_seconds: float = 60  # GET ?wait= long-poll üst sınırı
+
+    # Multi-Level Rewrite (POST /rewrite/levels)
+    levels_combined_enabled: bool = True  # false: her seviye ayrı Gemini çağrısı
+    
+    # Batch Rewrite
+    batch_max_items: int = 500
+    batch_max_parallelism: int = 8  # Bir batch isteğinin aynı anda işleyeceği en fazla öğe
     
     # App Config
     environment: str = "development"
@@ -20,6 +134,23 @@ class Settings(BaseSettings):
     # API Config
     api_host: str = "0.0.0.0"
     api_port: int = 8001
+    workers: int = 0  # 0: kullanılabilir CPU sayısı (app.serve); limiter/kuyruk ayarları worker başınadır
+    workers_max: int = 8
+
+    # Metrics (çok worker'lı çalışmada /metrics tüm worker'ların toplamını verir)
+    metrics_multiproc_dir: str = ""  # Boşsa ve WORKERS>1 ise app.serve geçici bir dizin seçer
+    metrics_flush_seconds: float = 5  # Worker'ların metrik snapshot'ını dizine yazma aralığı
+
+    # Response Compression
+    compression_enabled: bool = True  # Accept-Encoding'e göre br / gzip (streaming yanıtlar hariç)
+    compression_min_bytes: int = 1024  # Bundan küçük gövdeler sıkıştırılmaz
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4  # 0-11; dinamik içerik için hız / oran dengesi
+
+    # Startup / Readiness
+    warmup_enabled: bool = True  # Açılışta SDK'yı yükle; /ready bitene kadar 503 döner
+    warmup_probe_enabled: bool = False  # Warm-up'ta backend'e count_tokens çağrısı da yap (bağlantıyı açar)
+    warmup_timeout_seconds: float = 30
     
     class Config:
         env_file = ".env"
@@ -1,8 +1,45 @@
-from fastapi import FastAPI, HTTPException
-from app.models import RewriteRequest, RewriteResponse
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from app.compression import CompressionMiddleware
+from app.config import get_settings
+from app.metrics import (
+    REGISTRY,
+    REWRITE_REQUESTS,
+    REWRITE_REQUEST_SECONDS,
+    REWRITE_STAGE_SECONDS,
+    LLM_IN_FLIGHT,
+)
+from app.models import (
+    RewriteRequest,
+    RewriteResponse,
+    BatchRewriteRequest,
+    BatchRewriteItemResult,
+    BatchRewriteResponse,
+    MultiLevelRewriteRequest,
+    MultiLevelRewriteResponse,
+    RewriteJob,
+)
+from app.responses import FastJSONResponse, dumps
+from app.services.admission import AdmissionRejected
+from app.services.idempotency import (
+    IdempotencyConflict,
+    IdempotencyInProgress,
+    IdempotencyManager,
+    IdempotencyStore,
+    StoredResponse,
+    default_idempotency_path,
+    request_fingerprint,
+)
+from app.services.job_queue import JobQueueFull, JobRunner, JobStore, default_job_queue_path, job_payload
+from app.services.resilience import CircuitOpenError
 from app.services.gemini_service import GeminiService
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import logging
 import os
+import time
+from typing import Any, Dict, Optional, Union
 
 # Logging setup
 logging.basicConfig(
@@ -10,14 +47,129 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+logger = logging.getLogger(__name__)
+
+_settings = get_settings()
+
+# Service instance (singleton). Backend SDK'ları burada yüklenmez; açılıştaki
+# warm-up'ta veya ilk istekte yüklenir, böylece /health import'tan hemen sonra cevap verir
+gemini_service = GeminiService()
+LLM_IN_FLIGHT.set_function(lambda: gemini_service.in_flight)
+
+# Idempotency-Key'li /rewrite isteklerinin kayıtlı yanıtları (worker'lar arası paylaşılır)
+idempotency: Optional[IdempotencyManager] = None
+if _settings.idempotency_enabled:
+    idempotency = IdempotencyManager(
+        IdempotencyStore(
+            path=_settings.idempotency_path or default_idempotency_path(),
+            ttl_seconds=_settings.idempotency_ttl_seconds,
+            lease_seconds=_settings.idempotency_lease_seconds or (
+                _settings.admission_queue_timeout_seconds
+                + _settings.gemini_quota_max_wait_seconds
+                + _settings.resilience_total_timeout_seconds
+            ),
+        ),
+        wait_timeout=_settings.idempotency_wait_seconds or _settings.resilience_total_timeout_seconds,
+    )
+
+# POST /rewrite/jobs işlerini kalıcı kuyruktan işleyen arka plan worker'ları
+job_runner: Optional[JobRunner] = None
+if _settings.jobs_enabled:
+    job_runner = JobRunner(
+        JobStore(
+            path=_settings.jobs_path or default_job_queue_path(),
+            lease_seconds=_settings.jobs_lease_seconds,
+            result_ttl_seconds=_settings.jobs_result_ttl_seconds,
+        ),
+        process=gemini_service.rewrite_text_async,
+        concurrency=_settings.jobs_workers,
+        max_queued=_settings.jobs_max_queued,
+        max_attempts=_settings.jobs_max_attempts,
+    )
+
+# /ready durumu: warm-up bitene kadar "starting"
+readiness = {"status": "starting", "warmup_ms": None, "error": None}
+
+
+async def _warm_up(probe: bool, timeout: float) -> None:
+    """Backend'leri hazırlar; hata olursa loglanır ve ilk istek hazırlığı kendisi yapar"""
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(gemini_service.warm_up(probe=probe), timeout=timeout)
+        logger.info(f"Warm-up completed in {(time.perf_counter() - started) * 1000:.0f} ms")
+    except asyncio.TimeoutError:
+        readiness["error"] = f"Warm-up {timeout:g} saniyede tamamlanmadı"
+        logger.warning(readiness["error"])
+    except Exception as e:
+        readiness["error"] = str(e) or type(e).__name__
+        logger.warning(f"Warm-up failed: {readiness['error']}")
+    readiness["warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    readiness["status"] = "ready"
+
+
+async def _flush_metrics(directory: str, interval: float) -> None:
+    """Worker'ın metriklerini periyodik olarak paylaşılan dizine yazar (/metrics birleştirir)"""
+    while True:
+        try:
+            REGISTRY.write_snapshot(directory)
+        except OSError as e:
+            logger.warning(f"Metrics snapshot could not be written: {e}")
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    metrics_flush = None
+    if settings.metrics_multiproc_dir:
+        metrics_flush = asyncio.create_task(
+            _flush_metrics(settings.metrics_multiproc_dir, settings.metrics_flush_seconds)
+        )
+    warm_up = None
+    if settings.warmup_enabled:
+        # Arka planda: uygulama hemen istek almaya (ve /health'e cevap vermeye) başlar
+        warm_up = asyncio.create_task(
+            _warm_up(settings.warmup_probe_enabled, settings.warmup_timeout_seconds)
+        )
+    else:
+        readiness["status"] = "ready"
+    if job_runner is not None:
+        job_runner.start()
+    yield
+    if warm_up is not None:
+        warm_up.cancel()
+    if job_runner is not None:
+        # Çalışan işler kuyruğa geri bırakılır; yeni process'te kaldığı yerden devam eder
+        await job_runner.stop()
+    if metrics_flush is not None:
+        metrics_flush.cancel()
+        try:
+            REGISTRY.write_snapshot(settings.metrics_multiproc_dir)
+        except OSError:
+            pass
+
+
 app = FastAPI(
     title="Letter to Stars - AI Service",
     description="IELTS text rewriting service",
-    version="1.0.1"
+    version="1.0.1",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
-# Service instance (singleton)
-gemini_service = GeminiService()
+if _settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=_settings.compression_min_bytes,
+        gzip_level=_settings.compression_gzip_level,
+        brotli_quality=_settings.compression_brotli_quality,
+    )
+
+
+def _observe_request(endpoint: str, ielts_level: Union[int, str], outcome: str, started: float) -> None:
+    """İstek sayacını ve uçtan uca süre histogramını günceller (/rewrite/levels'ta seviyeler "6-8" gibi)"""
+    REWRITE_REQUESTS.inc(endpoint=endpoint, ielts_level=ielts_level, outcome=outcome)
+    REWRITE_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
 
 
 @app.get("/health")
@@ -26,11 +178,55 @@ async def health_check():
     return {
         "status": "ai-service ok",
         "service": "letter-to-stars-ai",
-        "version": os.getenv("APP_VERSION", "dev")
+        "version": os.getenv("APP_VERSION", "dev"),
+        "gemini_in_flight": gemini_service.in_flight
     }
 
+@app.get("/ready")
+async def ready():
+    """Readiness: warm-up (SDK yüklemesi, opsiyonel bağlantı probe'u) bitene kadar 503"""
+    status_code = 200 if readiness["status"] == "ready" else 503
+    return FastJSONResponse(status_code=status_code, content=readiness)
+
+@app.get("/stats")
+async def stats():
+    """Rewrite cache hit/miss ve birleştirilen (coalesced) istek sayaçları"""
+    cache = gemini_service.cache
+    return FastJSONResponse({
+        "cache": {"enabled": True, **cache.stats()} if cache is not None else {"enabled": False},
+        "shared_cache": (
+            {"enabled": True, **gemini_service.shared_cache.stats()}
+            if gemini_service.shared_cache is not None else {"enabled": False}
+        ),
+        "singleflight": gemini_service.singleflight.stats(),
+        "router": gemini_service.router.stats(),
+        "admission": gemini_service.limiter.stats(),
+        "circuit": {name: policy.breaker.stats() for name, policy in gemini_service.policies.items()},
+        "quota": {model: quota.stats() for model, quota in gemini_service.quotas.items()},
+        "jobs": {"enabled": True, **job_runner.stats()} if job_runner is not None else {"enabled": False},
+        "idempotency": (
+            {"enabled": True, **idempotency.stats()} if idempotency is not None else {"enabled": False}
+        ),
+    })
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus formatında metrikler (aşama süreleri, istek sayıları, token kullanımı)"""
+    directory = _settings.metrics_multiproc_dir
+    if directory:
+        # Çok worker: bu worker'ın güncel değerleri + diğerlerinin son snapshot'ı
+        REGISTRY.write_snapshot(directory)
+        body = REGISTRY.render_multiprocess(directory)
+    else:
+        body = REGISTRY.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/rewrite", response_model=RewriteResponse)
-async def rewrite_text(request: RewriteRequest):
+async def rewrite_text(
+    request: RewriteRequest,
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    x_user_id: Optional[str] = Header(default=None, max_length=128),
+):
     """
     Kullanıcının metnini IELTS seviyesine göre yeniden yazar. 
     Kullanıcının metnindeki grammar hatalarını düzeltilir.
@@ -38,30 +234,328 @@ async def rewrite_text(request: RewriteRequest):
     Kullanıcının metnindeki yazma ipuçları önerilir.
     Kullanıcının metnindeki güçlü yönleri ve zayıf yönleri analiz edilir.
     Kullanıcının metnindeki genel değerlendirme önerilir.
+    
+    Idempotency-Key header'ı verilirse başarılı yanıt IDEMPOTENCY_TTL_SECONDS boyunca
+    saklanır; aynı key'le tekrar gelen istek (timeout sonrası yeniden deneme) kayıtlı
+    yanıtı alır, eşzamanlı tekrar orijinal isteği bekler. Key farklı bir gövdeyle
+    kullanılırsa 422, orijinal istek bekleme süresinde bitmezse 409 döner.
+    
+    X-User-Id header'ı Gemini kuyruğunda kullanıcılar arası adil sıra için kullanılır
+    (yoksa istek anonim sayılır).
     """
+    caller = _caller(x_user_id, "interactive")
+    if idempotency_key is None or idempotency is None:
+        return await _rewrite(request, caller)
+    
+    async def work() -> StoredResponse:
+        response = await _rewrite(request, caller)
+        return StoredResponse(response.status_code, response.body)
+    
+    return await _run_idempotent("rewrite", idempotency_key, request, work)
+
+
+def _caller(user_id: Optional[str], priority_class: str) -> Dict[str, Any]:
+    """Gemini kuyruğunda sıra için istek sahibi: kullanıcı (X-User-Id) ve sınıf (interactive | batch)"""
+    return {"user": user_id, "class": priority_class}
+
+
+async def _run_idempotent(endpoint: str, key: str, request: RewriteRequest, work) -> Response:
+    """work'ü Idempotency-Key ile bir kere çalıştırır; tekrarlarda kayıtlı yanıtı döndürür"""
+    started = time.perf_counter()
     try:
-        # AI servisini çağır
-        result = gemini_service.rewrite_text(
+        # Endpoint'ler key alanlarını paylaşmaz (aynı key /rewrite ve /rewrite/jobs'ta çakışmasın)
+        stored, replayed = await idempotency.execute(
+            f"{endpoint}:{key}", request_fingerprint(request.model_dump_json()), work
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    headers = None
+    if replayed:
+        _observe_request(endpoint, request.ielts_level, "replayed", started)
+        headers = {"Idempotent-Replayed": "true"}
+    return Response(content=stored.body, status_code=stored.status_code,
+                    media_type="application/json", headers=headers)
+
+
+async def _rewrite(request: RewriteRequest, caller: Dict[str, Any]) -> Response:
+    """/rewrite'ın asıl işi: doğrulanmış sonucu serialize eder, hataları HTTPException'a çevirir"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        # AI servisini çağır (event loop'u bloklamadan)
+        # Servis doğrulanmış RewriteResponse döndürür
+        result = await gemini_service.rewrite_text_async(
             user_text=request.user_text,
-            ielts_level=request.ielts_level
+            ielts_level=request.ielts_level,
+            caller=caller
         )
         
-        # Response model'e dönüştür
-        return RewriteResponse(
-            original_text=request.user_text,
-            rewritten_text=result["rewritten_text"],
-            new_words=result["new_words"],
-            writing_tips=result["writing_tips"],
-            strengths=result["strengths"],
-            weaknesses=result["weaknesses"],
-            overall_feedback=result["overall_feedback"],
-            ielts_level=request.ielts_level
-        )
+        # Zaten doğrulanmış modeli doğrudan serialize et (response_model ile tekrar doğrulanmaz)
+        with REWRITE_STAGE_SECONDS.time(stage="serialization"):
+            response = FastJSONResponse(result)
+        outcome = "ok"
+        return response
         
+    except AdmissionRejected as e:
+        outcome = "rejected"
+        raise _too_many_requests(e)
+    except CircuitOpenError as e:
+        outcome = "unavailable"
+        raise _service_unavailable(e)
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        raise HTTPException(status_code=504, detail="AI servisi zamanında yanıt vermedi")
     except ValueError as e:
+        outcome = "parse_error"
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        _observe_request("rewrite", request.ielts_level, outcome, started)
+
+
+@app.post("/rewrite/jobs", response_model=RewriteJob, status_code=202)
+async def create_rewrite_job(
+    request: RewriteRequest,
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    x_user_id: Optional[str] = Header(default=None, max_length=128),
+):
+    """
+    Metni arka planda dönüştürülmek üzere kalıcı kuyruğa ekler ve iş kimliğini hemen döner (202).
+    Sonuç GET /rewrite/jobs/{id} ile (istenirse ?wait= ile bitene kadar bekleyerek) alınır.
+    Geçici hatalarda (yoğunluk, devre açık, timeout) iş kuyrukta bekletilip tekrar denenir.
+    Idempotency-Key verilirse aynı key'le tekrar gönderim aynı işi döndürür.
+    İşler batch sınıfında çalışır; X-User-Id verilirse kullanıcılar arası adil sırayla alınır.
+    """
+    if job_runner is None:
+        raise HTTPException(status_code=404, detail="Rewrite işleri kapalı (JOBS_ENABLED=false)")
+    
+    async def work() -> StoredResponse:
+        try:
+            job_id = await job_runner.submit(request.user_text, request.ielts_level, x_user_id)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        job = await job_runner.get(job_id)
+        return StoredResponse(202, dumps(job_payload(job)))
+    
+    if idempotency_key is None or idempotency is None:
+        stored = await work()
+        return Response(content=stored.body, status_code=stored.status_code, media_type="application/json")
+    return await _run_idempotent("jobs", idempotency_key, request, work)
+
+
+@app.get("/rewrite/jobs/{job_id}", response_model=RewriteJob)
+async def get_rewrite_job(
+    job_id: str,
+    wait: float = Query(default=0, ge=0, description="İş bitene kadar en fazla kaç saniye beklensin (long-poll)"),
+):
+    """
+    İşin durumu; bittiyse sonucu (result) veya hatası (status_code, error).
+    wait verilirse iş bitene veya süre dolana kadar yanıt bekletilir (JOBS_MAX_WAIT_SECONDS ile sınırlı).
+    """
+    if job_runner is None:
+        raise HTTPException(status_code=404, detail="Rewrite işleri kapalı (JOBS_ENABLED=false)")
+    
+    job = await job_runner.get(job_id, wait=min(wait, _settings.jobs_max_wait_seconds))
+    if job is None:
+        raise HTTPException(status_code=404, detail="İş bulunamadı")
+    return FastJSONResponse(job_payload(job))
+
+
+def _too_many_requests(error: AdmissionRejected) -> HTTPException:
+    """Admission reddini Retry-After header'lı 429'a çevirir"""
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def _service_unavailable(error: CircuitOpenError) -> HTTPException:
+    """Açık devreyi Retry-After header'lı 503'e çevirir"""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def _sse_event(event: str, data: str) -> str:
+    """Tek bir server-sent event satırı oluşturur"""
+    return f"event: {event}\ndata: {data}\n\n"
+
 
+@app.post("/rewrite/stream")
+async def rewrite_text_stream(
+    request: RewriteRequest,
+    x_user_id: Optional[str] = Header(default=None, max_length=128),
+):
+    """
+    /rewrite'ın server-sent events versiyonu.
+    Her üst seviye alan (rewritten_text, grammar_corrections, new_words, ...) tamamlandığı anda
+    "field" event'i olarak gönderilir; en sonda /rewrite ile aynı doğrulanmış payload
+    "result" event'i olarak gelir. Hata olursa "error" event'i gönderilir ve stream kapanır.
+    """
+    # Kuyruk zaten doluysa stream açmadan hemen 429 dön
+    limiter = gemini_service.limiter
+    if limiter.saturated:
+        REWRITE_REQUESTS.inc(endpoint="stream", ielts_level=request.ielts_level, outcome="rejected")
+        raise _too_many_requests(AdmissionRejected("Sunucu şu an yoğun, lütfen daha sonra tekrar deneyin",
+                                                   limiter.retry_after()))
+    
+    async def event_stream():
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            async for event, payload in gemini_service.rewrite_text_stream(
+                user_text=request.user_text,
+                ielts_level=request.ielts_level,
+                caller=_caller(x_user_id, "interactive")
+            ):
+                if event == "field":
+                    yield _sse_event("field", dumps(payload).decode("utf-8"))
+                else:
+                    with REWRITE_STAGE_SECONDS.time(stage="serialization"):
+                        data = payload.model_dump_json()
+                    outcome = "ok"
+                    yield _sse_event("result", data)
+        except AdmissionRejected as e:
+            outcome = "rejected"
+            yield _sse_event("error", json.dumps(
+                {"status_code": 429, "detail": str(e), "retry_after": e.retry_after}, ensure_ascii=False
+            ))
+        except CircuitOpenError as e:
+            outcome = "unavailable"
+            yield _sse_event("error", json.dumps(
+                {"status_code": 503, "detail": str(e), "retry_after": e.retry_after}, ensure_ascii=False
+            ))
+        except ValueError as e:
+            outcome = "parse_error"
+            yield _sse_event("error", json.dumps({"status_code": 422, "detail": str(e)}, ensure_ascii=False))
+        except Exception:
+            yield _sse_event("error", json.dumps({"status_code": 500, "detail": "Internal server error"}))
+        finally:
+            _observe_request("stream", request.ielts_level, outcome, started)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Nginx'in event'leri biriktirmesini engelle
+        }
+    )
 
 
+@app.post("/rewrite/levels", response_model=MultiLevelRewriteResponse)
+async def rewrite_levels(
+    request: MultiLevelRewriteRequest,
+    x_user_id: Optional[str] = Header(default=None, max_length=128),
+):
+    """
+    Metni birden fazla IELTS seviyesine tek istekte dönüştürür (örn. band 6 ile 8'i karşılaştırmak için).
+    Cache'te olmayan seviyeler tek bir Gemini üretimiyle dönüştürülür: grammar düzeltmeleri ve analiz
+    ortak, rewritten_text ve new_words seviye başına. Her seviye ayrı cache'lenir; sonradan aynı metin
+    tek seviyeyle /rewrite'a gelirse cache'ten döner. Sonuçlar istekteki seviye sırasıyla gelir.
+    """
+    started = time.perf_counter()
+    outcome = "error"
+    levels_label = "-".join(str(level) for level in sorted(request.ielts_levels))
+    try:
+        results = await gemini_service.rewrite_levels_async(
+            user_text=request.user_text,
+            ielts_levels=request.ielts_levels,
+            caller=_caller(x_user_id, "interactive")
+        )
+        
+        with REWRITE_STAGE_SECONDS.time(stage="serialization"):
+            response = FastJSONResponse(MultiLevelRewriteResponse(results=results))
+        outcome = "ok"
+        return response
+        
+    except AdmissionRejected as e:
+        outcome = "rejected"
+        raise _too_many_requests(e)
+    except CircuitOpenError as e:
+        outcome = "unavailable"
+        raise _service_unavailable(e)
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        raise HTTPException(status_code=504, detail="AI servisi zamanında yanıt vermedi")
+    except ValueError as e:
+        outcome = "parse_error"
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception:
+        raise HTTPException(status_code=500, detail="Internal server error")
+    finally:
+        _observe_request("levels", levels_label, outcome, started)
+
+
+@app.post("/rewrite/batch", response_model=BatchRewriteResponse)
+async def rewrite_batch(
+    request: BatchRewriteRequest,
+    x_user_id: Optional[str] = Header(default=None, max_length=128),
+):
+    """
+    Birden fazla metni aynı anda dönüştürür (backfill / prompt değişikliği sonrası yeniden işleme).
+    Öğeler sınırlı paralellikle işlenir; bir öğenin hatası batch'in tamamını düşürmez,
+    her öğe kendi sonucunu veya hatasını döner. Öğeler Gemini kuyruğunda batch sınıfındadır:
+    aynı anda gelen kullanıcı isteklerini arkaya itmez.
+    """
+    settings = get_settings()
+    
+    if len(request.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Batch en fazla {settings.batch_max_items} öğe içerebilir"
+        )
+    
+    parallelism = settings.batch_max_parallelism
+    if request.max_parallelism is not None:
+        parallelism = min(parallelism, request.max_parallelism)
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+    caller = _caller(x_user_id, "batch")
+    
+    async def process(index: int, item: RewriteRequest) -> BatchRewriteItemResult:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await gemini_service.rewrite_text_async(
+                    user_text=item.user_text,
+                    ielts_level=item.ielts_level,
+                    caller=caller
+                )
+                _observe_request("batch", item.ielts_level, "ok", started)
+                return BatchRewriteItemResult(index=index, status_code=200, result=result)
+            except AdmissionRejected as e:
+                _observe_request("batch", item.ielts_level, "rejected", started)
+                return BatchRewriteItemResult(index=index, status_code=429, error=str(e))
+            except CircuitOpenError as e:
+                _observe_request("batch", item.ielts_level, "unavailable", started)
+                return BatchRewriteItemResult(index=index, status_code=503, error=str(e))
+            except asyncio.TimeoutError:
+                _observe_request("batch", item.ielts_level, "timeout", started)
+                return BatchRewriteItemResult(index=index, status_code=504, error="AI servisi zamanında yanıt vermedi")
+            except ValueError as e:
+                _observe_request("batch", item.ielts_level, "parse_error", started)
+                return BatchRewriteItemResult(index=index, status_code=422, error=str(e))
+            except Exception:
+                logger.error(f"Batch item {index} failed", exc_info=True)
+                _observe_request("batch", item.ielts_level, "error", started)
+                return BatchRewriteItemResult(index=index, status_code=500, error="Internal server error")
+    
+    logger.info(f"Processing batch of {len(request.items)} items (parallelism: {parallelism})")
+    results = await asyncio.gather(
+        *(process(index, item) for index, item in enumerate(request.items))
+    )
+    
+    succeeded = sum(1 for r in results if r.status_code == 200)
+    # Öğeler zaten doğrulanmış; response_model ile tekrar doğrulanmadan serialize edilir
+    return FastJSONResponse(BatchRewriteResponse(
+        results=results,
+        succeeded=succeeded,
+        failed=len(results) - succeeded
+    ))
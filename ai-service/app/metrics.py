@@ -0,0 +1,469 @@
+"""
+Prometheus text formatında (0.0.4) metrikler
+
+prometheus_client bağımlılığı eklememek için küçük bir registry: Counter, Gauge ve
+Histogram, label'lı veya label'sız. Tüm metrikler thread-safe'tir (senkron
+rewrite_text ve SDK thread'leri de kayıt yapar). /metrics endpoint'i REGISTRY.render()
+çıktısını döndürür.
+
+Çok worker'lı çalışmada (app.serve) her process kendi registry'sini tutar; scrape'i
+hangi worker'ın aldığına göre sayaçlar zıplamasın diye her worker değerlerini
+METRICS_MULTIPROC_DIR'e <pid>.json olarak yazar ve /metrics render_multiprocess() ile
+tüm dosyaları birleştirir: counter ve histogram'lar toplanır (ölmüş worker'larınki dahil,
+böylece geriye gitmez), gauge'lar yaşayan worker'lar için worker="<pid>" label'ıyla
+ayrı ayrı verilir.
+"""
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Hızlı aşamalar (parse, validation: ~µs-ms) ile LLM çağrılarını (sn) aynı ölçekte kapsar
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0,
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Registry:
+    """Kayıtlı metrikleri tutar ve Prometheus text formatında yazar"""
+
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric") -> None:
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"Metrik zaten kayıtlı: {metric.name}")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        return _render(list(self._metrics))
+
+    def snapshot(self) -> Dict[str, List[List[Any]]]:
+        """Bu process'in ham metrik değerleri (JSON'a yazılabilir)"""
+        return {metric.name: metric.snapshot() for metric in list(self._metrics)}
+
+    def write_snapshot(self, directory: str) -> None:
+        """Snapshot'ı directory/<pid>.json'a atomik olarak yazar"""
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def render_multiprocess(self, directory: str) -> str:
+        """directory'deki tüm worker snapshot'larını birleştirip Prometheus formatında yazar"""
+        snapshots: List[Tuple[str, bool, Dict[str, List[List[Any]]]]] = []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json") or not name[:-5].isdigit():
+                continue
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            pid = name[:-5]
+            snapshots.append((pid, _pid_alive(int(pid)), data))
+
+        return _render([
+            metric.merged([(pid, alive, data.get(metric.name, [])) for pid, alive, data in snapshots])
+            for metric in list(self._metrics)
+        ])
+
+
+def _render(metrics: Sequence["_Metric"]) -> str:
+    lines: List[str] = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional[Registry] = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} label'ları {self.labelnames} olmalı, verilen: {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def snapshot(self) -> List[List[Any]]:
+        """[[label değerleri, değer], ...]"""
+        raise NotImplementedError
+
+    def merged(self, snapshots: Sequence[Tuple[str, bool, List[List[Any]]]]) -> "_Metric":
+        """(pid, yaşıyor mu, snapshot) listesinden birleştirilmiş, registry'siz kopya"""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Sadece artan sayaç"""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counter azaltılamaz")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+    def snapshot(self) -> List[List[Any]]:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def merged(self, snapshots: Sequence[Tuple[str, bool, List[List[Any]]]]) -> "Counter":
+        result = Counter(self.name, self.documentation, self.labelnames, registry=None)
+        for _, _, entries in snapshots:
+            for key, value in entries:
+                key = tuple(key)
+                result._values[key] = result._values.get(key, 0.0) + value
+        return result
+
+
+class Gauge(_Metric):
+    """Artıp azalabilen değer; set_function ile okunma anında hesaplanabilir"""
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float], **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def value(self, **labels) -> float:
+        key = self._key(labels)
+        fn = self._functions.get(key)
+        return fn() if fn is not None else self._values.get(key, 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            values[key] = fn()
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+            for key, v in sorted(values.items())
+        ]
+
+    def snapshot(self) -> List[List[Any]]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            values[key] = fn()
+        return [[list(key), value] for key, value in values.items()]
+
+    def merged(self, snapshots: Sequence[Tuple[str, bool, List[List[Any]]]]) -> "Gauge":
+        # Anlık değerler toplanamaz (ör. devre durumu); ölmüş worker'ların değeri atılır
+        result = Gauge(self.name, self.documentation, self.labelnames + ("worker",), registry=None)
+        for pid, alive, entries in snapshots:
+            if not alive:
+                continue
+            for key, value in entries:
+                result._values[tuple(key) + (pid,)] = value
+        return result
+
+
+class Histogram(_Metric):
+    """Sabit bucket'lı gecikme histogramı (saniye)"""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (bucket sayıları, toplam, adet); bucket sayıları kümülatif değil
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            entry[0][index] += 1
+            entry[1][0] += value
+            entry[1][1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Blok süresini gözlemler (hata fırlatılsa da)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return int(entry[1][1]) if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), list(totals))) for key, (counts, totals) in self._values.items())
+
+        lines = []
+        for key, (counts, (total, count)) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {_format_value(count)}")
+        return lines
+
+    def snapshot(self) -> List[List[Any]]:
+        with self._lock:
+            return [[list(key), [list(counts), list(totals)]] for key, (counts, totals) in self._values.items()]
+
+    def merged(self, snapshots: Sequence[Tuple[str, bool, List[List[Any]]]]) -> "Histogram":
+        result = Histogram(self.name, self.documentation, self.labelnames, buckets=self.buckets, registry=None)
+        for _, _, entries in snapshots:
+            for key, (counts, (total, count)) in entries:
+                key = tuple(key)
+                entry = result._values.get(key)
+                if entry is None:
+                    entry = result._values[key] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+                for index, bucket_count in enumerate(counts):
+                    entry[0][index] += bucket_count
+                entry[1][0] += total
+                entry[1][1] += count
+        return result
+
+
+# ========================
+# Rewrite pipeline metrikleri
+# ========================
+
+REWRITE_REQUESTS = Counter(
+    "rewrite_requests_total",
+    "Rewrite istekleri (endpoint, IELTS seviyesi ve sonuca göre: ok | parse_error | rejected | unavailable | timeout | error)",
+    ["endpoint", "ielts_level", "outcome"],
+)
+
+REWRITE_REQUEST_SECONDS = Histogram(
+    "rewrite_request_seconds",
+    "Rewrite isteğinin uçtan uca süresi",
+    ["endpoint"],
+)
+
+REWRITE_STAGE_SECONDS = Histogram(
+    "rewrite_stage_seconds",
+    "Pipeline aşamalarının süresi: prompt_build, llm_call (prompt_build dahil), "
+    "json_parse (temizleme + parse tek geçiş), validation, alignment, vocabulary, serialization",
+    ["stage"],
+)
+
+REWRITE_CACHE_LOOKUPS = Counter(
+    "rewrite_cache_lookups_total",
+    "Rewrite cache aramaları (hit: bellek içi | shared_hit: worker'lar arası | miss)",
+    ["result"],
+)
+
+LLM_IN_FLIGHT = Gauge(
+    "llm_in_flight_requests",
+    "Şu an LLM backend'inde bekleyen istek sayısı",
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Gemini usage_metadata'dan token sayıları (type: prompt | candidates | cached)",
+    ["backend", "model", "type"],
+)
+
+ADMISSION_LIMIT = Gauge(
+    "admission_limit",
+    "Adaptif limiter'ın şu anki eş zamanlı istek limiti",
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Limiter'dan slot almış, çalışan istek sayısı",
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "Slot bekleyen istek sayısı",
+)
+
+ADMISSION_QUEUE_WAIT_SECONDS = Histogram(
+    "admission_queue_wait_seconds",
+    "İsteğin slot alana kadar kuyrukta beklediği süre (class: interactive | batch)",
+    ["class"],
+)
+
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "429 ile reddedilen istekler (reason: queue_full | queue_timeout | evicted | quota)",
+    ["reason"],
+)
+
+REWRITE_JSON_PARSES = Counter(
+    "rewrite_json_parses_total",
+    "Model çıktısı parse sonuçları (clean | repaired: küçük sözdizimi hatası | truncated: kesilmiş "
+    "çıktı kurtarıldı | failed); onarım oranı = (repaired + truncated) / toplam",
+    ["result"],
+)
+
+NEW_WORDS_FILTERED = Counter(
+    "new_words_filtered_total",
+    "Sözlük kontrolüyle atılan new_words (reason: in_original | too_common | duplicate)",
+    ["reason"],
+)
+
+LLM_ATTEMPTS = Counter(
+    "llm_attempts_total",
+    "LLM çağrı denemeleri (result: ok | timeout | malformed | error)",
+    ["backend", "result"],
+)
+
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "Geçici hata sonrası tekrar denenen LLM çağrıları",
+    ["backend"],
+)
+
+LLM_HEDGES = Counter(
+    "llm_hedges_total",
+    "Hedge istekleri (result: fired | won)",
+    ["backend", "result"],
+)
+
+CIRCUIT_BREAKER_STATE = Gauge(
+    "circuit_breaker_state",
+    "Backend devre durumu (0 closed, 1 half_open, 2 open)",
+    ["backend"],
+)
+
+CIRCUIT_BREAKER_REJECTIONS = Counter(
+    "circuit_breaker_rejections_total",
+    "Devre açıkken backend'e gönderilmeden reddedilen istekler",
+    ["backend"],
+)
+
+HTTP_COMPRESSION_BYTES = Counter(
+    "http_compression_bytes_total",
+    "Sıkıştırılan yanıtların byte'ları (stage: original | compressed)",
+    ["encoding", "stage"],
+)
+
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total",
+    "Idempotency-Key'li istekler (result: new | replayed | waited | conflict | in_progress | lease_lost)",
+    ["result"],
+)
+
+REWRITE_JOBS = Counter(
+    "rewrite_jobs_total",
+    "Rewrite işi olayları (event: enqueued | completed | failed | retried | recovered)",
+    ["event"],
+)
+
+REWRITE_JOB_WAIT_SECONDS = Histogram(
+    "rewrite_job_wait_seconds",
+    "İşin kuyruğa eklenmesinden bir worker tarafından alınmasına kadar geçen süre",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+
+GEMINI_QUOTA_WAIT_SECONDS = Histogram(
+    "gemini_quota_wait_seconds",
+    "İsteğin RPM / TPM kotası açılana kadar gönderilmeden beklediği süre",
+    ["model"],
+)
+
+GEMINI_QUOTA_TOKENS = Counter(
+    "gemini_quota_tokens_total",
+    "Kota için ayrılan tahmini ve usage_metadata'dan gelen gerçek token sayıları (type: estimated | actual)",
+    ["model", "type"],
+)
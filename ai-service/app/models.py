@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator # FastAPI' de gelen/giden JSON verisini doğrulamak ve model tanımlamak için
-from typing import List # Model içinde liste (dizi) tiplerini belirtmek için
+from typing import Dict, List, Literal, Optional # Model içinde liste (dizi) ve opsiyonel tipleri belirtmek için
 
 class RewriteRequest(BaseModel):
     """Kullanıcının yazdığı metni IELTS seviyesine dönüştürme isteği"""
@@ -61,6 +61,73 @@ class GrammarCorrection(BaseModel):
         description="Hata açıklaması",
         example="Missing definite article 'the'"
     )
+    start: Optional[int] = Field(
+        default=None,
+        description="Hatanın orijinal metindeki başlangıç indeksi (metinde bulunamazsa boş)",
+        example=14
+    )
+    end: Optional[int] = Field(
+        default=None,
+        description="Hatanın orijinal metindeki bitiş indeksi (hariç)",
+        example=21
+    )
+
+
+class AlignmentSpan(BaseModel):
+    """Orijinal ve yeniden yazılmış metnin hizalanmış bir parçası (karakter indeksleri, end hariç)"""
+
+    op: Literal["equal", "replace", "delete", "insert"] = Field(
+        ...,
+        description="equal: aynı kaldı | replace: değiştirildi | delete: çıkarıldı | insert: eklendi",
+        example="replace"
+    )
+    original_start: int = Field(..., example=8)
+    original_end: int = Field(..., example=16)
+    rewritten_start: int = Field(..., example=16)
+    rewritten_end: int = Field(..., example=34)
+
+
+class LexicalStats(BaseModel):
+    """Orijinal metnin yerel frekans sözlüğüne göre kelime istatistikleri"""
+
+    word_count: int = Field(
+        ...,
+        description="Kelime sayısı",
+        example=42
+    )
+
+    unique_lemmas: int = Field(
+        ...,
+        description="Farklı kök sayısı",
+        example=30
+    )
+
+    lexical_diversity: float = Field(
+        ...,
+        description="Farklı kök / kelime sayısı (type-token ratio)",
+        example=0.71
+    )
+
+    average_rank: Optional[float] = Field(
+        default=None,
+        description="Sözlükte bulunan kelimelerin ortalama frekans sırası",
+        example=212.5
+    )
+
+    advanced_ratio: float = Field(
+        ...,
+        description="B2 ve üstü kelimelerin oranı (sözlükte olmayan kelimeler sayılmaz)",
+        example=0.12
+    )
+
+    cefr_distribution: Dict[str, int] = Field(
+        default={},
+        description=(
+            "Frekans sırasından tahmini CEFR bandına göre kelime sayıları; sadece sözlüğün "
+            "ulaşabildiği bandlar, sözlükte olmayan kelimeler 'unknown'"
+        ),
+        example={"A1": 30, "A2": 5, "B1": 2, "B2": 0, "C1": 0, "C2": 1, "unknown": 4}
+    )
 
 
 class RewriteResponse(BaseModel):
@@ -139,4 +206,213 @@ class RewriteResponse(BaseModel):
         ...,
         description="Uygulandığı IELTS seviyesi",
         example=7
-    )
\ No newline at end of file
+    )
+
+    lexical_stats: Optional[LexicalStats] = Field(
+        default=None,
+        description="Orijinal metnin kelime istatistikleri (LEXICON_STATS_ENABLED ile)"
+    )
+
+    alignment: List[AlignmentSpan] = Field(
+        default=[],
+        description="Orijinal ve yeniden yazılmış metnin iki metni de baştan sona kapsayan "
+                    "hizalaması (REWRITE_ALIGNMENT_ENABLED ile); değişiklikleri vurgulamak için",
+        example=[
+            {"op": "replace", "original_start": 0, "original_end": 6, "rewritten_start": 0, "rewritten_end": 14},
+            {"op": "equal", "original_start": 6, "original_end": 8, "rewritten_start": 14, "rewritten_end": 16},
+        ]
+    )
+
+    truncated: bool = Field(
+        default=False,
+        description="Model çıktısı max_output_tokens'ta kesildi ve onarıldı; yarım kalan alanlar / "
+                    "liste öğeleri atıldığı için listeler eksik olabilir (sonuç cache'lenmez)",
+        example=False
+    )
+
+
+class LevelRewrite(BaseModel):
+    """Çok seviyeli model çıktısında tek bir seviyenin rewrite'ı"""
+
+    ielts_level: int = Field(
+        ...,
+        description="Seviye",
+        example=8
+    )
+
+    rewritten_text: str = Field(
+        ...,
+        description="Bu seviyeye dönüştürülmüş metin",
+        example="Yesterday, I visited the local park, where I found the atmosphere remarkably serene."
+    )
+
+    new_words: List[Word] = Field(
+        default=[],
+        description="Bu seviyedeki rewrite'ta kullanılan yeni kelimeler"
+    )
+
+
+class MultiLevelRewriteOutput(BaseModel):
+    """Tek üretimde birden fazla seviye: ortak düzeltme / analiz + seviye başına rewrite (model çıktısı)"""
+
+    grammar_corrections: List[GrammarCorrection] = Field(default=[])
+    levels: List[LevelRewrite] = Field(default=[])
+    writing_tips: List[str] = Field(default=[])
+    strengths: List[str] = Field(default=[])
+    weaknesses: List[str] = Field(default=[])
+    overall_feedback: str = Field(...)
+
+
+class MultiLevelRewriteRequest(BaseModel):
+    """Bir metni birden fazla IELTS seviyesine tek istekte dönüştürme isteği"""
+
+    user_text: str = Field(
+        ...,
+        min_length=10,
+        max_length=10000,
+        description="Kullanıcının İngilizce günlük metni",
+        example="Today I went to the park and saw many birds."
+    )
+
+    ielts_levels: List[int] = Field(
+        ...,
+        min_length=1,
+        max_length=4,
+        description="Hedef IELTS seviyeleri (6, 7, 8, 9); sonuçlar bu sırayla döner",
+        example=[6, 8]
+    )
+
+    @field_validator("ielts_levels")
+    def validate_ielts_levels(cls, v):
+        if any(level not in [6, 7, 8, 9] for level in v):
+            raise ValueError("IELTS seviyeleri 6, 7, 8 veya 9 olmalıdır.")
+        if len(set(v)) != len(v):
+            raise ValueError("IELTS seviyeleri tekrar edemez.")
+        return v
+
+
+class MultiLevelRewriteResponse(BaseModel):
+    """Çok seviyeli dönüşüm sonucu - seviyeler istekteki sırayla döner"""
+
+    results: List[RewriteResponse] = Field(
+        ...,
+        description="Seviye başına /rewrite ile aynı sonuç (grammar düzeltmeleri ve analiz ortak)"
+    )
+
+
+class BatchRewriteRequest(BaseModel):
+    """Birden fazla metni tek istekte dönüştürme isteği (backfill / yeniden işleme)"""
+
+    items: List[RewriteRequest] = Field(
+        ...,
+        min_length=1,
+        description="Dönüştürülecek metinler"
+    )
+
+    max_parallelism: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Aynı anda işlenecek en fazla öğe sayısı (sunucu limitini aşamaz)",
+        example=4
+    )
+
+
+class BatchRewriteItemResult(BaseModel):
+    """Batch içindeki tek bir öğenin sonucu"""
+
+    index: int = Field(
+        ...,
+        description="Öğenin istekteki sırası",
+        example=0
+    )
+
+    status_code: int = Field(
+        ...,
+        description="Öğe tek başına /rewrite'a gönderilseydi dönecek HTTP kodu",
+        example=200
+    )
+
+    result: Optional[RewriteResponse] = Field(
+        default=None,
+        description="Başarılıysa dönüşüm sonucu"
+    )
+
+    error: Optional[str] = Field(
+        default=None,
+        description="Başarısızsa hata mesajı",
+        example="AI yanıtı beklenen formatta değil"
+    )
+
+
+class BatchRewriteResponse(BaseModel):
+    """Batch dönüşüm sonucu - öğeler istekteki sırayla döner"""
+
+    results: List[BatchRewriteItemResult] = Field(
+        ...,
+        description="Öğe bazında sonuçlar"
+    )
+
+    succeeded: int = Field(
+        ...,
+        description="Başarılı öğe sayısı",
+        example=9
+    )
+
+    failed: int = Field(
+        ...,
+        description="Başarısız öğe sayısı",
+        example=1
+    )
+
+
+class RewriteJob(BaseModel):
+    """Arka planda işlenen rewrite işi (POST /rewrite/jobs, GET /rewrite/jobs/{id})"""
+
+    id: str = Field(
+        ...,
+        description="İş kimliği",
+        example="5f0c2b6e9a4d4e0f8c1d2a3b4c5d6e7f"
+    )
+
+    status: str = Field(
+        ...,
+        description="queued | running | done | failed",
+        example="done"
+    )
+
+    attempts: int = Field(
+        default=0,
+        description="İşin kaç kez çalıştırıldığı (geçici hatalarda kuyruğa geri döner)",
+        example=1
+    )
+
+    created_at: float = Field(
+        ...,
+        description="Kuyruğa eklenme zamanı (unix saniye)"
+    )
+
+    started_at: Optional[float] = Field(
+        default=None,
+        description="İlk çalıştırılma zamanı (unix saniye)"
+    )
+
+    finished_at: Optional[float] = Field(
+        default=None,
+        description="Bitiş zamanı (unix saniye)"
+    )
+
+    status_code: Optional[int] = Field(
+        default=None,
+        description="Bittiyse /rewrite'ın döneceği HTTP kodu",
+        example=200
+    )
+
+    result: Optional[RewriteResponse] = Field(
+        default=None,
+        description="Başarılıysa dönüşüm sonucu"
+    )
+
+    error: Optional[str] = Field(
+        default=None,
+        description="Başarısızsa hata mesajı"
+    )
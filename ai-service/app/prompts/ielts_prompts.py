@@ -1,15 +1,9 @@
+from functools import lru_cache
+from typing import Tuple
 
-def get_rewrite_prompt(user_text: str, ielts_level: int) -> str:
-    """
-    Advanced IELTS rewriting & feedback prompt.
-    - Role-based prompting
-    - Band-specific linguistic constraints
-    - Error detection
-    - Vocabulary control
-    - Structured deterministic JSON output
-    """
 
-    level_descriptions = {
+# Seviye kriterleri - modül yüklenirken bir kere oluşturulur
+LEVEL_DESCRIPTIONS = {
         6: """
         - Mostly simple and compound sentences
         - Common everyday vocabulary
@@ -38,19 +32,11 @@ def get_rewrite_prompt(user_text: str, ielts_level: int) -> str:
         - No noticeable grammatical errors
         - Native-like fluency
         """
-    }
-
-    prompt = f"""
-        You are a senior IELTS Writing Examiner with 15+ years of official assessment experience.
-
-        Your task is to ANALYZE, CORRECT, and TRANSFORM the given text according to IELTS Band {ielts_level} standards.
+}
 
-        ========================
-        IELTS BAND {ielts_level} CRITERIA
-        ========================
-        {level_descriptions[ielts_level]}
 
-        ========================
+# Tek ve çok seviyeli prompt'larda ortak kurallar (prompt metnine 8 boşluk girintiyle gömülür)
+_STRICT_RULES = """========================
         STRICT RULES
         ========================
         1. Preserve the original meaning and intent.
@@ -81,7 +67,27 @@ def get_rewrite_prompt(user_text: str, ielts_level: int) -> str:
             "coherence and cohesion",
             "lexical sophistication",
             "grammatical range and accuracy".
-            Use simple explanatory language instead.
+            Use simple explanatory language instead."""
+
+
+def _build_static_prefix(ielts_level: int) -> str:
+    """
+    Prompt'un kullanıcı metnine bağlı olmayan kısmı (rol, kurallar, şema, örnek)
+
+    Seviyeye göre sabittir; her istekte yeniden oluşturulmaz, system instruction
+    veya cached content olarak bir kere gönderilebilir.
+    """
+    return f"""
+        You are a senior IELTS Writing Examiner with 15+ years of official assessment experience.
+
+        Your task is to ANALYZE, CORRECT, and TRANSFORM the given text according to IELTS Band {ielts_level} standards.
+
+        ========================
+        IELTS BAND {ielts_level} CRITERIA
+        ========================
+        {LEVEL_DESCRIPTIONS[ielts_level]}
+
+        {_STRICT_RULES}
         ========================
         TASKS
         ========================
@@ -177,7 +183,21 @@ def get_rewrite_prompt(user_text: str, ielts_level: int) -> str:
         ],
         "overall_feedback": "The text is clear but basic. Vocabulary and grammatical accuracy need improvement to reach Band 8."
         }}
+"""
 
+
+# Seviye başına derlenmiş statik prefix'ler
+_STATIC_PREFIXES = {level: _build_static_prefix(level) for level in LEVEL_DESCRIPTIONS}
+
+
+def get_static_prefix(ielts_level: int) -> str:
+    """Seviyenin önceden oluşturulmuş statik prompt kısmı (system instruction olarak da kullanılır)"""
+    return _STATIC_PREFIXES[ielts_level]
+
+
+def get_user_prompt(user_text: str) -> str:
+    """Prompt'un isteğe özel küçük dinamik kısmı"""
+    return f"""
         ========================
         USER TEXT
         ========================
@@ -186,4 +206,92 @@ def get_rewrite_prompt(user_text: str, ielts_level: int) -> str:
         Return ONLY the JSON object.
         """
 
-    return prompt
\ No newline at end of file
+
+def get_rewrite_prompt(user_text: str, ielts_level: int) -> str:
+    """
+    Advanced IELTS rewriting & feedback prompt.
+    - Role-based prompting
+    - Band-specific linguistic constraints
+    - Error detection
+    - Vocabulary control
+    - Structured deterministic JSON output
+
+    Statik prefix (seviyeye göre önceden derlenmiş) + dinamik kullanıcı metni.
+    Sabit kısım başta olduğu için sağlayıcı tarafındaki prefix cache'lerinden de faydalanır.
+    """
+    return _STATIC_PREFIXES[ielts_level] + get_user_prompt(user_text)
+
+@lru_cache(maxsize=None)
+def get_multi_level_static_prefix(ielts_levels: Tuple[int, ...]) -> str:
+    """
+    Metni birden fazla seviyede tek üretimle dönüştüren prompt'un statik kısmı
+
+    Grammar düzeltmeleri ve analiz (tips, strengths, weaknesses, feedback) bir kere,
+    rewritten_text ve new_words her seviye için ayrı üretilir. Seviye kümesi başına
+    bir kere oluşturulur.
+    """
+    bands = ", ".join(str(level) for level in ielts_levels)
+    criteria = "\n".join(
+        f"""
+        IELTS BAND {level}:
+        {LEVEL_DESCRIPTIONS[level]}"""
+        for level in ielts_levels
+    )
+    return f"""
+        You are a senior IELTS Writing Examiner with 15+ years of official assessment experience.
+
+        Your task is to ANALYZE and CORRECT the given text once, then TRANSFORM it separately
+        for EACH of these IELTS Bands: {bands}.
+
+        ========================
+        BAND CRITERIA
+        ========================
+        {criteria}
+
+        {_STRICT_RULES}
+        19. Each band's "rewritten_text" must follow ONLY that band's criteria; the rewrites must differ in complexity.
+        20. "new_words" of a band must include ONLY words used in that band's "rewritten_text".
+        ========================
+        TASKS
+        ========================
+        1. Identify and fix grammar mistakes (shared by all bands).
+        2. For each band ({bands}): rewrite the text at that band and extract advanced vocabulary used in that rewrite.
+        3. Provide 3–5 personalized writing improvement tips.
+        4. Analyze strengths and weaknesses.
+        5. Provide a short overall evaluation (1–2 sentences).
+
+        ========================
+        RESPONSE FORMAT (STRICT JSON)
+        ========================
+        {{
+        "grammar_corrections": [
+            {{
+            "original": "exact phrase from original text",
+            "corrected": "grammatically correct version",
+            "explanation": "brief explanation of the mistake"
+            }}
+        ],
+        "levels": [
+            {{
+            "ielts_level": {ielts_levels[0]},
+            "rewritten_text": "IELTS {ielts_levels[0]} level rewritten version here",
+            "new_words": [
+                {{
+                "english_word": "advanced_word",
+                "turkish_meaning": "turkce_anlam"
+                }}
+            ]
+            }}
+        ],
+        "writing_tips": ["..."],
+        "strengths": ["..."],
+        "weaknesses": ["..."],
+        "overall_feedback": "..."
+        }}
+        "levels" MUST contain exactly one entry for each band, in this order: {bands}.
+"""
+
+
+def get_multi_level_prompt(user_text: str, ielts_levels: Tuple[int, ...]) -> str:
+    """Çok seviyeli rewrite'ın tam prompt'u (statik kısım + kullanıcı metni)"""
+    return get_multi_level_static_prefix(ielts_levels) + get_user_prompt(user_text)
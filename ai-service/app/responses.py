@@ -0,0 +1,32 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson opsiyonel: yoksa stdlib json kullanılır
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """dict / list içeriğini UTF-8 JSON byte'larına çevirir (orjson varsa onunla)"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    FastAPI'nin jsonable_encoder + json.dumps yolunu atlayan JSON response
+
+    Pydantic modeller zaten doğrulanmış kabul edilir ve pydantic-core ile doğrudan
+    serialize edilir (response_model ile tekrar doğrulanmaz); dict / list içerik
+    orjson ile serialize edilir.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode("utf-8")
+        return dumps(content)
@@ -0,0 +1,99 @@
+"""
+Production entrypoint: uvicorn'u ayarlardan türetilen worker sayısıyla başlatır
+
+    python -m app.serve
+
+WORKERS=0 (varsayılan) ise worker sayısı process'in kullanabildiği CPU sayısıdır
+(CPU affinity ve cgroup kotası dikkate alınır), en fazla WORKERS_MAX. Her worker
+kendi GeminiService'ini (limiter, L1 cache) taşır; rewrite sonuçları worker'lar
+arasında SQLite paylaşılan cache (L2) üzerinden paylaşılır.
+
+Worker başına kalan durum: circuit breaker (her worker devreyi kendi gördüğü hatalarla
+açar), SingleFlight (aynı istek farklı worker'lara düşerse L2 cache'e yazılana kadar
+ayrı ayrı çalışır), admission limiter ve Gemini kotası (WORKERS'a bölünür). Metrikler
+METRICS_MULTIPROC_DIR üzerinden birleştirilir; gauge'lar worker label'ıyla ayrı gelir.
+"""
+import glob
+import logging
+import math
+import os
+import tempfile
+from typing import Optional
+
+import uvicorn
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _cgroup_cpu_limit() -> Optional[float]:
+    """Container CPU kotası (cgroup v2 cpu.max veya v1 cfs_quota), yoksa None"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    """Bu process'in gerçekten kullanabileceği CPU sayısı"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Windows / macOS
+        cpus = os.cpu_count() or 1
+
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return max(1, cpus)
+
+
+def worker_count(settings=None) -> int:
+    """WORKERS ayarı > 0 ise o, değilse kullanılabilir CPU sayısı (WORKERS_MAX ile sınırlı)"""
+    settings = settings or get_settings()
+    if settings.workers > 0:
+        return settings.workers
+    return max(1, min(available_cpus(), settings.workers_max))
+
+
+def main() -> None:
+    settings = get_settings()
+    workers = worker_count(settings)
+    logging.basicConfig(level=settings.log_level)
+    logger.info(f"Starting ai-service on {settings.api_host}:{settings.api_port} with {workers} worker(s)")
+    # Worker'lar kendi payını (örn. Gemini kotası) hesaplayabilsin
+    os.environ["WORKERS"] = str(workers)
+    if workers > 1:
+        # /metrics'i hangi worker alırsa alsın tüm worker'ların toplamını döndürsün
+        directory = settings.metrics_multiproc_dir or tempfile.mkdtemp(prefix="ai-service-metrics-")
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            os.remove(path)  # Önceki çalıştırmanın sayaçları
+        os.environ["METRICS_MULTIPROC_DIR"] = directory
+
+    uvicorn.run(
+        "app.main:app",
+        host=settings.api_host,
+        port=settings.api_port,
+        workers=workers,
+        log_level=settings.log_level.lower(),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from app.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_LIMIT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_QUEUE_WAIT_SECONDS,
+    ADMISSION_REJECTED,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Kuyruk dolu veya kuyrukta bekleme süresi aşıldı; istemci retry_after saniye sonra denemeli"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Waiter:
+    """Kuyrukta slot bekleyen tek bir istek"""
+
+    __slots__ = ("future", "meta", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, meta: Dict[str, Any]):
+        self.future = future
+        self.meta = meta
+        self.enqueued_at = time.monotonic()
+
+
+class SlotTimer:
+    """slot() bloğunun süresi; restart ile limiti ilgilendirmeyen beklemeler (örn. kota) düşülür"""
+
+    __slots__ = ("started",)
+
+    def __init__(self):
+        self.started = time.monotonic()
+
+    def restart(self) -> None:
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+class FifoQueue:
+    """
+    Varsayılan bekleme kuyruğu: geliş sırası
+
+    AdaptiveLimiter kuyruğu sadece push / pop / remove / evict_for / len ile kullanır;
+    farklı bir sıralama (örn. fair_queue.WeightedFairQueue) aynı arayüzle takılabilir.
+    """
+
+    def __init__(self):
+        self._items: Deque[Waiter] = deque()
+
+    def push(self, waiter: Waiter) -> None:
+        self._items.append(waiter)
+
+    def pop(self) -> Optional[Waiter]:
+        return self._items.popleft() if self._items else None
+
+    def remove(self, waiter: Waiter) -> None:
+        try:
+            self._items.remove(waiter)
+        except ValueError:
+            pass
+
+    def evict_for(self, meta: Dict[str, Any]) -> Optional[Waiter]:
+        """Kuyruk doluyken yeni isteğe yer açmak için çıkarılacak waiter (FIFO'da hiçbiri)"""
+        return None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"kind": "fifo"}
+
+
+class AdaptiveLimiter:
+    """
+    Gözlenen LLM gecikmesine göre aynı anda çalışan istek sayısını ayarlayan limiter (AIMD)
+
+    - Gecikme latency_target'ın altındaysa ve limit dolduruluyorsa limit yavaşça artar
+      (her tam limit kadar başarılı istekte +1).
+    - Gecikme hedefi aşarsa veya backend hata verirse limit backoff_ratio ile çarpılır;
+      ardışık düşüşler arasında en az bir hedef süre beklenir.
+    - Limit doluysa istekler en fazla max_queue kadar kuyrukta, en fazla queue_timeout
+      saniye bekler; fazlası hemen AdmissionRejected ile reddedilir. Kuyruk yer açmak
+      için bekleyen bir isteği çıkarabilir (evict_for); çıkarılan istek reddedilir.
+
+    Limit [min_limit, max_limit] aralığında kalır.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        initial_limit: Optional[int] = None,
+        latency_target: float = 10.0,
+        backoff_ratio: float = 0.9,
+        max_queue: int = 64,
+        queue_timeout: float = 30.0,
+        queue: Optional[FifoQueue] = None,
+    ):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial_limit or self.max_limit)))
+        self.latency_target = latency_target
+        self.backoff_ratio = backoff_ratio
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.queue = queue if queue is not None else FifoQueue()
+
+        self._in_flight = 0
+        self._last_decrease = -math.inf
+        # Retry-After tahmini için gecikmenin hareketli ortalaması (saniye)
+        self._latency_ewma: Optional[float] = None
+
+        ADMISSION_LIMIT.set_function(lambda: self.limit)
+        ADMISSION_IN_FLIGHT.set_function(lambda: self._in_flight)
+        ADMISSION_QUEUE_DEPTH.set_function(lambda: len(self.queue))
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def saturated(self) -> bool:
+        """Yeni bir istek şu an gelse reddedilir mi"""
+        return self._in_flight >= self.limit and len(self.queue) >= self.max_queue
+
+    def retry_after(self) -> int:
+        """Kuyruğun boşalması için tahmini süre (saniye, 1-60)"""
+        latency = self._latency_ewma or self.latency_target
+        rounds = (len(self.queue) + 1) / self.limit
+        return int(min(60, max(1, math.ceil(latency * rounds))))
+
+    async def acquire(self, meta: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Slot alır; gerekirse kuyrukta bekler
+
+        Raises:
+            AdmissionRejected: Kuyruk doluysa veya queue_timeout içinde slot açılmazsa
+        """
+        meta = meta or {}
+        priority_class = meta.get("class", "interactive")
+        if self._in_flight < self.limit and len(self.queue) == 0:
+            self._in_flight += 1
+            ADMISSION_QUEUE_WAIT_SECONDS.observe(0.0, **{"class": priority_class})
+            return
+
+        if len(self.queue) >= self.max_queue:
+            evicted = self.queue.evict_for(meta) if self.max_queue else None
+            if evicted is None:
+                ADMISSION_REJECTED.inc(reason="queue_full")
+                raise AdmissionRejected("Sunucu şu an yoğun, lütfen daha sonra tekrar deneyin", self.retry_after())
+            # Kuyruğu dolduran kullanıcının son isteği yeni gelene yer açar
+            ADMISSION_REJECTED.inc(reason="evicted")
+            evicted.future.set_exception(
+                AdmissionRejected("Sunucu şu an yoğun, lütfen daha sonra tekrar deneyin", self.retry_after())
+            )
+
+        waiter = Waiter(asyncio.get_running_loop().create_future(), meta)
+        self.queue.push(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.queue.remove(waiter)
+            # Zaman aşımıyla aynı anda slot verildiyse slotu kullan
+            if not self._granted(waiter):
+                waiter.future.cancel()
+                ADMISSION_REJECTED.inc(reason="queue_timeout")
+                raise AdmissionRejected(
+                    "İstek kuyrukta çok uzun bekledi, lütfen daha sonra tekrar deneyin",
+                    self.retry_after()
+                )
+        except asyncio.CancelledError:
+            # İstemci gitti: kuyruktan çık, slot verildiyse geri bırak
+            self.queue.remove(waiter)
+            if self._granted(waiter):
+                self._release_slot()
+            else:
+                waiter.future.cancel()
+            raise
+        finally:
+            ADMISSION_QUEUE_WAIT_SECONDS.observe(time.monotonic() - waiter.enqueued_at, **{"class": priority_class})
+
+    @staticmethod
+    def _granted(waiter: Waiter) -> bool:
+        # Yer açmak için çıkarılan waiter'ın future'ı exception ile biter: slot verilmemiştir
+        return waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None
+
+    def release(self, latency: Optional[float] = None, ok: bool = True) -> None:
+        """
+        Slotu bırakır ve limiti günceller
+
+        latency None ise (örn. istek backend'e hiç ulaşmadı) limit değişmez.
+        """
+        if latency is not None:
+            self._update_limit(latency, ok)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._in_flight < self.limit:
+            waiter = self.queue.pop()
+            if waiter is None:
+                return
+            if waiter.future.done():
+                continue
+            self._in_flight += 1
+            waiter.future.set_result(None)
+
+    def _update_limit(self, latency: float, ok: bool) -> None:
+        if ok:
+            self._latency_ewma = latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+
+        now = time.monotonic()
+        if not ok or latency > self.latency_target:
+            if now - self._last_decrease >= self.latency_target:
+                previous = self.limit
+                self._limit = max(float(self.min_limit), self._limit * self.backoff_ratio)
+                self._last_decrease = now
+                if self.limit != previous:
+                    logger.warning(
+                        f"Admission limit decreased {previous} -> {self.limit} "
+                        f"(latency {latency:.2f}s, ok={ok})"
+                    )
+            return
+
+        # Limit gerçekten kullanılıyorsa büyüt (boştayken şişmesin)
+        if self._in_flight >= self.limit * 0.8:
+            self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+            self._wake_waiters()
+
+    @asynccontextmanager
+    async def slot(self, meta: Optional[Dict[str, Any]] = None) -> AsyncIterator[SlotTimer]:
+        """
+        acquire/release'i saran context manager; bloğun süresi limiti günceller
+
+        Blok ValueError dışında bir exception ile çıkarsa (backend hatası, timeout)
+        istek başarısız sayılır. Bloğa verilen SlotTimer restart edilirse ondan önceki
+        süre gecikmeye sayılmaz.
+        """
+        await self.acquire(meta)
+        timer = SlotTimer()
+        try:
+            yield timer
+        except ValueError:
+            # Bozuk yanıt aşırı yük işareti değildir
+            self.release(timer.elapsed, ok=True)
+            raise
+        except AdmissionRejected:
+            # Blok içinden red (örn. kota): backend'e gidilmedi, limit değişmez
+            self.release()
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            # Hedef süreyi aştıktan sonra iptal edilen istek (deadline) yavaşlık işaretidir;
+            # daha önce iptal edilen (istemci gitti, hedge kaybetti) limiti etkilemez
+            elapsed = timer.elapsed
+            if elapsed > self.latency_target:
+                self.release(elapsed, ok=False)
+            else:
+                self.release()
+            raise
+        except BaseException:
+            self.release(timer.elapsed, ok=False)
+            raise
+        self.release(timer.elapsed, ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self._in_flight,
+            "queue_depth": len(self.queue),
+            "max_queue": self.max_queue,
+            "queue": self.queue.stats(),
+            "latency_ewma_ms": round(self._latency_ewma * 1000, 1) if self._latency_ewma is not None else None,
+        }
@@ -0,0 +1,149 @@
+import math
+import re
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.models import GrammarCorrection, RewriteResponse, Word
+from app.services.text_diff import locate_phrases
+
+# Bölme noktaları, tercih sırasıyla: paragraf > cümle sonu > boşluk
+_BREAK_PATTERNS = (
+    re.compile(r"\n[^\S\n]*\n\s*"),
+    re.compile(r"(?:(?<=[.!?])|(?<=[.!?][\"')\]]))\s+"),
+    re.compile(r"\s+"),
+)
+
+
+class Chunk(NamedTuple):
+    """Orijinal metnin bir parçası; start/end orijinal metindeki indeksler"""
+
+    text: str
+    start: int
+    end: int
+
+
+def _find_break(text: str, low: int, high: int, ideal: int) -> Optional[Tuple[int, int]]:
+    """
+    text[low:high] içinde en iyi bölme noktasını bulur
+
+    Returns:
+        (parçanın bittiği indeks, sonraki parçanın başladığı indeks) veya None
+    """
+    for pattern in _BREAK_PATTERNS:
+        best = None
+        for match in pattern.finditer(text, low, high):
+            if match.start() <= low:
+                continue
+            if best is None or abs(match.start() - ideal) < abs(best[0] - ideal):
+                best = (match.start(), match.end())
+        if best is not None:
+            return best
+    return None
+
+
+def split_text(text: str, target_chars: int) -> List[Chunk]:
+    """
+    Metni en fazla target_chars uzunluğunda, birbirine yakın boyutlu parçalara böler
+
+    Parçalar paragraf, yoksa cümle, yoksa kelime sınırından kesilir; parçalar
+    arasındaki boşluk hiçbir parçaya dahil edilmez. Metin zaten kısaysa tek parça döner.
+    """
+    start = len(text) - len(text.lstrip())
+    end = len(text.rstrip())
+    chunks: List[Chunk] = []
+
+    while end - start > target_chars:
+        # Kalan metni eşit dağıtmak için ideal parça boyu (son parça çok küçük kalmasın)
+        remaining = end - start
+        size = remaining / math.ceil(remaining / target_chars)
+        ideal = start + int(size)
+
+        found = _find_break(text, start + int(size / 2), start + target_chars, ideal)
+        if found is None:
+            # Hiç boşluk yok: sert kes
+            found = (start + target_chars, start + target_chars)
+        chunk_end, next_start = found
+        chunks.append(Chunk(text[start:chunk_end], start, chunk_end))
+        start = next_start
+
+    if end > start:
+        chunks.append(Chunk(text[start:end], start, end))
+    return chunks
+
+
+def _unique(items: Iterable[str]) -> List[str]:
+    """Sırayı koruyarak tekrarları atar (büyük/küçük harf ve baştaki/sondaki boşluk yok sayılır)"""
+    seen = set()
+    result = []
+    for item in items:
+        key = item.strip().casefold()
+        if key not in seen:
+            seen.add(key)
+            result.append(item)
+    return result
+
+
+def _locate_corrections(chunk: Chunk, response: RewriteResponse) -> List[GrammarCorrection]:
+    """
+    Parçanın düzeltmelerinin orijinal metindeki yerini (start/end) bulur
+
+    Düzeltmeler metindeki sırayla gelir; her arama bir öncekinin bittiği yerden başlar,
+    parçanın hizalaması varsa değişen bir span'a denk gelen geçiş tercih edilir.
+    Metinde bulunamayan düzeltmenin start/end'i boş kalır.
+    """
+    changed = [(span.original_start, span.original_end) for span in response.alignment if span.op != "equal"]
+    located = locate_phrases(chunk.text, [correction.original for correction in response.grammar_corrections], changed)
+    return [
+        correction if location is None else correction.model_copy(update={
+            "start": chunk.start + location[0],
+            "end": chunk.start + location[1],
+        })
+        for correction, location in zip(response.grammar_corrections, located)
+    ]
+
+
+def merge_responses(
+    user_text: str,
+    ielts_level: int,
+    chunks: Sequence[Chunk],
+    responses: Sequence[RewriteResponse],
+) -> RewriteResponse:
+    """
+    Parça sonuçlarını tek bir RewriteResponse'ta birleştirir
+
+    - rewritten_text: parçalar orijinal metindeki ayraçlarıyla (paragraf / boşluk) birleştirilir
+    - grammar_corrections: sırayla, orijinal metindeki konumlarıyla
+    - new_words / tips / strengths / weaknesses: tekrarlar atılarak
+    - overall_feedback: farklı değerlendirmeler sırayla birleştirilir
+    """
+    rewritten = []
+    for index, (chunk, response) in enumerate(zip(chunks, responses)):
+        if index > 0:
+            separator = user_text[chunks[index - 1].end:chunk.start]
+            rewritten.append(separator if "\n" in separator else " ")
+        rewritten.append(response.rewritten_text.strip())
+
+    corrections: List[GrammarCorrection] = []
+    for chunk, response in zip(chunks, responses):
+        corrections.extend(_locate_corrections(chunk, response))
+
+    words: List[Word] = []
+    seen_words = set()
+    for response in responses:
+        for word in response.new_words:
+            key = word.english_word.strip().casefold()
+            if key not in seen_words:
+                seen_words.add(key)
+                words.append(word)
+
+    return RewriteResponse(
+        original_text=user_text,
+        grammar_corrections=corrections,
+        rewritten_text="".join(rewritten),
+        new_words=words,
+        writing_tips=_unique(tip for r in responses for tip in r.writing_tips),
+        strengths=_unique(item for r in responses for item in r.strengths),
+        weaknesses=_unique(item for r in responses for item in r.weaknesses),
+        overall_feedback=" ".join(_unique(r.overall_feedback for r in responses)),
+        ielts_level=ielts_level,
+        truncated=any(r.truncated for r in responses),
+    )
@@ -0,0 +1,187 @@
+import heapq
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.admission import Waiter
+
+DEFAULT_CLASS = "interactive"
+ANONYMOUS_USER = "anonymous"
+
+
+class _Flow:
+    """Bir sınıf içindeki tek kullanıcının kuyruğu"""
+
+    __slots__ = ("finish", "queued")
+
+    def __init__(self):
+        self.finish = 0.0  # Son eklenen isteğin sanal bitiş zamanı
+        self.queued = 0
+
+
+class _Class:
+    """
+    Bir trafik sınıfının kullanıcılar arası adil kuyruğu (start-time fair queueing)
+
+    Her isteğe start = max(sınıfın sanal zamanı, kullanıcının son bitişi) etiketi verilir
+    ve en küçük start önce çıkar: çok istek gönderen kullanıcının istekleri ileriye
+    yazılır, yeni gelen kullanıcı sıranın başına yakın girer.
+    """
+
+    __slots__ = ("name", "weight", "heap", "flows", "virtual_time", "queued", "tag", "finish")
+
+    def __init__(self, name: str, weight: float):
+        self.name = name
+        self.weight = weight
+        self.heap: List[Tuple[float, int, Waiter]] = []
+        self.flows: Dict[str, _Flow] = {}
+        self.virtual_time = 0.0
+        self.queued = 0
+        # Sınıflar arası seviyede: sıradaki çıkışın etiketi ve son bitiş
+        self.tag = 0.0
+        self.finish = 0.0
+
+
+class WeightedFairQueue:
+    """
+    Sınıf ağırlıklı, sınıf içinde kullanıcı başına adil bekleme kuyruğu (FifoQueue arayüzü)
+
+    İki seviyeli:
+    - Sınıflar (örn. interactive / batch) kapasiteyi ağırlıkları oranında paylaşır;
+      batch kuyruğu ne kadar uzun olursa olsun interactive payını alır
+    - Sınıf içinde her kullanıcı eşit pay alır; bir kullanıcının çok sayıda / uzun
+      isteği diğerlerinin isteklerini arkaya itmez
+
+    Waiter.meta: class (varsayılan interactive), user (varsayılan anonymous) ve
+    cost (isteğin maliyeti, örn. metin uzunluğuna göre; varsayılan 1).
+    Kuyruk doluyken gelen isteğe yer açmak için en çok beklemesi olan kullanıcının
+    son isteği çıkarılabilir (evict_for).
+    """
+
+    def __init__(self, weights: Dict[str, float]):
+        self._classes: Dict[str, _Class] = {
+            name: _Class(name, max(weight, 1e-6)) for name, weight in weights.items()
+        }
+        self._default_class = DEFAULT_CLASS if DEFAULT_CLASS in self._classes else next(iter(self._classes))
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        # Kuyruktan çıkarılmış (timeout / iptal / evict) ama heap'te duran waiter'lar
+        self._removed: set = set()
+        self._length = 0
+
+    def _class_of(self, waiter: Waiter) -> _Class:
+        return self._classes.get(waiter.meta.get("class"), self._classes[self._default_class])
+
+    @staticmethod
+    def _user_of(waiter: Waiter) -> str:
+        return waiter.meta.get("user") or ANONYMOUS_USER
+
+    @staticmethod
+    def _cost_of(waiter: Waiter) -> float:
+        return max(float(waiter.meta.get("cost", 1.0)), 1e-6)
+
+    def push(self, waiter: Waiter) -> None:
+        klass = self._class_of(waiter)
+        flow = klass.flows.get(self._user_of(waiter))
+        if flow is None:
+            flow = klass.flows[self._user_of(waiter)] = _Flow()
+
+        start = max(klass.virtual_time, flow.finish)
+        flow.finish = start + self._cost_of(waiter)
+        flow.queued += 1
+        heapq.heappush(klass.heap, (start, next(self._sequence), waiter))
+
+        if klass.queued == 0:
+            # Boştan dolan sınıf biriktirdiği payla değil, şimdiki sanal zamandan başlar
+            klass.tag = max(self._virtual_time, klass.finish)
+        klass.queued += 1
+        self._length += 1
+
+    def pop(self) -> Optional[Waiter]:
+        while self._length:
+            klass = min(
+                (klass for klass in self._classes.values() if klass.queued),
+                key=lambda klass: klass.tag,
+            )
+            waiter = self._pop_class(klass)
+            if waiter is None:
+                continue
+
+            self._virtual_time = klass.tag
+            klass.finish = klass.tag + self._cost_of(waiter) / klass.weight
+            klass.tag = klass.finish
+            return waiter
+        return None
+
+    def _pop_class(self, klass: _Class) -> Optional[Waiter]:
+        while klass.heap:
+            start, _, waiter = heapq.heappop(klass.heap)
+            if waiter in self._removed:
+                self._removed.discard(waiter)
+                continue
+            klass.virtual_time = start
+            self._forget(klass, waiter)
+            return waiter
+        return None
+
+    def remove(self, waiter: Waiter) -> None:
+        klass = self._class_of(waiter)
+        flow = klass.flows.get(self._user_of(waiter))
+        if flow is None or waiter in self._removed or not any(item[2] is waiter for item in klass.heap):
+            return
+        # Heap'ten silmek O(n); pop sırasında atlanır
+        self._removed.add(waiter)
+        self._forget(klass, waiter)
+
+    def _forget(self, klass: _Class, waiter: Waiter) -> None:
+        klass.queued -= 1
+        self._length -= 1
+        user = self._user_of(waiter)
+        flow = klass.flows[user]
+        flow.queued -= 1
+        # Bekleyen isteği kalmayan ve payını tüketmiş kullanıcının kaydı tutulmaz
+        if flow.queued == 0 and flow.finish <= klass.virtual_time:
+            del klass.flows[user]
+        if klass.queued == 0:
+            # Sınıf boşaldı: heap'te sadece çıkarılmışlar kalmıştır, kullanıcı kayıtları sıfırlanır
+            self._removed.difference_update(item[2] for item in klass.heap)
+            klass.heap = []
+            klass.flows.clear()
+
+    def evict_for(self, meta: Dict[str, Any]) -> Optional[Waiter]:
+        """
+        Kuyruk doluyken meta'lı isteğe yer açmak için çıkarılacak waiter
+
+        Aynı sınıfta, gelen kullanıcıdan en az iki fazla isteği bekleyen kullanıcının
+        en son sıradaki isteği seçilir; böyle biri yoksa None (yeni istek reddedilir).
+        """
+        klass = self._classes.get(meta.get("class"), self._classes[self._default_class])
+        user = meta.get("user") or ANONYMOUS_USER
+        own = klass.flows[user].queued if user in klass.flows else 0
+
+        heaviest = max(klass.flows.items(), key=lambda item: item[1].queued, default=None)
+        if heaviest is None or heaviest[0] == user or heaviest[1].queued < own + 2:
+            return None
+
+        victims = [
+            item for item in klass.heap
+            if item[2] not in self._removed and self._user_of(item[2]) == heaviest[0]
+        ]
+        waiter = max(victims, key=lambda item: (item[0], item[1]))[2]
+        self.remove(waiter)
+        return waiter
+
+    def __len__(self) -> int:
+        return self._length
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": "weighted_fair",
+            "classes": {
+                name: {
+                    "weight": klass.weight,
+                    "queued": klass.queued,
+                    "users_queued": sum(1 for flow in klass.flows.values() if flow.queued),
+                }
+                for name, klass in self._classes.items()
+            },
+        }
@@ -1,174 +1,302 @@
-import json
-import re
+import asyncio
 import logging
-import google.generativeai as genai
-from typing import Dict, Any
+import time
+from typing import Dict, Any, List, Optional, AsyncIterator, Sequence, Tuple
+from pydantic import TypeAdapter, ValidationError
 from app.config import get_settings
-from app.prompts.ielts_prompts import get_rewrite_prompt, get_rewrite_prompt
- 
+from app.metrics import REWRITE_CACHE_LOOKUPS, REWRITE_JSON_PARSES, REWRITE_STAGE_SECONDS
+from app.models import AlignmentSpan, RewriteResponse
+from app.services.admission import AdaptiveLimiter, AdmissionRejected
+from app.services.chunking import Chunk, merge_responses, split_text
+from app.services.fair_queue import WeightedFairQueue
+from app.services.llm_backends import LLMBackend
+from app.services.model_router import ModelRouter
+from app.services.quota import QuotaReservation, QuotaScheduler
+from app.services.resilience import (
+    AttemptClock,
+    CircuitBreaker,
+    CircuitOpenError,
+    MalformedResponseError,
+    ResiliencePolicy,
+)
+from app.services.rewrite_cache import RewriteCache, get_multi_level_prompt_version, make_cache_key
+from app.services.shared_cache import SharedRewriteCache, default_shared_cache_path
+from app.services.singleflight import SingleFlight
+from app.services.json_extractor import IncrementalJsonExtractor
+from app.services.json_repair import parse_with_repair
+from app.prompts.ielts_prompts import get_multi_level_static_prefix, get_static_prefix, get_user_prompt
+from app.services.lexicon import get_lexicon
+from app.services.text_diff import align_texts, locate_phrases
+from app.services.vocabulary import lexical_stats, refine_new_words
+
 # Logger konfigürasyonu
 logger = logging.getLogger(__name__)
 
+# Model çıktısını tek geçişte doğrulayıp RewriteResponse'a dönüştüren, bir kere derlenen validator
+_RESPONSE_ADAPTER = TypeAdapter(RewriteResponse)
+
+# Response'a model çıktısından değil istekten gelen / istekten hesaplanan alanlar (cache'lenmez)
+_REQUEST_FIELDS = {"original_text", "ielts_level", "lexical_stats", "alignment", "truncated"}
+
+
+def _validate_cached_output(output: Dict[str, Any]) -> None:
+    """Paylaşılan cache kaydı RewriteResponse'a dönüşebiliyor mu (değilse ValidationError)"""
+    _RESPONSE_ADAPTER.validate_python({**output, "original_text": "", "ielts_level": 6})
+
+
+def _format_validation_errors(error: ValidationError, limit: int = 5) -> str:
+    """Pydantic hatalarını 'new_words.0.turkish_meaning: Field required' biçiminde özetler"""
+    parts = []
+    for err in error.errors()[:limit]:
+        location = ".".join(str(part) for part in err["loc"]) or "root"
+        parts.append(f"{location}: {err['msg']}")
+    if error.error_count() > limit:
+        parts.append(f"(+{error.error_count() - limit} hata daha)")
+    return "; ".join(parts)
+
 class GeminiService:
     """
     Gemini API ile iletişim kuran servis
     
     Sorumlulukları:
-    - API konfigürasyonu
-    - Prompt gönderme
+    - Backend seçimi (ModelRouter)
+    - Cache / istek birleştirme / concurrency limiti
     - Response parsing
     - Error handling
     """
     
-    def __init__(self):
+    def __init__(self, router: Optional[ModelRouter] = None):
         settings = get_settings()
         
-        # Gemini'yi konfigüre et
-        genai.configure(api_key=settings.gemini_api_key)
-        
-        # Model instance'ı oluştur
-        self.model = genai.GenerativeModel(
-            settings.gemini_model,
-            generation_config={
-                "temperature": 0.7,  # Yaratıcılık seviyesi
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 8192,
-            }
+        # Model konfigürasyonları ve routing (LLM_BACKEND, GEMINI_*_MODEL, ROUTER_*)
+        self.router = router or ModelRouter.from_settings(settings)
+        
+        # Aynı metin + seviye + model + prompt için sonuç cache'i
+        self.cache: Optional[RewriteCache] = None
+        if settings.rewrite_cache_enabled:
+            self.cache = RewriteCache(
+                max_entries=settings.rewrite_cache_max_entries,
+                max_bytes=settings.rewrite_cache_max_bytes,
+                ttl_seconds=settings.rewrite_cache_ttl_seconds,
+            )
+        
+        # Worker'lar arası paylaşılan cache (L2): L1'de olmayan sonuçlar diğer
+        # worker'ların ürettiklerinden gelebilir
+        self.shared_cache: Optional[SharedRewriteCache] = None
+        if self.cache is not None and settings.rewrite_cache_shared_enabled:
+            self.shared_cache = SharedRewriteCache(
+                path=settings.rewrite_cache_shared_path or default_shared_cache_path(),
+                max_bytes=settings.rewrite_cache_shared_max_bytes,
+                ttl_seconds=settings.rewrite_cache_ttl_seconds,
+                validate=_validate_cached_output,
+            )
+        
+        # Event loop'u bloklamadan aynı anda Gemini'de bekleyebilecek istek sayısı.
+        # Gerçek limit gözlenen gecikmeye göre [admission_min_limit, max_concurrency]
+        # arasında ayarlanır; fazlası sınırlı kuyrukta bekler, kuyruk doluysa reddedilir
+        self.max_concurrency = max(1, settings.gemini_max_concurrency)
+        # Kuyruk sırası: kullanıcı başına adil, interactive istekler batch'ten ağırlıklı
+        queue = None
+        if settings.admission_fair_queue_enabled:
+            queue = WeightedFairQueue({
+                "interactive": settings.admission_interactive_weight,
+                "batch": settings.admission_batch_weight,
+            })
+        self.cost_chars = max(1, settings.admission_cost_chars)
+        self.limiter = AdaptiveLimiter(
+            max_limit=self.max_concurrency,
+            min_limit=settings.admission_min_limit,
+            initial_limit=settings.admission_initial_limit or None,
+            latency_target=settings.admission_latency_target_ms / 1000,
+            backoff_ratio=settings.admission_backoff_ratio,
+            max_queue=settings.admission_max_queue,
+            queue_timeout=settings.admission_queue_timeout_seconds,
+            queue=queue,
         )
         
-        logger.info(f"GeminiService initialized with model: {settings.gemini_model}")
+        # Aynı anda gelen birebir aynı istekler tek Gemini çağrısını paylaşır
+        self.singleflight = SingleFlight()
         
-    # JSON response'unu temizle
-    def _clean_json_response(self, text: str) -> str:
-        """
-        AI response'undan JSON'u temizler
+        # Backend başına deadline / retry / circuit breaker
+        self.policies: Dict[str, ResiliencePolicy] = {
+            name: self._make_policy(backend, settings) for name, backend in self.router.backends.items()
+        }
+        self.hedge_enabled = settings.resilience_hedge_enabled
+        self.hedge_min_delay = settings.resilience_hedge_min_delay_ms / 1000
         
-        AI bazen şöyle döner:
-        ```json
-            {"key": "value"}
-        ```
+        # Model başına RPM / TPM kotası: istekler kota hızında gönderilir (proje kotası worker'lara bölünür)
+        self.quotas: Dict[str, QuotaScheduler] = {}
+        if settings.gemini_quota_rpm > 0 or settings.gemini_quota_tpm > 0:
+            workers = max(1, settings.workers)
+            for backend in self.router.backends.values():
+                if backend.model_name not in self.quotas:
+                    self.quotas[backend.model_name] = QuotaScheduler(
+                        backend.model_name,
+                        rpm=settings.gemini_quota_rpm / workers,
+                        tpm=settings.gemini_quota_tpm / workers,
+                        headroom=settings.gemini_quota_headroom,
+                        burst_seconds=settings.gemini_quota_burst_seconds,
+                        max_wait=settings.gemini_quota_max_wait_seconds,
+                        output_base_tokens=settings.gemini_quota_output_tokens,
+                    )
         
-        Biz sadece {...} istiyoruz
-        """
-        # Markdown code block'ları temizle
-        text = re.sub(r'```json\s*', '', text)
-        text = re.sub(r'```\s*', '', text)
+        # new_words'ü orijinal metne göre süzmek ve kelime istatistikleri için frekans sözlüğü
+        self.lexicon = get_lexicon(settings.lexicon_path) if settings.lexicon_enabled else None
+        self.min_new_word_rank = settings.lexicon_min_new_word_rank
+        self.lexicon_stats_enabled = settings.lexicon_stats_enabled
+        
+        # Orijinal / yeniden yazılmış metin hizalaması ve düzeltmelerin konumları
+        self.alignment_enabled = settings.rewrite_alignment_enabled
+        
+        # Uzun metinler parçalara bölünüp paralel dönüştürülür (0: kapalı)
+        self.chunk_min_chars = settings.chunking_min_chars if settings.chunking_enabled else 0
+        self.chunk_target_chars = max(1, settings.chunking_target_chars)
         
-        # Başındaki/sonundaki boşlukları temizle
-        text = text.strip()
+        # Birden fazla seviye istendiğinde cache'te olmayanlar tek üretimle dönüştürülür
+        self.levels_combined_enabled = settings.levels_combined_enabled
         
-        return text
+        backends = ", ".join(f"{name}={backend.model_name}" for name, backend in self.router.backends.items())
+        logger.info(
+            f"GeminiService initialized with backends: {backends} "
+            f"(max concurrency: {self.max_concurrency})"
+        )
     
-    def _validate_response(self, data: Dict[str, Any]) -> bool:
-        """
-        AI response'unun doğru formatta olduğunu kontrol eder
+    def _make_policy(self, backend: LLMBackend, settings) -> ResiliencePolicy:
+        return ResiliencePolicy(
+            breaker=CircuitBreaker(
+                backend.name,
+                failure_threshold=settings.circuit_failure_threshold,
+                recovery_timeout=settings.circuit_recovery_seconds,
+            ),
+            attempt_timeout=settings.resilience_attempt_timeout_seconds,
+            total_timeout=settings.resilience_total_timeout_seconds,
+            max_attempts=settings.resilience_max_attempts,
+            backoff_base=settings.resilience_backoff_base_ms / 1000,
+            backoff_max=settings.resilience_backoff_max_ms / 1000,
+            on_attempt=lambda latency, ok: self.router.record(backend, latency, ok),
+            neutral_errors=(AdmissionRejected,),
+        )
+    
+    def _hedge_delay(self, backend: LLMBackend) -> Optional[float]:
+        """Hedge isteğinin gönderileceği süre: backend'in gözlenen p95'i (yeterli veri yoksa hedge yok)"""
+        if not self.hedge_enabled:
+            return None
         
-        Beklenen format:
-        {
-            "rewritten_text": str,
-            "grammar_corrections": [{"original": str, "corrected": str, "explanation": str}],
-            "new_words": [{"english_word": str, "turkish_meaning": str}]
-            "writing_tips": [str],
-            "strengths": [str],
-            "weaknesses": [str],
-            "overall_feedback": str
-        }
-        """
-        if not isinstance(data, dict):
-            return False
+        tracker = self.router.tracker(backend)
+        if tracker.count < self.router.min_samples:
+            return None
         
-        # Gerekli alanları kontrol et
-        if "rewritten_text" not in data or "new_words" not in data:
-            logger.error(f"Missing required fields. Got: {data.keys()}")
-            return False
+        p95 = tracker.percentile(0.95)
+        return max(p95, self.hedge_min_delay) if p95 is not None else None
+    
+    def cache_key(self, user_text: str, ielts_level: int, backend: Optional[LLMBackend] = None) -> str:
+        """Backend'in model/konfigürasyonu için rewrite cache key'i (varsayılan: default backend)"""
+        backend = backend or self.router.default
+        # Structured output modu SDK yüklenince belli olur ve generation config'i değiştirir
+        backend.initialize()
+        return make_cache_key(user_text, ielts_level, backend.model_name, backend.generation_config)
+    
+    def levels_cache_key(
+        self, user_text: str, ielts_level: int, ielts_levels: Tuple[int, ...], backend: LLMBackend
+    ) -> str:
+        """ielts_levels'in birleşik üretiminden gelen seviyenin key'i (/rewrite key'lerinden ayrı)"""
+        backend.initialize()
+        return make_cache_key(
+            user_text,
+            ielts_level,
+            backend.model_name,
+            backend.generation_config,
+            prompt_version=get_multi_level_prompt_version(ielts_levels),
+        )
+    
+    def _get_cached(self, backend: LLMBackend, user_text: str, ielts_level: int):
+        """(cache_key, cache'teki model çıktısı veya None) döndürür; L1'de yoksa L2'ye bakar"""
+        key = self.cache_key(user_text, ielts_level, backend)
+        output = self._get_local(key, ielts_level)
+        if output is None and self.shared_cache is not None:
+            output = self._promote(key, ielts_level, self.shared_cache.get(key))
+        return key, output
+    
+    async def _get_cached_async(
+        self, backend: LLMBackend, user_text: str, ielts_level: int, levels: Optional[Tuple[int, ...]] = None
+    ):
+        """
+        _get_cached'in event loop'u bloklamayan versiyonu (SDK yüklemesi ve L2 okuması thread'de yapılır)
         
-        # rewritten_text string mi?
-        if not isinstance(data["rewritten_text"], str):
-            logger.error("rewritten_text is not a string")
-            return False
+        levels verilirse o seviye kümesinin birleşik üretim kaydına bakılır (levels_cache_key)
+        """
+        if not backend.initialized:
+            await asyncio.to_thread(backend.initialize)
+        if levels is None:
+            key = self.cache_key(user_text, ielts_level, backend)
+        else:
+            key = self.levels_cache_key(user_text, ielts_level, levels, backend)
+        output = self._get_local(key, ielts_level)
+        if output is None and self.shared_cache is not None:
+            output = self._promote(key, ielts_level, await asyncio.to_thread(self.shared_cache.get, key))
+        return key, output
+    
+    def _get_local(self, key: str, ielts_level: int) -> Optional[Dict[str, Any]]:
+        if self.cache is None:
+            return None
         
+        output = self.cache.get(key)
+        if output is not None:
+            REWRITE_CACHE_LOOKUPS.inc(result="hit")
+            logger.info(f"Rewrite cache hit for IELTS level {ielts_level}")
+        elif self.shared_cache is None:
+            REWRITE_CACHE_LOOKUPS.inc(result="miss")
+        return output
+    
+    def _promote(self, key: str, ielts_level: int, output: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """L2 sonucunu sayar; bulunduysa sonraki istekler için L1'e kopyalar"""
+        REWRITE_CACHE_LOOKUPS.inc(result="miss" if output is None else "shared_hit")
+        if output is not None:
+            logger.info(f"Shared rewrite cache hit for IELTS level {ielts_level}")
+            self.cache.set(key, output)
+        return output
+    
+    def _store(self, cache_key: str, response: RewriteResponse) -> None:
+        """Response'un istekten bağımsız kısmını (model çıktısı) L1 ve L2 cache'e yazar"""
+        if self.cache is not None:
+            output = response.model_dump(exclude=_REQUEST_FIELDS)
+            self.cache.set(cache_key, output)
+            if self.shared_cache is not None:
+                self.shared_cache.set(cache_key, output)
+    
+    async def _store_async(self, cache_key: str, response: RewriteResponse) -> None:
+        """_store'un event loop'u bloklamayan versiyonu (L2 yazması thread'de yapılır)"""
+        if self.cache is not None:
+            output = response.model_dump(exclude=_REQUEST_FIELDS)
+            self.cache.set(cache_key, output)
+            if self.shared_cache is not None:
+                await asyncio.to_thread(self.shared_cache.set, cache_key, output)
+    
+    async def warm_up(self, probe: bool = False) -> None:
+        """
+        Tüm backend'leri ilk istekten önce hazırlar (SDK yüklemesi, seviye model'leri)
 
-        # grammar_corrections liste mi?
-        if not isinstance(data["grammar_corrections"], list):
-            logger.error("grammar_corrections is not a list")
-            return False
-        
-        # Her grammar correction doğru formatta mı?
-        for correction in data["grammar_corrections"]:
-            if not isinstance(correction, dict):
-                return False
-            if "original" not in correction or "corrected" not in correction or "explanation" not in correction:
-                return False
-        
-        # writing_tips liste mi?
-        if not isinstance(data["writing_tips"], list):
-            logger.error("writing_tips is not a list")
-            return False
-        
-        # Her writing tip string mi?
-        for tip in data["writing_tips"]:
-            if not isinstance(tip, str):
-                return False
-        
-        # strengths liste mi?
-        if not isinstance(data["strengths"], list):
-            logger.error("strengths is not a list")
-            return False
-        
-        # Her strength string mi?
-        for strength in data["strengths"]:
-            if not isinstance(strength, str):
-                return False
-        
-        # weaknesses liste mi?
-        if not isinstance(data["weaknesses"], list):
-            logger.error("weaknesses is not a list")
-            return False
-        
-        # Her weakness string mi?
-        for weakness in data["weaknesses"]:
-            if not isinstance(weakness, str):
-                return False
-        
-        # overall_feedback string mi?
-        if not isinstance(data["overall_feedback"], str):
-            logger.error("overall_feedback is not a string")
-            return False
-        
-        # new_words liste mi?
-        if not isinstance(data["new_words"], list):
-            logger.error("new_words is not a list")
-            return False
-        
-        # Her kelime doğru formatta mı?
-        for word in data["new_words"]:
-            if not isinstance(word, dict):
-                return False
-            if "english_word" not in word or "turkish_meaning" not in word:
-                return False
-        
-        return True
-    
-    def rewrite_text(self, user_text: str, ielts_level: int) -> Dict[str, Any]:
+        Args:
+            probe: Backend'lere bağlantıyı açan ucuz bir çağrı da yapılsın mı
+        """
+        await asyncio.gather(*(backend.warm_up(probe) for backend in self.router.backends.values()))
+    
+    @property
+    def in_flight(self) -> int:
+        """Şu an Gemini'de bekleyen async istek sayısı"""
+        return self.limiter.in_flight
+    
+    def rewrite_text(self, user_text: str, ielts_level: int) -> RewriteResponse:
         """
         Metni IELTS seviyesine göre yeniden yazar
         
         Args:
             user_text: Kullanıcının orijinal metni
             ielts_level: Hedef IELTS seviyesi (6-9)
-            
+        
         Returns:
-            {
-                "rewritten_text": str,
-                "grammar_corrections": [{"original": str, "corrected": str, "explanation": str}],
-                "new_words": [{"english_word": str, "turkish_meaning": str}],
-                "writing_tips": [str],
-                "strengths": [str],
-                "weaknesses": [str],
-                "overall_feedback": str
-            }
-            
+            Doğrulanmış RewriteResponse (grammar_corrections dahil)
+        
         Raises:
             ValueError: JSON parse hatası veya validation hatası
             Exception: Gemini API hatası
@@ -178,40 +306,670 @@ class GeminiService:
             logger.info(f"Rewriting text to IELTS level {ielts_level}")
             logger.debug(f"Original text length: {len(user_text)} chars")
             
-            # 1. Prompt'u oluştur
-            prompt = get_rewrite_prompt(user_text, ielts_level)
+            # 0. Backend seç ve cache kontrolü
+            backend = self.router.route(user_text, ielts_level)
+            cache_key, cached = self._get_cached(backend, user_text, ielts_level)
+            if cached is not None:
+                return self._to_response(cached, user_text, ielts_level)
             
-            # 2. Gemini'ye gönder
-            logger.info("Sending request to Gemini API...")
-            response = self.model.generate_content(prompt)
+            # 1-2. Prompt'u oluştur ve Gemini'ye gönder
+            logger.info(f"Sending request to '{backend.name}' backend ({backend.model_name})...")
+            started = time.perf_counter()
+            try:
+                with REWRITE_STAGE_SECONDS.time(stage="llm_call"):
+                    text = backend.generate_sync(user_text, ielts_level)
+                
+                # 3-6. Response'u parse et ve doğrula
+                result, complete = self._parse_text(text, user_text, ielts_level)
+            except Exception:
+                self.router.record(backend, time.perf_counter() - started, ok=False)
+                raise
+            self.router.record(backend, time.perf_counter() - started, ok=True)
             
-            # 3. Response kontrolü
-            if not response or not response.text:
-                logger.error("Empty response from Gemini")
-                raise ValueError("Gemini API boş yanıt döndü")
+            # 7. Cache'e yaz (kesilmiş yanıttan kurtarılan sonuç cache'lenmez)
+            if complete:
+                self._store(cache_key, result)
             
-            logger.debug(f"Raw response: {response.text[:200]}...")  # İlk 200 char
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error in rewrite_text: {str(e)}", exc_info=True)
+            raise
+    
+    async def rewrite_text_async(
+        self, user_text: str, ielts_level: int, caller: Optional[Dict[str, Any]] = None
+    ) -> RewriteResponse:
+        """
+        rewrite_text'in event loop'u bloklamayan versiyonu
+        
+        Aynı anda Gemini'de bekleyen istek sayısı adaptif limiter ile sınırlıdır,
+        fazlası kuyrukta sırasını bekler. Aynı anda gelen birebir aynı istekler tek
+        bir Gemini çağrısını paylaşır. chunking_min_chars'tan uzun metinler
+        paragraf/cümle sınırlarından bölünüp parçalar aynı anda dönüştürülür.
+        
+        Args:
+            caller: Kuyruk sırası için {"user": kullanıcı id, "class": "interactive" | "batch"}
+        
+        Returns: rewrite_text ile aynı
+        
+        Raises:
+            AdmissionRejected: Kuyruk dolu veya kuyrukta bekleme süresi aşıldı (429)
+            CircuitOpenError: Backend art arda hata verdi, devre açık (503)
+            asyncio.TimeoutError: Tüm denemeler deadline'ı aştı (504)
+            ValueError / Exception: rewrite_text ile aynı
+        """
+        
+        try:
+            logger.info(f"Rewriting text to IELTS level {ielts_level} (async)")
+            logger.debug(f"Original text length: {len(user_text)} chars")
             
-            # 4. JSON temizle
-            cleaned_text = self._clean_json_response(response.text)
+            if self.chunk_min_chars and len(user_text) >= self.chunk_min_chars:
+                chunks = split_text(user_text, self.chunk_target_chars)
+                if len(chunks) > 1:
+                    return await self._rewrite_chunked_async(user_text, ielts_level, chunks, caller)
             
-            # 5. JSON parse et
-            try:
-                result = json.loads(cleaned_text)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON parse error: {e}")
-                logger.error(f"Problematic text: {cleaned_text[:500]}")
-                raise ValueError(f"AI yanıtı JSON formatında değil: {str(e)}")
+            return await self._rewrite_single_async(user_text, ielts_level, caller)
+        
+        except (AdmissionRejected, CircuitOpenError) as e:
+            # Aşırı yükte / backend çökmüşken her reddi traceback'le loglamak yükü artırır
+            logger.warning(f"Rejected in rewrite_text_async: {str(e)} (retry after {e.retry_after}s)")
+            raise
+        except Exception as e:
+            logger.error(f"Error in rewrite_text_async: {str(e)}", exc_info=True)
+            raise
+    
+    async def _rewrite_single_async(
+        self,
+        user_text: str,
+        ielts_level: int,
+        caller: Optional[Dict[str, Any]] = None,
+        backend: Optional[LLMBackend] = None,
+    ) -> RewriteResponse:
+        """
+        Metni tek parça olarak dönüştürür (cache, singleflight, resilience dahil)
+        
+        backend verilmezse metne göre seçilir; parçalar tüm metin için seçilen backend'i alır
+        """
+        # 0. Backend seç ve cache kontrolü - hit'te prompt bile oluşturulmaz
+        backend = backend or self.router.route(user_text, ielts_level)
+        cache_key, cached = await self._get_cached_async(backend, user_text, ielts_level)
+        if cached is not None:
+            return self._to_response(cached, user_text, ielts_level)
+        
+        # Aynı key ile çalışan bir istek varsa onun sonucunu bekle
+        result = await self.singleflight.do(
+            cache_key,
+            lambda: self._rewrite_uncached_async(backend, user_text, ielts_level, cache_key, caller)
+        )
+        
+        # Birleştirilen istekler metni farklı boşluklarla göndermiş olabilir;
+        # konumlar bu isteğin metnine göre yeniden hesaplanır
+        if result.original_text != user_text:
+            result = self._refine(result.model_copy(update={"original_text": user_text}))
+        
+        return result
+    
+    async def _rewrite_chunked_async(
+        self, user_text: str, ielts_level: int, chunks: List[Chunk], caller: Optional[Dict[str, Any]] = None
+    ) -> RewriteResponse:
+        """
+        Parçaları aynı anda dönüştürür ve sonuçları birleştirir
+        
+        Her parça ayrı cache'lenir: bir parça başarısız olursa istek hata döner ama
+        biten parçalar cache'te kalır, tekrar denemede sadece eksik parçalar gönderilir.
+        Backend tüm metnin uzunluğuna göre bir kere seçilir (parçalar router_long_text_chars'tan
+        kısadır); böylece parçalar aynı modelden gelir.
+        """
+        logger.info(f"Long text ({len(user_text)} chars) split into {len(chunks)} chunks")
+        backend = self.router.route(user_text, ielts_level)
+        results = await asyncio.gather(
+            *(self._rewrite_single_async(chunk.text, ielts_level, caller, backend) for chunk in chunks)
+        )
+        # Parçalar kendi metinlerine göre süzüldü; birleşik sonuç tüm metne göre tekrar süzülür
+        return self._refine(merge_responses(user_text, ielts_level, chunks, results))
+    
+    async def rewrite_levels_async(
+        self, user_text: str, ielts_levels: Sequence[int], caller: Optional[Dict[str, Any]] = None
+    ) -> List[RewriteResponse]:
+        """
+        Metni birden fazla IELTS seviyesine dönüştürür
+        
+        Önce her seviyenin /rewrite cache'ine (seviyenin kendi backend'iyle) bakılır.
+        Eksik seviyeler tek bir birleşik üretimle dönüştürülür: grammar düzeltmeleri
+        ve analiz bir kere, rewritten_text ve new_words seviye başına. Birleşik
+        üretimin sonuçları kendi prompt versiyonuyla (seviye kümesine göre) cache'lenir:
+        "Bands 6, 8" için yazılmış feedback /rewrite'a dönmez. Tek seviye eksikse
+        veya birleşik çıktı max_output_tokens'a sığmayacak kadar uzunsa (metin
+        uzunluğu × seviye sayısı >= chunking_min_chars) seviyeler ayrı ayrı
+        rewrite_text_async ile dönüştürülür.
+        
+        Returns: ielts_levels sırasıyla rewrite_text_async sonuçları
+        
+        Raises: rewrite_text_async ile aynı
+        """
+        ielts_levels = tuple(ielts_levels)
+        if (
+            not self.levels_combined_enabled
+            or len(ielts_levels) == 1
+            or (self.chunk_min_chars and len(user_text) * len(ielts_levels) >= self.chunk_min_chars)
+        ):
+            return list(await asyncio.gather(
+                *(self.rewrite_text_async(user_text, ielts_level, caller) for ielts_level in ielts_levels)
+            ))
+        
+        try:
+            logger.info(f"Rewriting text to IELTS levels {list(ielts_levels)} (async)")
             
-            # 6. Validate et
-            if not self._validate_response(result):
-                logger.error(f"Invalid response structure: {result}")
-                raise ValueError("AI yanıtı beklenen formatta değil")
+            # 0. Her seviye /rewrite'taki gibi kendi backend'iyle cache'te aranır
+            results: Dict[int, RewriteResponse] = {}
+            backends: Dict[int, LLMBackend] = {}
+            for ielts_level in ielts_levels:
+                backends[ielts_level] = self.router.route(user_text, ielts_level)
+                _, cached = await self._get_cached_async(backends[ielts_level], user_text, ielts_level)
+                if cached is not None:
+                    results[ielts_level] = self._to_response(cached, user_text, ielts_level)
             
-            logger.info(f"Successfully rewrote text. New words count: {len(result['new_words'])}")
+            missing = tuple(ielts_level for ielts_level in ielts_levels if ielts_level not in results)
+            if len(missing) == 1:
+                results[missing[0]] = await self._rewrite_single_async(
+                    user_text, missing[0], caller, backends[missing[0]]
+                )
+            elif missing:
+                results.update(await self._rewrite_levels_combined_async(user_text, missing, caller))
             
-            return result
+            return [results[ielts_level] for ielts_level in ielts_levels]
+        
+        except (AdmissionRejected, CircuitOpenError) as e:
+            logger.warning(f"Rejected in rewrite_levels_async: {str(e)} (retry after {e.retry_after}s)")
+            raise
+        except Exception as e:
+            logger.error(f"Error in rewrite_levels_async: {str(e)}", exc_info=True)
+            raise
+    
+    async def _rewrite_levels_combined_async(
+        self, user_text: str, ielts_levels: Tuple[int, ...], caller: Optional[Dict[str, Any]] = None
+    ) -> Dict[int, RewriteResponse]:
+        """
+        ielts_levels'i birleşik üretimle dönüştürür (cache, singleflight dahil)
+        
+        Backend en yüksek seviyeye göre seçilir (strong model gerekiyorsa tüm seviyeler
+        onunla). Birleşik kaydın bir kısmı cache'ten düşmüşse sadece düşen seviyeler
+        ayrı ayrı üretilir.
+        """
+        backend = self.router.route(user_text, max(ielts_levels))
+        keys: Dict[int, str] = {}
+        results: Dict[int, RewriteResponse] = {}
+        for ielts_level in ielts_levels:
+            keys[ielts_level], cached = await self._get_cached_async(backend, user_text, ielts_level, ielts_levels)
+            if cached is not None:
+                results[ielts_level] = self._to_response(cached, user_text, ielts_level)
+        
+        missing = tuple(ielts_level for ielts_level in ielts_levels if ielts_level not in results)
+        if not missing:
+            return results
+        if len(missing) < len(ielts_levels):
+            generated = await asyncio.gather(*(
+                self.singleflight.do(
+                    keys[ielts_level],
+                    lambda ielts_level=ielts_level: self._rewrite_uncached_async(
+                        backend, user_text, ielts_level, keys[ielts_level], caller
+                    ),
+                )
+                for ielts_level in missing
+            ))
+        else:
+            generated = await self.singleflight.do(
+                "levels:" + ":".join(keys[ielts_level] for ielts_level in missing),
+                lambda: self._rewrite_levels_uncached_async(backend, user_text, missing, keys, caller)
+            )
+        
+        for ielts_level, result in zip(missing, generated):
+            # Birleştirilen istekler metni farklı boşluklarla göndermiş olabilir
+            if result.original_text != user_text:
+                result = self._refine(result.model_copy(update={"original_text": user_text}))
+            results[ielts_level] = result
+        return results
+    
+    async def _rewrite_levels_uncached_async(
+        self,
+        backend: LLMBackend,
+        user_text: str,
+        ielts_levels: Tuple[int, ...],
+        keys: Dict[int, str],
+        caller: Optional[Dict[str, Any]] = None,
+    ) -> List[RewriteResponse]:
+        """
+        Seviyeleri tek üretimle dönüştürür ve her birini kendi key'iyle cache'ler
+        
+        Çıktıda eksik kalan seviyeler (model atladı / çıktı kesildi) tüm üretim
+        tekrarlanmadan tek tek üretilir.
+        """
+        # Birleşik üretim tek seviyeden uzun sürer; tek seviyenin p95'ine göre hedge edilmez
+        results, complete = await self.policies[backend.name].run(
+            lambda clock: self._attempt_levels_async(backend, user_text, ielts_levels, clock, caller)
+        )
+        
+        if complete:
+            for ielts_level, result in results.items():
+                await self._store_async(keys[ielts_level], result)
+        
+        missing = [ielts_level for ielts_level in ielts_levels if ielts_level not in results]
+        if missing:
+            logger.warning(f"Multi-level response is missing levels {missing}, generating them separately")
+            regenerated = await asyncio.gather(*(
+                self._rewrite_uncached_async(backend, user_text, ielts_level, keys[ielts_level], caller)
+                for ielts_level in missing
+            ))
+            results.update(zip(missing, regenerated))
+        
+        return [results[ielts_level] for ielts_level in ielts_levels]
+    
+    async def _attempt_levels_async(
+        self,
+        backend: LLMBackend,
+        user_text: str,
+        ielts_levels: Tuple[int, ...],
+        clock: AttemptClock,
+        caller: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Dict[int, RewriteResponse], bool]:
+        """_attempt_async'in çok seviyeli versiyonu; kuyruk maliyeti ve kota seviye sayısıyla orantılı"""
+        usage: Dict[str, int] = {}
+        reservation = None
+        prompt_chars = self._multi_level_prompt_chars(user_text, ielts_levels)
+        output_chars = len(user_text) * len(ielts_levels)
+        try:
+            # Kota slot alınmadan beklenir: kota beklerken slot tutmak diğer isteklerin önünü keser
+            reservation = await self._reserve_quota(backend, prompt_chars, output_chars)
+            async with self.limiter.slot(self._slot_meta(caller, user_text, len(ielts_levels))):
+                logger.info(
+                    f"Sending {len(ielts_levels)}-level request to '{backend.name}' backend... "
+                    f"(in flight: {self.limiter.in_flight})"
+                )
+                with REWRITE_STAGE_SECONDS.time(stage="llm_call"):
+                    text = await clock.call(lambda: backend.generate_levels(user_text, ielts_levels, usage))
+        finally:
+            self._reconcile_quota(backend, reservation, usage, prompt_chars, output_chars, clock.started is not None)
+        
+        return self._parse_levels_text(text, user_text, ielts_levels)
+    
+    async def _rewrite_uncached_async(
+        self,
+        backend: LLMBackend,
+        user_text: str,
+        ielts_level: int,
+        cache_key: str,
+        caller: Optional[Dict[str, Any]] = None,
+    ) -> RewriteResponse:
+        """Cache'te olmayan bir rewrite'ı backend'e gönderir ve sonucu cache'ler"""
+        # 1-6. Deadline / retry / hedge / circuit breaker ile dene
+        result, complete = await self.policies[backend.name].run(
+            lambda clock: self._attempt_async(backend, user_text, ielts_level, clock, caller),
+            hedge_delay=self._hedge_delay(backend),
+        )
+        
+        # 7. Cache'e yaz (kesilmiş yanıttan kurtarılan sonuç cache'lenmez)
+        if complete:
+            await self._store_async(cache_key, result)
+        
+        return result
+    
+    async def _attempt_async(
+        self,
+        backend: LLMBackend,
+        user_text: str,
+        ielts_level: int,
+        clock: AttemptClock,
+        caller: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[RewriteResponse, bool]:
+        """
+        Tek deneme: slot al, Gemini'ye gönder, yanıtı parse et ve doğrula (_parse_text ile aynı dönüş)
+        
+        Kota slot alınmadan önce ayrılır (kota beklerken slot tutulmaz). Deneme süresi
+        (timeout, breaker / hedge / routing gecikmesi) slot alındıktan sonra clock.call ile başlar.
+        """
+        # 1-2. Prompt'u oluştur ve Gemini'ye gönder (önce kota, sonra concurrency limiti)
+        usage: Dict[str, int] = {}
+        reservation = None
+        prompt_chars = self._prompt_chars(user_text, ielts_level)
+        try:
+            reservation = await self._reserve_quota(backend, prompt_chars, len(user_text))
+            async with self.limiter.slot(self._slot_meta(caller, user_text)):
+                logger.info(f"Sending request to '{backend.name}' backend... (in flight: {self.limiter.in_flight})")
+                with REWRITE_STAGE_SECONDS.time(stage="llm_call"):
+                    text = await clock.call(lambda: backend.generate(user_text, ielts_level, usage))
+        finally:
+            self._reconcile_quota(backend, reservation, usage, prompt_chars, len(user_text), clock.started is not None)
+        
+        # 3-6. Response'u parse et ve doğrula
+        return self._parse_text(text, user_text, ielts_level)
+    
+    @staticmethod
+    def _prompt_chars(user_text: str, ielts_level: int) -> int:
+        """get_rewrite_prompt'un uzunluğu (prompt oluşturulmadan)"""
+        return len(get_static_prefix(ielts_level)) + len(get_user_prompt(user_text))
+    
+    @staticmethod
+    def _multi_level_prompt_chars(user_text: str, ielts_levels: Tuple[int, ...]) -> int:
+        """get_multi_level_prompt'un uzunluğu (prompt oluşturulmadan)"""
+        return len(get_multi_level_static_prefix(ielts_levels)) + len(get_user_prompt(user_text))
+    
+    async def _reserve_quota(
+        self, backend: LLMBackend, prompt_chars: int, user_chars: int
+    ) -> Optional[QuotaReservation]:
+        """
+        Modelin RPM / TPM kotası açılana kadar bekler (kota tanımlı değilse hemen döner)
+        
+        user_chars: çıktı tahmininin orantılı olduğu kullanıcı metni uzunluğu (seviye sayısıyla çarpılmış)
+        """
+        quota = self.quotas.get(backend.model_name)
+        if quota is None:
+            return None
+        return await quota.acquire(prompt_chars, user_chars)
+    
+    def _reconcile_quota(
+        self,
+        backend: LLMBackend,
+        reservation: Optional[QuotaReservation],
+        usage: Dict[str, int],
+        prompt_chars: int,
+        user_chars: int,
+        sent: bool = True,
+    ) -> None:
+        """
+        Ayrılan tahmini token'ı usage_metadata'daki gerçek kullanımla düzeltir
+        
+        sent=False: istek backend'e hiç gönderilmedi (örn. slot alınamadı), ayrılan kota geri verilir.
+        """
+        if reservation is None:
+            return
+        if sent:
+            self.quotas[backend.model_name].reconcile(reservation, usage, prompt_chars, user_chars)
+        else:
+            self.quotas[backend.model_name].refund(reservation)
+    
+    def _slot_meta(self, caller: Optional[Dict[str, Any]], user_text: str, outputs: int = 1) -> Dict[str, Any]:
+        """Kuyruk sırası için istek bilgisi; uzun metin (ve çok seviyeli çıktı) orantılı olarak daha çok sıra harcar"""
+        return {**(caller or {}), "cost": max(1.0, len(user_text) * outputs / self.cost_chars)}
+    
+    async def rewrite_text_stream(
+        self, user_text: str, ielts_level: int, caller: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Rewrite sonucunu Gemini stream ederken alan alan üretir
+        
+        Yields:
+            ("field", {"name": str, "value": Any}) - üst seviye bir alan tamamlandıkça
+            ("result", RewriteResponse)             - en sonda, doğrulanmış tam sonuç
+        
+        Cache hit'te tüm alanlar hemen üretilir. Stream'ler singleflight ile
+        birleştirilmez ama tamamlanan sonuç cache'e yazılır. Deneme, ilk alan
+        gönderilmeden önce başarısız olduysa tekrar denenir; sonrasında hata döner.
+        
+        Raises: rewrite_text_async ile aynı
+        """
+        
+        try:
+            logger.info(f"Streaming rewrite to IELTS level {ielts_level}")
+            
+            # 0. Backend seç ve cache kontrolü
+            backend = self.router.route(user_text, ielts_level)
+            cache_key, cached = await self._get_cached_async(backend, user_text, ielts_level)
+            if cached is not None:
+                for name, value in cached.items():
+                    yield "field", {"name": name, "value": value}
+                yield "result", self._to_response(cached, user_text, ielts_level)
+                return
+            
+            policy = self.policies[backend.name]
+            deadline = policy.deadline()
+            prompt_chars = self._prompt_chars(user_text, ielts_level)
+            attempt = 1
+            while True:
+                policy.breaker.before_call()
+                extractor = IncrementalJsonExtractor()
+                chunks = []
+                yielded = False
+                usage: Dict[str, int] = {}
+                reservation = None
+                clock = AttemptClock(policy, deadline)
+                try:
+                    # 1-2. Prompt'u oluştur ve Gemini'den stream et (concurrency limiti stream boyunca tutulur)
+                    reservation = await self._reserve_quota(backend, prompt_chars, len(user_text))
+                    async with self.limiter.slot(self._slot_meta(caller, user_text)):
+                        # Deneme süresi (attempt_timeout ve toplam bütçe) her parça beklenirken uygulanır
+                        clock.start()
+                        logger.info(f"Streaming request to '{backend.name}' backend... (in flight: {self.limiter.in_flight})")
+                        stream = backend.stream(user_text, ielts_level, usage)
+                        try:
+                            while True:
+                                try:
+                                    text = await asyncio.wait_for(stream.__anext__(), timeout=clock.timeout())
+                                except StopAsyncIteration:
+                                    break
+                                chunks.append(text)
+                                if extractor is None:
+                                    continue
+                                try:
+                                    fields = extractor.feed(text)
+                                except ValueError as e:
+                                    # Bozuk alan: alan alan göndermeyi bırak, sonda onarmayı dene
+                                    logger.warning(f"Stream field is not valid JSON ({str(e)}), parsing at the end")
+                                    extractor = None
+                                    continue
+                                for name, value in fields:
+                                    yielded = True
+                                    yield "field", {"name": name, "value": value}
+                        finally:
+                            await stream.aclose()
+                        REWRITE_STAGE_SECONDS.observe(time.perf_counter() - clock.started, stage="llm_call")
+                    
+                    # 3-6. Tam objeyi doğrula; extractor obje bulamadıysa normal parse yolu
+                    # (onarım dahil) aynı hata mesajlarını üretir
+                    if extractor is not None and extractor.done:
+                        REWRITE_JSON_PARSES.inc(result="clean")
+                        result, complete = self._to_response(extractor.result(), user_text, ielts_level), True
+                    else:
+                        result, complete = self._parse_text("".join(chunks), user_text, ielts_level)
+                except (asyncio.CancelledError, GeneratorExit):
+                    policy.breaker.release_probe()
+                    raise
+                except Exception as e:
+                    if clock.started is not None:
+                        policy.record_attempt(clock.started, e)
+                    # İstemci alan almaya başladıysa tekrar denenemez
+                    await policy.handle_failure(e, attempt, can_retry=not yielded, deadline=deadline)
+                    attempt += 1
+                    continue
+                finally:
+                    self._reconcile_quota(
+                        backend, reservation, usage, prompt_chars, len(user_text), clock.started is not None
+                    )
+                
+                policy.record_attempt(clock.started)
+                policy.breaker.record_success()
+                break
+            
+            # 7. Cache'e yaz (kesilmiş yanıttan kurtarılan sonuç cache'lenmez)
+            if complete:
+                await self._store_async(cache_key, result)
             
+            yield "result", result
+        
+        except (AdmissionRejected, CircuitOpenError) as e:
+            # Aşırı yükte / backend çökmüşken her reddi traceback'le loglamak yükü artırır
+            logger.warning(f"Rejected in rewrite_text_stream: {str(e)} (retry after {e.retry_after}s)")
+            raise
         except Exception as e:
-            logger.error(f"Error in rewrite_text: {str(e)}", exc_info=True)
-            raise
\ No newline at end of file
+            logger.error(f"Error in rewrite_text_stream: {str(e)}", exc_info=True)
+            raise
+    
+    def _parse_text(self, text: str, user_text: str, ielts_level: int) -> Tuple[RewriteResponse, bool]:
+        """
+        Model çıktısı metnini JSON'a çevirir ve RewriteResponse olarak doğrular
+        
+        JSON bozuksa (fazla virgül, max_output_tokens'ta kesilme) yerelde onarılır;
+        böylece tüm üretim tekrar ödenmez.
+        
+        Returns:
+            (sonuç, tam mı) - kesilmiş çıktıdan kurtarılan sonuç eksik olabilir, cache'lenmemeli
+        
+        Raises:
+            MalformedResponseError (ValueError): Boş yanıt, JSON parse hatası veya validation hatası
+        """
+        output, complete = self._parse_output(text)
+        result = self._to_response(output, user_text, ielts_level)
+        if not complete:
+            result = result.model_copy(update={"truncated": True})
+        logger.info(f"Successfully rewrote text. New words count: {len(result.new_words)}")
+        
+        return result, complete
+    
+    def _parse_output(self, text: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        Model çıktısı metnindeki JSON objesi (gerekirse onarılarak) ve tam olup olmadığı
+        
+        Raises:
+            MalformedResponseError (ValueError): Boş yanıt veya JSON parse hatası
+        """
+        # 3. Response kontrolü
+        if not text:
+            logger.error("Empty response from Gemini")
+            raise MalformedResponseError("Gemini API boş yanıt döndü")
+        
+        logger.debug(f"Raw response: {text[:200]}...")  # İlk 200 char
+        
+        # 4-5. JSON objesini bul ve parse et (code fence / öncesi-sonrası yazı tolere edilir,
+        # bozuk JSON onarılır)
+        try:
+            with REWRITE_STAGE_SECONDS.time(stage="json_parse"):
+                output, outcome = parse_with_repair(text)
+        except ValueError as e:
+            REWRITE_JSON_PARSES.inc(result="failed")
+            logger.error(f"JSON parse error: {e}")
+            logger.error(f"Problematic text: {text[:500]}")
+            raise MalformedResponseError(f"AI yanıtı JSON formatında değil: {str(e)}")
+        
+        REWRITE_JSON_PARSES.inc(result=outcome)
+        if outcome != "clean":
+            logger.warning(f"Repaired malformed model output ({outcome}, {len(text)} chars)")
+        
+        return output, outcome != "truncated"
+    
+    def _parse_levels_text(
+        self, text: str, user_text: str, ielts_levels: Tuple[int, ...]
+    ) -> Tuple[Dict[int, RewriteResponse], bool]:
+        """
+        Çok seviyeli model çıktısını seviye başına RewriteResponse'lara ayırır
+        
+        Ortak alanlar (grammar düzeltmeleri, analiz) her seviyenin sonucuna kopyalanır.
+        Çıktıda olmayan veya geçersiz seviyeler sonuçta yer almaz (çağıran onları ayrı üretir).
+        
+        Returns: ({seviye: sonuç}, tam mı)
+        
+        Raises:
+            MalformedResponseError (ValueError): _parse_text ile aynı veya istenen seviyelerin hiçbiri kullanılamıyor
+        """
+        output, complete = self._parse_output(text)
+        
+        levels = output.pop("levels", None)
+        by_level = {
+            item.get("ielts_level"): item
+            for item in (levels if isinstance(levels, list) else [])
+            if isinstance(item, dict)
+        }
+        results: Dict[int, RewriteResponse] = {}
+        error: Optional[MalformedResponseError] = None
+        for ielts_level in ielts_levels:
+            if ielts_level not in by_level:
+                continue
+            try:
+                result = self._to_response(
+                    {
+                        **output,
+                        "rewritten_text": by_level[ielts_level].get("rewritten_text"),
+                        "new_words": by_level[ielts_level].get("new_words", []),
+                    },
+                    user_text,
+                    ielts_level,
+                )
+            except MalformedResponseError as e:
+                error = e
+                continue
+            results[ielts_level] = result.model_copy(update={"truncated": not complete})
+        
+        if not results:
+            # Ortak alanlar bozuk veya hiçbir seviye yok: tüm üretim tekrar denenir
+            raise error or MalformedResponseError(f"AI yanıtında seviye yok: {list(ielts_levels)}")
+        
+        logger.info(f"Successfully rewrote text to {len(results)}/{len(ielts_levels)} levels in one generation")
+        return results, complete
+    
+    def _to_response(self, output: Dict[str, Any], user_text: str, ielts_level: int) -> RewriteResponse:
+        """
+        Model çıktısını tek bir derlenmiş validation geçişiyle RewriteResponse'a dönüştürür
+        
+        Raises:
+            MalformedResponseError (ValueError): Çıktı beklenen formatta değilse (alan bazında hata mesajıyla)
+        """
+        # 6. Validate et
+        try:
+            with REWRITE_STAGE_SECONDS.time(stage="validation"):
+                response = _RESPONSE_ADAPTER.validate_python(
+                    {**output, "original_text": user_text, "ielts_level": ielts_level}
+                )
+        except ValidationError as e:
+            details = _format_validation_errors(e)
+            logger.error(f"Invalid response structure: {details}")
+            raise MalformedResponseError(f"AI yanıtı beklenen formatta değil: {details}")
+        
+        return self._refine(response)
+    
+    def _refine(self, response: RewriteResponse) -> RewriteResponse:
+        """
+        Orijinal metinden hesaplanan alanlar: metinlerin hizalaması ve düzeltmelerin
+        konumları; new_words sözlüğe göre süzülür (orijinalde geçen / çok yaygın kelimeler
+        atılır) ve kelime istatistikleri eklenir
+        """
+        update: Dict[str, Any] = {}
+        if self.alignment_enabled:
+            with REWRITE_STAGE_SECONDS.time(stage="alignment"):
+                update.update(self._align(response))
+        
+        if self.lexicon is not None:
+            with REWRITE_STAGE_SECONDS.time(stage="vocabulary"):
+                update["new_words"] = refine_new_words(
+                    response.new_words, response.original_text, self.lexicon, self.min_new_word_rank
+                )
+                if self.lexicon_stats_enabled:
+                    update["lexical_stats"] = lexical_stats(response.original_text, self.lexicon)
+        
+        return response.model_copy(update=update) if update else response
+    
+    @staticmethod
+    def _align(response: RewriteResponse) -> Dict[str, Any]:
+        """
+        Token seviyesinde diff ile hizalama spanları ve düzeltmelerin orijinaldeki yeri
+        
+        Düzeltmenin "original"i metinde birden fazla geçiyorsa değişen bir span'a denk
+        gelen geçiş seçilir; bulunamayan düzeltmenin önceki start/end'i korunur.
+        """
+        spans = align_texts(response.original_text, response.rewritten_text)
+        changed = [(span[1], span[2]) for span in spans if span[0] != "equal"]
+        located = locate_phrases(
+            response.original_text,
+            [correction.original for correction in response.grammar_corrections],
+            changed,
+        )
+        return {
+            "alignment": [
+                AlignmentSpan(
+                    op=op, original_start=i1, original_end=i2, rewritten_start=j1, rewritten_end=j2
+                )
+                for op, i1, i2, j1, j2 in spans
+            ],
+            "grammar_corrections": [
+                correction if location is None
+                else correction.model_copy(update={"start": location[0], "end": location[1]})
+                for correction, location in zip(response.grammar_corrections, located)
+            ],
+        }
@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from app.metrics import IDEMPOTENCY_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency (
+    key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    state TEXT NOT NULL,
+    status_code INTEGER,
+    body BLOB,
+    lease_until REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    owner TEXT
+)
+"""
+
+
+def default_idempotency_path() -> str:
+    """Aynı makinedeki tüm worker'ların ortak kullandığı varsayılan dosya"""
+    return os.path.join(tempfile.gettempdir(), "letter-to-stars-idempotency.sqlite3")
+
+
+def request_fingerprint(payload: str) -> str:
+    """Aynı key'le farklı istek gönderilmesini yakalamak için istek gövdesinin özeti"""
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IdempotencyConflict(Exception):
+    """Aynı Idempotency-Key farklı bir istek gövdesiyle kullanıldı"""
+
+
+class IdempotencyInProgress(Exception):
+    """Aynı key'li orijinal istek bekleme süresi içinde bitmedi"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class StoredResponse(NamedTuple):
+    status_code: int
+    body: bytes
+
+
+class IdempotencyStore:
+    """
+    Idempotency-Key -> yanıt kayıtları (SQLite, WAL modu; worker'lar arası paylaşılır)
+
+    Bir key önce "pending" olarak sahiplenilir (claim), iş bitince yanıtla "done"
+    olur ve ttl_seconds boyunca tekrar döndürülür. Sahibi çöken (lease süresi dolan)
+    pending kayıtlar yeniden sahiplenilebilir. Her sahiplenme bir owner token'ı
+    taşır; lease'i dolan eski sahip complete / release ile yeni sahibin kaydını
+    değiştiremez. Bağlantılar thread başına açılır (async taraf asyncio.to_thread ile çağırır).
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, lease_seconds: float, prune_every: int = 100):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.prune_every = max(1, prune_every)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(idempotency)")}
+            if "owner" not in columns:
+                # owner sütunundan önce oluşturulmuş dosya
+                conn.execute("ALTER TABLE idempotency ADD COLUMN owner TEXT")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key: str, fingerprint: str, owner: str) -> Tuple[str, Optional[StoredResponse]]:
+        """
+        Key'i owner token'ıyla sahiplenmeyi dener
+
+        Returns:
+            ("owner", None)    - key bu çağırana ait, iş yapılmalı
+            ("done", yanıt)    - kayıtlı yanıt tekrar döndürülmeli
+            ("pending", None)  - başka bir istek hâlâ çalışıyor
+
+        Raises:
+            IdempotencyConflict: Key farklı bir istek gövdesiyle kayıtlı
+        """
+        now = time.time()
+        conn = self._connection()
+        # IMMEDIATE: oku-yaz arasında başka worker aynı key'i sahiplenemesin
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT fingerprint, state, status_code, body, lease_until, expires_at "
+                "FROM idempotency WHERE key = ?",
+                (key,)
+            ).fetchone()
+
+            if row is not None and row[5] > now and not (row[1] == "pending" and row[4] <= now):
+                if row[0] != fingerprint:
+                    raise IdempotencyConflict("Idempotency-Key farklı bir istekle kullanılmış")
+                if row[1] == "done":
+                    return "done", StoredResponse(row[2], bytes(row[3]))
+                return "pending", None
+
+            conn.execute(
+                "INSERT OR REPLACE INTO idempotency "
+                "(key, fingerprint, state, status_code, body, lease_until, expires_at, owner) "
+                "VALUES (?, ?, 'pending', NULL, NULL, ?, ?, ?)",
+                (key, fingerprint, now + self.lease_seconds, now + self.ttl_seconds, owner)
+            )
+            return "owner", None
+        finally:
+            conn.execute("COMMIT")
+
+    def complete(self, key: str, owner: str, response: StoredResponse) -> bool:
+        """
+        Sahiplenilen key'in yanıtını kaydeder (ttl_seconds boyunca tekrar döndürülür)
+
+        Returns: False - key artık bu owner'ın değil (lease doldu, başkası sahiplendi); yazılmadı
+        """
+        conn = self._connection()
+        stored = conn.execute(
+            "UPDATE idempotency SET state = 'done', status_code = ?, body = ?, expires_at = ? "
+            "WHERE key = ? AND owner = ? AND state = 'pending'",
+            (response.status_code, response.body, time.time() + self.ttl_seconds, key, owner)
+        ).rowcount == 1
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0
+        if prune:
+            conn.execute("DELETE FROM idempotency WHERE expires_at <= ?", (time.time(),))
+        return stored
+
+    def release(self, key: str, owner: str) -> None:
+        """Başarısız işin sahipliğini bırakır (aynı key'le tekrar deneme yeni iş başlatır)"""
+        self._connection().execute(
+            "DELETE FROM idempotency WHERE key = ? AND owner = ? AND state = 'pending'", (key, owner)
+        )
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM idempotency")
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            rows = self._connection().execute(
+                "SELECT state, COUNT(*) FROM idempotency WHERE expires_at > ? GROUP BY state",
+                (time.time(),)
+            ).fetchall()
+        except sqlite3.Error:
+            rows = []
+        return {"path": self.path, **{state: count for state, count in rows}}
+
+
+class IdempotencyManager:
+    """
+    Idempotency-Key'li istekleri bir kere çalıştırır
+
+    - Key yeni: iş çalışır, başarılı (2xx) yanıt kaydedilir; hata olursa sahiplik
+      bırakılır ve aynı key'le tekrar deneme işi baştan yapar
+    - Key tamamlanmış: kayıtlı yanıt döner (Gemini'ye gidilmez)
+    - Key çalışıyor: orijinal istek beklenir (aynı process'teyse future ile,
+      başka worker'daysa SQLite'a poll ile), sonra kayıtlı yanıt döner
+
+    SQLite hataları isteği düşürmez: loglanır ve istek key'siz gibi çalışır.
+    """
+
+    def __init__(self, store: IdempotencyStore, wait_timeout: float, poll_interval: float = 0.1):
+        self.store = store
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        # Bu process'te çalışan key'ler: bekleyenler poll etmeden uyanır
+        self._running: Dict[str, asyncio.Future] = {}
+
+    async def execute(
+        self,
+        key: str,
+        fingerprint: str,
+        work: Callable[[], Awaitable[StoredResponse]],
+    ) -> Tuple[StoredResponse, bool]:
+        """
+        Returns:
+            (yanıt, tekrar mı) - tekrar: yanıt kayıttan döndü, iş çalışmadı
+
+        Raises:
+            IdempotencyConflict: Key farklı bir istek gövdesiyle kullanılmış
+            IdempotencyInProgress: Orijinal istek wait_timeout içinde bitmedi
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        owner = uuid.uuid4().hex
+        waited = False
+        while True:
+            try:
+                state, stored = await asyncio.to_thread(self.store.claim, key, fingerprint, owner)
+            except IdempotencyConflict:
+                IDEMPOTENCY_REQUESTS.inc(result="conflict")
+                raise
+            except sqlite3.Error as e:
+                logger.warning(f"Idempotency store unavailable, running without key: {str(e)}")
+                return await work(), False
+
+            if state == "done":
+                IDEMPOTENCY_REQUESTS.inc(result="waited" if waited else "replayed")
+                return stored, True
+            if state == "owner":
+                break
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                IDEMPOTENCY_REQUESTS.inc(result="in_progress")
+                raise IdempotencyInProgress("Aynı Idempotency-Key'li istek hâlâ işleniyor", retry_after=1)
+            waited = True
+            running = self._running.get(key)
+            if running is not None:
+                await asyncio.wait({running}, timeout=remaining)
+            else:
+                await asyncio.sleep(min(self.poll_interval, remaining))
+
+        IDEMPOTENCY_REQUESTS.inc(result="new")
+        running = asyncio.get_running_loop().create_future()
+        self._running[key] = running
+        try:
+            response = await work()
+        except BaseException:
+            await self._release(key, owner)
+            raise
+        else:
+            if 200 <= response.status_code < 300:
+                await self._complete(key, owner, response)
+            else:
+                await self._release(key, owner)
+            return response, False
+        finally:
+            self._running.pop(key, None)
+            running.set_result(None)
+
+    async def _complete(self, key: str, owner: str, response: StoredResponse) -> None:
+        try:
+            stored = await asyncio.to_thread(self.store.complete, key, owner, response)
+        except sqlite3.Error as e:
+            logger.warning(f"Idempotency result could not be stored: {str(e)}")
+            return
+        if not stored:
+            IDEMPOTENCY_REQUESTS.inc(result="lease_lost")
+            logger.warning("Idempotency lease expired before the request finished; result not stored")
+
+    async def _release(self, key: str, owner: str) -> None:
+        try:
+            # İptal edilen istekte de sahiplik bırakılsın
+            await asyncio.shield(asyncio.to_thread(self.store.release, key, owner))
+        except (sqlite3.Error, asyncio.CancelledError) as e:
+            logger.warning(f"Idempotency key could not be released: {str(e) or type(e).__name__}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.store.stats(), "running_here": len(self._running)}
@@ -0,0 +1,440 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.metrics import REWRITE_JOBS, REWRITE_JOB_WAIT_SECONDS
+from app.models import RewriteResponse
+from app.services.admission import AdmissionRejected
+from app.services.resilience import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rewrite_jobs (
+    id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    user_text TEXT NOT NULL,
+    ielts_level INTEGER NOT NULL,
+    user_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_until REAL,
+    owner TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    status_code INTEGER,
+    result TEXT,
+    error TEXT
+)
+"""
+
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS rewrite_jobs_ready ON rewrite_jobs (state, available_at)",
+    # Adil sıra: kullanıcı başına çalışan iş sayısı ve en eski hazır iş (covering)
+    "CREATE INDEX IF NOT EXISTS rewrite_jobs_user_ready ON rewrite_jobs (state, user_id, available_at)",
+    # rewrite_jobs_user_ready'nin önekiydi
+    "DROP INDEX IF EXISTS rewrite_jobs_user",
+)
+
+_FIELDS = (
+    "id", "state", "attempts", "created_at", "started_at", "finished_at", "status_code", "result", "error"
+)
+
+FINISHED_STATES = ("done", "failed")
+
+
+def default_job_queue_path() -> str:
+    """Geliştirme için varsayılan dosya; production'da restart'tan sağ çıkan bir volume'a konmalı"""
+    return os.path.join(tempfile.gettempdir(), "letter-to-stars-rewrite-jobs.sqlite3")
+
+
+class JobQueueFull(Exception):
+    """Kuyrukta bekleyen iş sayısı limitte"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobStore:
+    """
+    Rewrite işlerinin kalıcı kuyruğu (SQLite, WAL modu; worker process'leri arasında paylaşılır)
+
+    İş durumu: queued -> running -> done | failed. Çalışan iş bir lease ile sahiplenilir
+    ve çalıştığı sürece lease'i uzatılır; process çökerse lease dolunca iş başka bir
+    worker tarafından tekrar alınır (deneme sayılır, max_attempts'ı dolduran iş failed
+    olur). Sonucu yalnızca lease'in sahibi yazabilir. Düzgün kapanışta (deploy) çalışan
+    işler kuyruğa geri bırakılır. Bitmiş işler result_ttl_seconds sonra silinir.
+    """
+
+    def __init__(self, path: str, lease_seconds: float, result_ttl_seconds: float, prune_every: int = 100):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.prune_every = max(1, prune_every)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._finished = 0
+
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # İşler kaybolmasın: her commit diske yazılır
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(rewrite_jobs)")}
+            if "user_id" not in columns:
+                # user_id'den önce oluşturulmuş kuyruk dosyası
+                conn.execute("ALTER TABLE rewrite_jobs ADD COLUMN user_id TEXT")
+            for index in _INDEXES:
+                conn.execute(index)
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, user_text: str, ielts_level: int, max_queued: int, user_id: Optional[str] = None) -> str:
+        """İşi kuyruğa ekler ve id'sini döndürür; kuyruk doluysa JobQueueFull"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            queued = conn.execute("SELECT COUNT(*) FROM rewrite_jobs WHERE state = 'queued'").fetchone()[0]
+            if queued >= max_queued:
+                raise JobQueueFull("Rewrite iş kuyruğu dolu, lütfen daha sonra tekrar deneyin", retry_after=5)
+            conn.execute(
+                "INSERT INTO rewrite_jobs (id, state, user_text, ielts_level, user_id, available_at, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, user_text, ielts_level, user_id, now, now)
+            )
+        finally:
+            conn.execute("COMMIT")
+        return job_id
+
+    def claim_next(self, owner: str, max_attempts: int) -> Optional[Tuple[str, str, int, float, Optional[str]]]:
+        """
+        Sıradaki işi sahiplenir: hazır queued iş veya lease'i dolmuş running iş
+
+        Şu an en az işi çalışan kullanıcının en eski işi seçilir: çok iş gönderen bir
+        kullanıcı worker'ların hepsini tutup diğerlerini bekletmez. Lease'i dolmuş iş
+        zaten max_attempts kez alınmışsa (her seferinde worker'ı çökertiyor) tekrar
+        alınmaz, failed olarak kapatılır.
+
+        Returns: (id, user_text, ielts_level, created_at, user_id) veya iş yoksa None
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                # Önce kullanıcı seçilir: çalışan iş sayıları ve kullanıcı başına en eski hazır
+                # iş birer kere gruplanır (index'ten). Aday iş başına alt sorgu 10k işte claim
+                # başına ~15-30 ms yazma kilidi tutuyordu
+                user = conn.execute(
+                    "WITH busy AS (SELECT user_id, COUNT(*) AS running FROM rewrite_jobs "
+                    "WHERE state = 'running' AND lease_until > ?1 GROUP BY user_id), "
+                    "ready AS (SELECT user_id, MIN(available_at) AS first_at FROM rewrite_jobs "
+                    "WHERE state = 'queued' AND available_at <= ?1 GROUP BY user_id "
+                    "UNION ALL SELECT user_id, available_at FROM rewrite_jobs "
+                    "WHERE state = 'running' AND lease_until <= ?1) "
+                    "SELECT ready.user_id FROM ready LEFT JOIN busy ON busy.user_id IS ready.user_id "
+                    "ORDER BY COALESCE(busy.running, 0), ready.first_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if user is None:
+                    return None
+                row = conn.execute(
+                    "SELECT id, user_text, ielts_level, created_at, state, user_id, attempts FROM rewrite_jobs "
+                    "WHERE user_id IS ?2 AND ((state = 'queued' AND available_at <= ?1) "
+                    "OR (state = 'running' AND lease_until <= ?1)) ORDER BY available_at LIMIT 1",
+                    (now, user[0])
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[4] != "running":
+                    break
+                if row[6] < max_attempts:
+                    REWRITE_JOBS.inc(event="recovered")
+                    logger.warning(f"Recovering rewrite job {row[0]} after expired lease")
+                    break
+
+                REWRITE_JOBS.inc(event="failed")
+                logger.error(f"Rewrite job {row[0]} lost its worker {row[6]} times, giving up")
+                conn.execute(
+                    "UPDATE rewrite_jobs SET state = 'failed', status_code = 500, error = ?, finished_at = ?, "
+                    "lease_until = NULL, owner = NULL WHERE id = ?",
+                    ("İş çalışırken worker defalarca durdu", now, row[0])
+                )
+
+            conn.execute(
+                "UPDATE rewrite_jobs SET state = 'running', owner = ?, lease_until = ?, "
+                "attempts = attempts + 1, started_at = COALESCE(started_at, ?) WHERE id = ?",
+                (owner, now + self.lease_seconds, now, row[0])
+            )
+            return row[0], row[1], row[2], row[3], row[5]
+        finally:
+            conn.execute("COMMIT")
+
+    def renew(self, job_id: str, owner: str) -> bool:
+        """Çalışan işin lease'ini uzatır; False: iş artık bu owner'da değil"""
+        cursor = self._connection().execute(
+            "UPDATE rewrite_jobs SET lease_until = ? WHERE id = ? AND owner = ? AND state = 'running'",
+            (time.time() + self.lease_seconds, job_id, owner)
+        )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: str, owner: str, status_code: int, result: Optional[str], error: Optional[str]) -> bool:
+        """İşi sonucu (done) veya hatasıyla (failed) kapatır; False: lease başka worker'a geçmiş, yazılmadı"""
+        conn = self._connection()
+        cursor = conn.execute(
+            "UPDATE rewrite_jobs SET state = ?, status_code = ?, result = ?, error = ?, finished_at = ?, "
+            "lease_until = NULL, owner = NULL WHERE id = ? AND owner = ? AND state = 'running'",
+            ("done" if result is not None else "failed", status_code, result, error, time.time(), job_id, owner)
+        )
+        with self._lock:
+            self._finished += 1
+            prune = self._finished % self.prune_every == 0
+        if prune:
+            self.prune()
+        return cursor.rowcount == 1
+
+    def retry_later(self, job_id: str, owner: str, delay: float) -> bool:
+        """İşi delay saniye sonra tekrar alınmak üzere kuyruğa geri koyar; False: lease kaybedilmiş"""
+        cursor = self._connection().execute(
+            "UPDATE rewrite_jobs SET state = 'queued', available_at = ?, lease_until = NULL, owner = NULL "
+            "WHERE id = ? AND owner = ? AND state = 'running'",
+            (time.time() + delay, job_id, owner)
+        )
+        return cursor.rowcount == 1
+
+    def release_owned(self, owner: str) -> int:
+        """Düzgün kapanışta bu process'in çalışan işlerini kuyruğa geri bırakır (deneme sayılmaz)"""
+        cursor = self._connection().execute(
+            "UPDATE rewrite_jobs SET state = 'queued', attempts = MAX(attempts - 1, 0), "
+            "lease_until = NULL, owner = NULL WHERE state = 'running' AND owner = ?",
+            (owner,)
+        )
+        return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            f"SELECT {', '.join(_FIELDS)} FROM rewrite_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return dict(zip(_FIELDS, row)) if row is not None else None
+
+    def prune(self) -> None:
+        self._connection().execute(
+            "DELETE FROM rewrite_jobs WHERE state IN ('done', 'failed') AND finished_at <= ?",
+            (time.time() - self.result_ttl_seconds,)
+        )
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._connection().execute("SELECT state, COUNT(*) FROM rewrite_jobs GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
+
+
+def _classify(error: Exception) -> Tuple[int, str, Optional[float]]:
+    """
+    Hatayı (HTTP kodu, mesaj, tekrar deneme gecikmesi) olarak sınıflandırır
+
+    Gecikme None ise iş tekrar denenmez. Yoğunluk / devre açık / timeout geçicidir:
+    iş, kullanıcıya hata dönmek yerine kuyrukta bekletilir.
+    """
+    if isinstance(error, AdmissionRejected):
+        return 429, str(error), float(error.retry_after)
+    if isinstance(error, CircuitOpenError):
+        return 503, str(error), float(error.retry_after)
+    if isinstance(error, asyncio.TimeoutError):
+        return 504, "AI servisi zamanında yanıt vermedi", 5.0
+    if isinstance(error, ValueError):
+        return 422, str(error), None
+    return 500, "Internal server error", None
+
+
+class JobRunner:
+    """
+    Kalıcı kuyruğu boşaltan arka plan worker'ları (process başına concurrency adet task)
+
+    Worker sayısı aynı anda Gemini'ye giden iş sayısını sınırlar; ani yükte işler
+    kuyrukta bekler, HTTP isteği timeout'a düşmez. Aynı process'te eklenen işler
+    worker'ları hemen uyandırır, diğer worker process'lerinin eklediği işler
+    poll_interval'de bir kontrol edilir. SQLite hataları worker'ı durdurmaz: loglanır,
+    poll_interval beklenir; yazılamayan iş lease dolunca tekrar alınır.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        process: Callable[[str, int, Dict[str, Any]], Awaitable[RewriteResponse]],
+        concurrency: int,
+        max_queued: int,
+        max_attempts: int,
+        poll_interval: float = 1.0,
+    ):
+        self.store = store
+        self.process = process
+        self.concurrency = max(1, concurrency)
+        self.max_queued = max_queued
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+
+        # Bu process'in lease'lerini tanımlar (düzgün kapanışta geri bırakmak için)
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        # Bu process'te biten işler için bekleyen long-poll'lar
+        self._finished: Dict[str, asyncio.Event] = {}
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.concurrency)]
+        logger.info(f"Rewrite job runner started with {self.concurrency} workers ({self.store.path})")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        released = await asyncio.to_thread(self.store.release_owned, self.owner)
+        if released:
+            logger.info(f"Released {released} running rewrite jobs back to the queue")
+
+    async def submit(self, user_text: str, ielts_level: int, user_id: Optional[str] = None) -> str:
+        job_id = await asyncio.to_thread(self.store.enqueue, user_text, ielts_level, self.max_queued, user_id)
+        REWRITE_JOBS.inc(event="enqueued")
+        self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str, wait: float = 0.0) -> Optional[Dict[str, Any]]:
+        """
+        İşin durumunu döndürür; wait > 0 ise iş bitene kadar en fazla wait saniye bekler (long-poll)
+        """
+        deadline = time.monotonic() + wait
+        while True:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["state"] in FINISHED_STATES or remaining <= 0:
+                if job is not None and job["state"] in FINISHED_STATES:
+                    # Başka process'te biten işin event'i burada hiç set edilmez
+                    self._finished.pop(job_id, None)
+                return job
+
+            # Bu process'te biterse hemen uyanılır; başka worker'dakiler poll ile görülür
+            finished = self._finished.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(finished.wait(), timeout=min(self.poll_interval, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            try:
+                claimed = await asyncio.to_thread(self.store.claim_next, self.owner, self.max_attempts)
+            except sqlite3.Error as e:
+                logger.warning(f"Rewrite job queue unavailable: {str(e)}")
+                claimed = None
+
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(*claimed)
+            except sqlite3.Error as e:
+                # İş running kalır; lease dolunca tekrar alınır (deneme sayılır)
+                logger.warning(f"Rewrite job {claimed[0]} could not be updated: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _run(
+        self, job_id: str, user_text: str, ielts_level: int, created_at: float, user_id: Optional[str]
+    ) -> None:
+        REWRITE_JOB_WAIT_SECONDS.observe(max(0.0, time.time() - created_at))
+        # Arka plan işi: Gemini kuyruğunda bekleyen kullanıcı isteklerinin önüne geçmez
+        work = asyncio.ensure_future(self.process(user_text, ielts_level, {"user": user_id, "class": "batch"}))
+        heartbeat = asyncio.create_task(self._keep_lease(job_id, work))
+        try:
+            result = await work
+        except asyncio.CancelledError:
+            if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result():
+                return  # Lease kaybedildi, iş başka worker'da
+            raise
+        except Exception as e:
+            await self._handle_failure(job_id, e)
+        else:
+            if await asyncio.to_thread(self.store.finish, job_id, self.owner, 200, result.model_dump_json(), None):
+                REWRITE_JOBS.inc(event="completed")
+                self._notify(job_id)
+            else:
+                logger.warning(f"Rewrite job {job_id} finished after losing its lease, result discarded")
+        finally:
+            heartbeat.cancel()
+
+    async def _keep_lease(self, job_id: str, work: asyncio.Future) -> bool:
+        """
+        Çalışan işin lease'ini lease_seconds / 3'te bir uzatır (uzun işler başka worker'a geçmesin)
+
+        Lease başka worker'a geçtiyse işi iptal eder ve True döndürür.
+        """
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(self.store.renew, job_id, self.owner)
+            except sqlite3.Error as e:
+                logger.warning(f"Lease of rewrite job {job_id} could not be renewed: {str(e)}")
+                continue
+            if not renewed:
+                logger.warning(f"Rewrite job {job_id} lost its lease, abandoning it")
+                work.cancel()
+                return True
+
+    async def _handle_failure(self, job_id: str, error: Exception) -> None:
+        status_code, detail, delay = _classify(error)
+        job = await asyncio.to_thread(self.store.get, job_id)
+        attempts = job["attempts"] if job is not None else self.max_attempts
+
+        if delay is not None and attempts < self.max_attempts:
+            if await asyncio.to_thread(self.store.retry_later, job_id, self.owner, delay):
+                REWRITE_JOBS.inc(event="retried")
+                logger.warning(f"Rewrite job {job_id} failed ({status_code}), retrying in {delay:g}s")
+            return
+
+        if status_code == 500:
+            logger.error(f"Rewrite job {job_id} failed", exc_info=error)
+        if await asyncio.to_thread(self.store.finish, job_id, self.owner, status_code, None, detail):
+            REWRITE_JOBS.inc(event="failed")
+            self._notify(job_id)
+
+    def _notify(self, job_id: str) -> None:
+        finished = self._finished.pop(job_id, None)
+        if finished is not None:
+            finished.set()
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            counts = self.store.counts()
+        except sqlite3.Error:
+            counts = {}
+        return {"path": self.store.path, "workers": self.concurrency, **counts}
+
+
+def job_payload(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Store kaydını RewriteJob yanıtına çevirir (sonuç kayıtta zaten doğrulanmış JSON olarak durur)"""
+    payload = {key: job[key] for key in _FIELDS if key not in ("state", "result")}
+    payload["status"] = job["state"]
+    payload["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return payload
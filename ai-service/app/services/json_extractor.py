@@ -0,0 +1,213 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_DECODER = json.JSONDecoder()
+
+# Obje dışında / string dışında anlamlı karakterler
+_STRUCTURAL = re.compile(r'["{}\[\],:]')
+# String içinde anlamlı karakterler
+_STRING_SPECIAL = re.compile(r'["\\]')
+# Code fence'ten hemen sonra başlayan obje: ```json\n{
+_FENCED_OBJECT = re.compile(r"```[a-zA-Z]*[ \t]*\r?\n[ \t]*\{")
+# Satır başında (girintisiz) başlayan obje
+_LINE_START_OBJECT = re.compile(r"^\{", re.MULTILINE)
+
+# Bir yanıtta en fazla kaç aday '{' denenir
+_MAX_CANDIDATES = 4
+
+
+def extract_json_object(text: str) -> Dict[str, Any]:
+    """
+    Tam model çıktısındaki JSON objesini bulur ve parse eder
+
+    Code fence'leri, objeden önceki/sonraki düz yazıyı tolere eder:
+        'Here is the result:\\n```json\\n{"a": 1}\\n```\\nHope this helps!'  ->  {"a": 1}
+
+    Metin kopyalanmaz ve regex ile temizlenmez; json'un C decoder'ı objenin
+    başından itibaren tek geçişte parse eder ve objenin bittiği yerde durur.
+
+    Raises:
+        ValueError: Metinde parse edilebilir bir JSON objesi yoksa
+    """
+    first = text.find("{")
+    if first == -1:
+        raise ValueError("Yanıtta JSON objesi bulunamadı")
+
+    try:
+        return _decode_object_at(text, first)
+    except json.JSONDecodeError as e:
+        first_error = e
+
+    # İlk '{' düz yazının parçası olabilir: önce code fence sonrası, sonra
+    # girintisiz satır başındaki objeleri dene. İç içe objeler aday olmasın diye
+    # rastgele her '{' denenmez.
+    tried = {first}
+    candidates = [m.end() - 1 for m in _FENCED_OBJECT.finditer(text)]
+    candidates += [m.start() for m in _LINE_START_OBJECT.finditer(text)]
+
+    for start in candidates:
+        if start in tried:
+            continue
+        if len(tried) >= _MAX_CANDIDATES:
+            break
+        tried.add(start)
+        try:
+            return _decode_object_at(text, start)
+        except json.JSONDecodeError:
+            continue
+
+    raise ValueError(str(first_error))
+
+
+def _decode_object_at(text: str, start: int) -> Dict[str, Any]:
+    value, _ = _DECODER.raw_decode(text, start)
+    if not isinstance(value, dict):
+        raise json.JSONDecodeError("Expecting object", text, start)
+    return value
+
+
+class IncrementalJsonExtractor:
+    """
+    Parça parça gelen model çıktısından JSON objesinin üst seviye alanlarını çıkarır
+
+    Gemini stream ederken metin rastgele yerlerden bölünür:
+        '```json\\n{"grammar_corrections": [{"orig'  +  'inal": "to park", ...'
+
+    feed() her parçayı alır ve o ana kadar TAMAMLANMIŞ üst seviye alanları
+    (key, value) olarak döndürür. İlk '{' öncesindeki her şey (code fence, düz yazı)
+    atlanır; obje kapandıktan sonra gelenler yok sayılır.
+
+    Metin tek geçişte taranır: regex ile yalnızca anlamlı karakterlere atlanır,
+    her alanın değeri yalnızca bir kez json.loads edilir. Tam yanıtlar için
+    extract_json_object daha hızlıdır.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+        self.started = False
+        self.done = False
+        self.fields: Dict[str, Any] = {}
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Yeni parçayı işler ve bu parçayla tamamlanan (key, value) çiftlerini döndürür
+
+        Raises:
+            ValueError: Tamamlanan bir alanın değeri geçerli JSON değilse
+        """
+        if self.done or not chunk:
+            return []
+
+        self._buf += chunk
+        completed: List[Tuple[str, Any]] = []
+
+        buf = self._buf
+        i = self._pos
+        n = len(buf)
+
+        # Objenin başlangıcına kadar olan her şeyi atla
+        if not self.started:
+            start = buf.find("{", i)
+            if start == -1:
+                self._pos = n
+                return completed
+            self.started = True
+            self._depth = 1
+            i = start + 1
+
+        # Önceki parça bir escape karakteriyle bittiyse
+        if self._escape and i < n:
+            self._escape = False
+            i += 1
+
+        while i < n:
+            if self._in_string:
+                m = _STRING_SPECIAL.search(buf, i)
+                if m is None:
+                    i = n
+                    break
+                i = m.start()
+                if buf[i] == "\\":
+                    # Escape edilen karakteri atla (parça sınırına denk gelebilir)
+                    if i + 1 >= n:
+                        self._escape = True
+                        i = n
+                        break
+                    i += 2
+                    continue
+
+                self._in_string = False
+                if self._depth == 1 and self._key_start is not None and self._value_start is None:
+                    self._key = json.loads(buf[self._key_start:i + 1])
+                i += 1
+                continue
+
+            m = _STRUCTURAL.search(buf, i)
+            if m is None:
+                i = n
+                break
+            i = m.start()
+            c = buf[i]
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._value_start is None:
+                    self._key_start = i
+            elif c == "{" or c == "[":
+                self._depth += 1
+            elif c == "}" or c == "]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete_field(buf, i, completed)
+                    self.done = True
+                    i += 1
+                    break
+            elif self._depth == 1:
+                if c == ":" and self._key is not None and self._value_start is None:
+                    self._value_start = i + 1
+                elif c == ",":
+                    self._complete_field(buf, i, completed)
+
+            i += 1
+
+        self._pos = i
+        return completed
+
+    def _complete_field(self, buf: str, end: int, completed: List[Tuple[str, Any]]) -> None:
+        """key/value_start ile end arasındaki değeri parse edip alan olarak kaydeder"""
+        if self._key is not None and self._value_start is not None:
+            raw = buf[self._value_start:end].strip()
+            try:
+                value = json.loads(raw)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"'{self._key}' alanı geçerli JSON değil: {e}")
+            self.fields[self._key] = value
+            completed.append((self._key, value))
+
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Tamamlanmış objeyi döndürür
+
+        Raises:
+            ValueError: Obje hiç başlamadıysa veya kapanmadıysa
+        """
+        if not self.started:
+            raise ValueError("AI yanıtında JSON objesi bulunamadı")
+        if not self.done:
+            raise ValueError("AI yanıtındaki JSON objesi tamamlanmadı")
+        return self.fields
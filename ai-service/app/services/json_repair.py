@@ -0,0 +1,174 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.json_extractor import extract_json_object
+
+
+class _Frame:
+    """Açık bir obje / dizi ve içinde yazılmakta olan eleman"""
+
+    __slots__ = ("kind", "element_start", "state", "primitive_start")
+
+    def __init__(self, kind: str, element_start: int):
+        self.kind = kind  # "{" veya "["
+        # Yazılmakta olan üyenin / elemanın çıktıdaki başlangıcı
+        self.element_start = element_start
+        # Obje: key | colon | value | after ; dizi: value | after
+        self.state = "key" if kind == "{" else "value"
+        # Değer olarak yazılmakta olan sayı / true / false / null'ün başlangıcı
+        self.primitive_start: Optional[int] = None
+
+
+def _strip_trailing_comma(out: List[str]) -> None:
+    """Çıktının sonundaki boşlukları ve tek bir virgülü siler"""
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+        while out and out[-1].isspace():
+            out.pop()
+
+
+def _primitive_complete(out: List[str], start: int) -> bool:
+    """
+    Metnin sonunda kesilen sayı / true / false / null tam mı
+
+    Sayı ancak arkasından boşluk geldiyse tamdır ("12" "123"ün kesilmiş hali olabilir);
+    true / false / null uzatılamaz, parse ediliyorsa tamdır ("tr", "nul" atılır).
+    """
+    raw = "".join(out[start:])
+    token = raw.strip()
+    try:
+        json.loads(token)
+    except ValueError:
+        return False
+    return token in ("true", "false", "null") or raw[-1].isspace()
+
+
+def repair_json_text(text: str) -> Tuple[Optional[str], bool]:
+    """
+    Bozuk / kesilmiş bir JSON objesini parse edilebilir hale getirir
+
+    Düzeltilenler:
+    - Kapanıştan önceki fazla virgüller: [1, 2,] / {"a": 1,}
+    - max_output_tokens'ta kesilmiş çıktı: yarım kalan üye (key'i eksik veya değeri
+      yarım string / sayı / true-false-null) ve dizilerde yarım kalan son eleman
+      atılır, açık obje / diziler kapatılır
+
+    Yarım değerler kesildiği yerde kapatılıp tutulmaz: "12" aslında "123" olabilir,
+    yarım rewritten_text de tam bir metin gibi görünür. Atılan zorunlu bir alan
+    validation'da yakalanır ve istek tekrar denenir.
+
+    Returns:
+        (düzeltilmiş JSON metni veya obje bulunamadıysa None, çıktı kesilmiş miydi)
+    """
+    start = text.find("{")
+    if start < 0:
+        return None, False
+
+    out: List[str] = []
+    stack: List[_Frame] = []
+    in_string = False
+    escaped = False
+
+    for char in text[start:]:
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                frame = stack[-1]
+                if frame.state == "key":
+                    frame.state = "colon"
+                elif frame.state == "value":
+                    frame.state = "after"
+            continue
+
+        if char == '"':
+            in_string = True
+            out.append(char)
+        elif char in "{[":
+            if stack:
+                stack[-1].primitive_start = None
+            out.append(char)
+            stack.append(_Frame(char, len(out)))
+        elif char in "}]":
+            if stack[-1].kind != ("{" if char == "}" else "["):
+                # Eşleşmeyen kapanış: atla
+                continue
+            _strip_trailing_comma(out)
+            out.append(char)
+            stack.pop()
+            if not stack:
+                return "".join(out), False
+            stack[-1].state = "after"
+            stack[-1].primitive_start = None
+        elif char == ",":
+            frame = stack[-1]
+            out.append(char)
+            frame.element_start = len(out)
+            frame.state = "key" if frame.kind == "{" else "value"
+            frame.primitive_start = None
+        elif char == ":":
+            out.append(char)
+            stack[-1].state = "value"
+        else:
+            frame = stack[-1]
+            if not char.isspace() and frame.state == "value" and frame.primitive_start is None:
+                frame.primitive_start = len(out)
+            out.append(char)
+
+    # Metin obje kapanmadan bitti: kesilmiş çıktı. Açık kalan string (key veya değer)
+    # aşağıda üyesi / elemanıyla birlikte atılır
+    while stack:
+        frame = stack.pop()
+        if frame.kind == "{":
+            if frame.state == "value" and frame.primitive_start is not None:
+                if _primitive_complete(out, frame.primitive_start):
+                    frame.state = "after"
+            if frame.state in ("key", "colon", "value"):
+                del out[frame.element_start:]
+        else:
+            # Dizide yazılmakta olan eleman (string, sayı veya iç obje) yarımdır
+            if frame.state != "after":
+                del out[frame.element_start:]
+        _strip_trailing_comma(out)
+        out.append("}" if frame.kind == "{" else "]")
+
+        if stack:
+            parent = stack[-1]
+            parent.primitive_start = None
+            # Dizideki yarım iç obje / dizi, dizinin kendi kuralıyla atılır
+            parent.state = "value" if parent.kind == "[" else "after"
+
+    return "".join(out), True
+
+
+def parse_with_repair(text: str) -> Tuple[Dict[str, Any], str]:
+    """
+    Model çıktısındaki JSON objesini parse eder; gerekirse onarır
+
+    Returns:
+        (obje, sonuç) - sonuç: clean | repaired (küçük sözdizimi hatası) | truncated (kesilmiş çıktı)
+
+    Raises:
+        ValueError: Obje onarılarak da parse edilemiyorsa (orijinal hata mesajıyla)
+    """
+    try:
+        return extract_json_object(text), "clean"
+    except ValueError as error:
+        original_error = error
+
+    repaired, truncated = repair_json_text(text)
+    if repaired is None:
+        raise original_error
+    try:
+        output = json.loads(repaired)
+    except ValueError:
+        raise original_error
+    if not isinstance(output, dict):
+        raise original_error
+    return output, "truncated" if truncated else "repaired"
@@ -0,0 +1,322 @@
+"""
+Memory-mapped İngilizce kelime frekans sözlüğü
+
+Dosya formatı (little-endian):
+    header   : magic (8 byte) | kelime sayısı (uint32)
+    index    : kelime başına (string offset uint32, frekans sırası uint32), alfabetik sırada
+               + sonda tek bir sentinel offset
+    strings  : UTF-8 kelimeler art arda (ayraçsız; uzunluk = sonraki offset - offset)
+
+Lookup index üzerinde binary search'tür; dosya mmap ile açıldığı için yükleme
+sabit süredir ve worker'lar aynı sayfaları paylaşır.
+
+Sözlüğü yeniden oluşturmak için (satır başına bir kelime, sıklık sırasıyla veya
+"kelime<TAB>sayı" formatında):
+    python -m app.services.lexicon --input words.txt --output app/data/lexicon.bin
+"""
+import argparse
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+SEED_PATH = os.path.join(_DATA_DIR, "lexicon_seed.txt")
+DEFAULT_PATH = os.path.join(_DATA_DIR, "lexicon.bin")
+
+_MAGIC = b"LTSLEX1\x00"
+_HEADER = struct.Struct("<8sI")
+_ENTRY = struct.Struct("<II")
+
+# lemmatize / rank sonuçlarının process içi önbelleği (metinlerde kelimeler çok tekrar eder)
+_MEMO_MAX_ENTRIES = 100_000
+
+# Frekans sırasından yaklaşık CEFR bandı (sıra <= sınır); son sınırdan nadir kelimeler RARE_BAND
+CEFR_BANDS: Tuple[Tuple[str, int], ...] = (
+    ("A1", 500),
+    ("A2", 1000),
+    ("B1", 2000),
+    ("B2", 4000),
+    ("C1", 8000),
+)
+RARE_BAND = "C2"
+# Sözlükte olmayan kelimeler (nadir kelime, özel isim veya yazım hatası olabilir) ayrı sayılır
+UNKNOWN_BAND = "unknown"
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)*")
+
+# Kural dışı çekimler -> kök
+_IRREGULAR: Dict[str, str] = {
+    "am": "be", "is": "be", "are": "be", "was": "be", "were": "be", "been": "be", "being": "be",
+    "has": "have", "had": "have", "does": "do", "did": "do", "done": "do",
+    "went": "go", "gone": "go", "goes": "go", "said": "say", "made": "make", "got": "get",
+    "gotten": "get", "took": "take", "taken": "take", "came": "come", "saw": "see", "seen": "see",
+    "knew": "know", "known": "know", "gave": "give", "given": "give", "found": "find",
+    "thought": "think", "told": "tell", "became": "become", "left": "leave", "felt": "feel",
+    "brought": "bring", "began": "begin", "begun": "begin", "kept": "keep", "held": "hold",
+    "wrote": "write", "written": "write", "stood": "stand", "heard": "hear", "meant": "mean",
+    "met": "meet", "ran": "run", "paid": "pay", "sat": "sit", "spoke": "speak", "spoken": "speak",
+    "lay": "lie", "led": "lead", "read": "read", "grew": "grow", "grown": "grow", "lost": "lose",
+    "fell": "fall", "fallen": "fall", "sent": "send", "built": "build", "understood": "understand",
+    "drew": "draw", "drawn": "draw", "broke": "break", "broken": "break", "spent": "spend",
+    "bought": "buy", "taught": "teach", "caught": "catch", "fought": "fight", "sold": "sell",
+    "won": "win", "ate": "eat", "eaten": "eat", "drove": "drive", "driven": "drive",
+    "wore": "wear", "worn": "wear", "chose": "choose", "chosen": "choose", "threw": "throw",
+    "thrown": "throw", "flew": "fly", "flown": "fly", "slept": "sleep", "swam": "swim",
+    "sang": "sing", "sung": "sing", "woke": "wake", "woken": "wake", "forgot": "forget",
+    "forgotten": "forget", "hid": "hide", "hidden": "hide", "rode": "ride", "ridden": "ride",
+    "children": "child", "men": "man", "women": "woman", "people": "people", "feet": "foot",
+    "teeth": "tooth", "mice": "mouse", "lives": "life", "wives": "wife", "knives": "knife",
+    "better": "good", "best": "good", "worse": "bad", "worst": "bad", "further": "far",
+    "me": "i", "us": "we", "him": "he", "them": "they",
+}
+
+# (ek, yerine gelen) - sırayla denenir, kökü sözlükte olan ilk aday seçilir
+_SUFFIX_RULES: Tuple[Tuple[str, str], ...] = (
+    ("ies", "y"), ("ied", "y"), ("ier", "y"), ("iest", "y"),
+    ("sses", "ss"), ("xes", "x"), ("ches", "ch"), ("shes", "sh"), ("oes", "o"),
+    ("ing", ""), ("ing", "e"), ("ed", ""), ("ed", "e"), ("es", ""), ("s", ""),
+    ("er", ""), ("er", "e"), ("est", ""), ("est", "e"), ("'s", ""), ("s'", ""),
+    # Zarflar: happily -> happy, remarkably -> remarkable, possibly -> possible,
+    # carefully -> careful, basically -> basic
+    ("ily", "y"), ("ably", "able"), ("ibly", "ible"), ("ly", ""), ("ally", ""),
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Metni küçük harfli kelimelere böler (kısaltmalar tek token: don't, it's)"""
+    return _TOKEN.findall(text.lower())
+
+
+def band_for_rank(rank: Optional[int]) -> str:
+    if rank is None:
+        return UNKNOWN_BAND
+    for band, limit in CEFR_BANDS:
+        if rank <= limit:
+            return band
+    return RARE_BAND
+
+
+def reachable_bands(size: int) -> List[str]:
+    """
+    size kelimelik sözlüğün atayabileceği bandlar, kolaydan zora
+
+    Alt sınırı sözlüğün dışında kalan bandlar düşer (örn. ~1000 kelimelik seed
+    listesiyle sadece A1-A2); o bandlara düşecek kelimeler UNKNOWN_BAND olur.
+    """
+    bands = []
+    lower = 0
+    for band, limit in CEFR_BANDS:
+        if size > lower:
+            bands.append(band)
+        lower = limit
+    if size > lower:
+        bands.append(RARE_BAND)
+    return bands
+
+
+class Lexicon:
+    """
+    mmap ile açılmış frekans sözlüğü; sadece okunur
+
+    Sonuçlar process içinde önbelleğe alınır (dict işlemleri GIL altında atomiktir).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.size = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"Geçersiz sözlük dosyası: {path}")
+        index_start = _HEADER.size
+        index_end = index_start + self.size * _ENTRY.size + 4
+        self._strings_start = index_end
+        self.bands = reachable_bands(self.size)
+
+        # Index'i uint32 dizisi olarak oku: [offset0, rank0, offset1, rank1, ..., sentinel]
+        if sys.byteorder == "little":
+            self._index = memoryview(self._mm)[index_start:index_end].cast("I")
+        else:
+            self._index = struct.unpack_from(f"<{self.size * 2 + 1}I", self._mm, index_start)
+
+        self._ranks: Dict[str, Optional[int]] = {}
+        self._lemmas: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def rank(self, word: str) -> Optional[int]:
+        """Kelimenin frekans sırası (1 = en yaygın), sözlükte yoksa None"""
+        try:
+            return self._ranks[word]
+        except KeyError:
+            pass
+
+        result = self._search(word.lower().encode("utf-8"))
+        if len(self._ranks) >= _MEMO_MAX_ENTRIES:
+            self._ranks.clear()
+        self._ranks[word] = result
+        return result
+
+    def _search(self, key: bytes) -> Optional[int]:
+        index, mm, base = self._index, self._mm, self._strings_start
+        low, high = 0, self.size - 1
+        while low <= high:
+            mid = (low + high) // 2
+            current = mm[base + index[2 * mid]:base + index[2 * mid + 2]]
+            if current == key:
+                return index[2 * mid + 1]
+            if current < key:
+                low = mid + 1
+            else:
+                high = mid - 1
+        return None
+
+    def __contains__(self, word: str) -> bool:
+        return self.rank(word) is not None
+
+    def lemmatize(self, word: str) -> str:
+        """
+        Kelimenin kökü: önce kural dışı çekimler, sonra kökü sözlükte olan ilk ek kuralı
+
+        Hiçbir kural sözlükteki bir köke götürmezse kelimenin kendisi döner.
+        """
+        try:
+            return self._lemmas[word]
+        except KeyError:
+            pass
+
+        lemma = self._lemmatize(word.lower())
+        if len(self._lemmas) >= _MEMO_MAX_ENTRIES:
+            self._lemmas.clear()
+        self._lemmas[word] = lemma
+        return lemma
+
+    def _lemmatize(self, word: str) -> str:
+        if word in _IRREGULAR:
+            return _IRREGULAR[word]
+        if word in self:
+            return word
+
+        for suffix, replacement in _SUFFIX_RULES:
+            if len(word) > len(suffix) + 1 and word.endswith(suffix):
+                stem = word[:-len(suffix)] + replacement
+                if stem in self:
+                    return stem
+                # running -> run, stopped -> stop
+                if replacement == "" and len(stem) > 2 and stem[-1] == stem[-2] and stem[:-1] in self:
+                    return stem[:-1]
+        return word
+
+    def word_rank(self, word: str) -> Optional[int]:
+        """Kelimenin (veya kökünün) frekans sırası"""
+        rank = self.rank(word)
+        return rank if rank is not None else self.rank(self.lemmatize(word))
+
+    def close(self) -> None:
+        if isinstance(self._index, memoryview):
+            self._index.release()
+        self._mm.close()
+
+
+def _read_word_list(path: str) -> List[str]:
+    """Satır başına kelime (sıklık sırasıyla) veya "kelime<TAB>sayı" listesini sıralı döndürür"""
+    entries: List[Tuple[str, Optional[float], int]] = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split()
+            count = float(parts[1]) if len(parts) > 1 else None
+            entries.append((parts[0].lower(), count, line_no))
+
+    if any(count is not None for _, count, _ in entries):
+        entries.sort(key=lambda e: (-(e[1] or 0), e[2]))
+
+    words: List[str] = []
+    seen: Set[str] = set()
+    for word, _, _ in entries:
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def build_lexicon(words: Sequence[str], path: str) -> None:
+    """Sıklık sırasındaki kelimelerden sözlük dosyası yazar (atomik olarak)"""
+    ranked = sorted(
+        ((word.encode("utf-8"), rank) for rank, word in enumerate(words, start=1)),
+        key=lambda e: e[0],
+    )
+
+    index = bytearray()
+    strings = bytearray()
+    for word, rank in ranked:
+        index += _ENTRY.pack(len(strings), rank)
+        strings += word
+    index += struct.pack("<I", len(strings))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(ranked)))
+        f.write(index)
+        f.write(strings)
+    os.replace(tmp_path, path)
+
+
+def _fallback_path() -> str:
+    return os.path.join(tempfile.gettempdir(), "letter-to-stars-lexicon.bin")
+
+
+@lru_cache()
+def get_lexicon(path: str = "") -> Optional[Lexicon]:
+    """
+    Sözlüğü açar (process başına bir kez); dosya yoksa seed listesinden oluşturur
+
+    app/data yazılamıyorsa (salt okunur image) dosya temp dizinine yazılır.
+    Sözlük açılamazsa None döner; kelime sonrası işleme atlanır.
+    """
+    candidates = [path] if path else [DEFAULT_PATH, _fallback_path()]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            try:
+                return Lexicon(candidate)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not open lexicon {candidate}: {str(e)}")
+
+    words = _read_word_list(SEED_PATH)
+    for candidate in candidates:
+        try:
+            build_lexicon(words, candidate)
+            logger.info(f"Built lexicon with {len(words)} words at {candidate}")
+            return Lexicon(candidate)
+        except OSError as e:
+            logger.warning(f"Could not build lexicon at {candidate}: {str(e)}")
+    return None
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Frekans listesinden mmap sözlük dosyası oluşturur")
+    parser.add_argument("--input", default=SEED_PATH, help="Kelime listesi (varsayılan: seed listesi)")
+    parser.add_argument("--output", default=DEFAULT_PATH, help="Sözlük dosyası")
+    args = parser.parse_args(list(argv) if argv is not None else None)
+
+    words = _read_word_list(args.input)
+    build_lexicon(words, args.output)
+    print(f"{len(words)} kelime -> {args.output} ({os.path.getsize(args.output)} byte)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,589 @@
+import asyncio
+import inspect
+import json
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from app.metrics import LLM_TOKENS, REWRITE_STAGE_SECONDS
+from app.services.output_schema import multi_level_output_schema, rewrite_output_schema
+from app.prompts.ielts_prompts import (
+    LEVEL_DESCRIPTIONS,
+    get_multi_level_prompt,
+    get_rewrite_prompt,
+    get_static_prefix,
+    get_user_prompt,
+)
+
+logger = logging.getLogger(__name__)
+
+PROMPT_MODES = ("inline", "system_instruction", "cached_content")
+
+# Tüm model konfigürasyonlarında ortak generation ayarları
+DEFAULT_GENERATION_CONFIG = {
+    "temperature": 0.7,  # Yaratıcılık seviyesi
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+}
+
+
+class LLMBackend:
+    """
+    Tek bir model konfigürasyonu için ortak arayüz
+
+    GeminiService prompt'u, cache'i ve parse'ı bilmeden bu arayüz üzerinden
+    ham model çıktısı (metin) alır. usage sözlüğü verilirse çağrının token sayıları
+    (prompt, candidates, cached, total) içine yazılır (kota takibi için).
+    """
+
+    name: str = "backend"
+    model_name: str = ""
+    generation_config: Dict[str, Any] = DEFAULT_GENERATION_CONFIG
+
+    async def generate(self, user_text: str, ielts_level: int, usage: Optional[Dict[str, int]] = None) -> str:
+        """Tüm yanıtı tek seferde döndürür"""
+        raise NotImplementedError
+
+    def stream(self, user_text: str, ielts_level: int, usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        """Yanıtı geldikçe metin parçaları halinde üretir"""
+        raise NotImplementedError
+
+    def generate_sync(self, user_text: str, ielts_level: int) -> str:
+        """generate'in senkron versiyonu (event loop dışından çağrılar için)"""
+        raise NotImplementedError
+
+    async def generate_levels(
+        self, user_text: str, ielts_levels: Tuple[int, ...], usage: Optional[Dict[str, int]] = None
+    ) -> str:
+        """Metni birden fazla seviyede tek üretimle dönüştürür (MultiLevelRewriteOutput JSON'u)"""
+        raise NotImplementedError
+
+    @property
+    def initialized(self) -> bool:
+        return True
+
+    def initialize(self) -> None:
+        """İstemciyi hazırlar; generation_config bundan sonra değişmez (cache key'in parçası)"""
+
+    async def warm_up(self, probe: bool = False) -> None:
+        """İlk istekten önce istemciyi hazırlar; probe=True ise backend'e ucuz bir çağrı da yapar"""
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "model": self.model_name}
+
+
+# ========================
+# Gemini
+# ========================
+
+_configured_api_key: Optional[str] = None
+
+
+def _configure_genai(api_key: str):
+    """google.generativeai'yi bir kere konfigüre eder ve modülü döndürür"""
+    global _configured_api_key
+    import google.generativeai as genai
+
+    if _configured_api_key != api_key:
+        genai.configure(api_key=api_key)
+        _configured_api_key = api_key
+    return genai
+
+
+def _sdk_supports_system_instruction(genai) -> bool:
+    """Kurulu google-generativeai GenerativeModel(system_instruction=...) destekliyor mu"""
+    return "system_instruction" in inspect.signature(genai.GenerativeModel.__init__).parameters
+
+
+def _sdk_generation_config_fields(genai) -> set:
+    """Kurulu SDK'nın GenerationConfig'te tanıdığı alanlar (response_mime_type, response_schema ...)"""
+    config_class = getattr(genai, "GenerationConfig", None)
+    return set(getattr(config_class, "__dataclass_fields__", {}))
+
+
+def _sdk_caching_module():
+    """Context caching destekleyen SDK'larda google.generativeai.caching, yoksa None"""
+    try:
+        from google.generativeai import caching
+    except ImportError:
+        return None
+    return caching
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Bir Gemini model konfigürasyonu
+
+    Statik prompt kısmının gönderilme şekli prompt_mode ile seçilir:
+        inline             - her istekte tam prompt
+        system_instruction - statik kısım seviye başına model'in system instruction'ı
+        cached_content     - statik kısım Gemini context cache'inde
+    SDK desteklemiyorsa bir alt moda düşülür.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        api_key: str,
+        model_name: str,
+        generation_config: Optional[Dict[str, Any]] = None,
+        prompt_mode: str = "system_instruction",
+        context_cache_ttl: int = 3600,
+        structured_output: bool = True,
+    ):
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY tanımlı değil")
+
+        self.name = name
+        self.model_name = model_name
+        self.generation_config = dict(generation_config or DEFAULT_GENERATION_CONFIG)
+        self.context_cache_ttl = context_cache_ttl
+
+        # SDK (google.generativeai + gRPC) ilk istekte veya warm-up'ta yüklenir;
+        # o zamana kadar istenen modlar raporlanır
+        self._api_key = api_key
+        self._genai = None
+        self.model = None
+        self.prompt_mode = prompt_mode
+        self.structured_output = "schema" if structured_output else "off"
+        self._requested_structured_output = structured_output
+        self._init_lock = threading.Lock()
+
+        # Statik prompt kısmı için seviye başına model (system instruction / cached content)
+        self._level_models: Dict[int, Any] = {}
+        self._level_model_expiry: Dict[int, float] = {}
+        # cached_content modunda seviye başına sağlayıcı tarafındaki CachedContent
+        self._level_caches: Dict[int, Any] = {}
+        self._level_model_lock = threading.Lock()
+        self._levels_generation_config: Optional[Dict[str, Any]] = None
+
+    @property
+    def initialized(self) -> bool:
+        return self.model is not None
+
+    def initialize(self) -> None:
+        """SDK'yı yükler, konfigüre eder ve model instance'ını oluşturur (birden fazla çağrılabilir)"""
+        if self.model is not None:
+            return
+
+        with self._init_lock:
+            if self.model is not None:
+                return
+
+            started = time.perf_counter()
+            self._genai = _configure_genai(self._api_key)
+
+            # JSON mode: SDK destekliyorsa generation config'e MIME type ve şema eklenir
+            # (generation config cache key'in parçası olduğu için modlar aynı cache'i paylaşmaz)
+            self.structured_output = self._apply_structured_output(self._requested_structured_output)
+            self.prompt_mode = self._resolve_prompt_mode(self.prompt_mode)
+
+            # Model instance'ı oluştur
+            self.model = self._genai.GenerativeModel(
+                self.model_name,
+                generation_config=self.generation_config
+            )
+            logger.info(f"Gemini backend '{self.name}' initialized in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    async def warm_up(self, probe: bool = False) -> None:
+        """
+        SDK'yı thread'de yükler; probe=True ise count_tokens ile bağlantıyı da açar
+        (üretim yapmadığı için token harcamaz)
+        """
+        await asyncio.to_thread(self.initialize)
+        if self.prompt_mode == "system_instruction":
+            # Seviye model'leri yerel nesnelerdir, ilk istekte oluşturulmasın
+            for ielts_level in LEVEL_DESCRIPTIONS:
+                self._level_model(ielts_level)
+        if not probe:
+            return
+
+        count_tokens_async = getattr(self.model, "count_tokens_async", None)
+        if count_tokens_async is not None:
+            await count_tokens_async("ping")
+        else:
+            await asyncio.to_thread(self.model.count_tokens, "ping")
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            **super().describe(),
+            "initialized": self.initialized,
+            "prompt_mode": self.prompt_mode,
+            "structured_output": self.structured_output,
+        }
+
+    def _apply_structured_output(self, enabled: bool) -> str:
+        """
+        Kurulu SDK'nın desteklediği en güçlü JSON modunu generation config'e ekler
+
+        Returns: schema | json | off
+        """
+        if not enabled:
+            return "off"
+
+        fields = _sdk_generation_config_fields(self._genai)
+        if "response_mime_type" not in fields:
+            logger.warning("Installed SDK has no response_mime_type support, structured output disabled")
+            return "off"
+
+        self.generation_config["response_mime_type"] = "application/json"
+        if "response_schema" not in fields:
+            logger.warning("Installed SDK has no response_schema support, using plain JSON mode")
+            return "json"
+
+        self.generation_config["response_schema"] = rewrite_output_schema()
+        return "schema"
+
+    def _resolve_prompt_mode(self, requested: str) -> str:
+        """İstenen prompt modunu kurulu SDK'nın desteklediği en yakın moda indirger"""
+        mode = requested if requested in PROMPT_MODES else "inline"
+        if mode != requested:
+            logger.warning(f"Unknown GEMINI_PROMPT_MODE '{requested}', using inline prompts")
+
+        if mode == "cached_content" and _sdk_caching_module() is None:
+            logger.warning("Installed SDK has no context caching, falling back to system_instruction")
+            mode = "system_instruction"
+
+        if mode == "system_instruction" and not _sdk_supports_system_instruction(self._genai):
+            logger.warning("Installed SDK has no system_instruction support, falling back to inline prompts")
+            mode = "inline"
+
+        return mode
+
+    async def generate(self, user_text: str, ielts_level: int, usage: Optional[Dict[str, int]] = None) -> str:
+        model, prompt = await self._model_and_prompt_async(user_text, ielts_level)
+
+        generate_async = getattr(model, "generate_content_async", None)
+        if generate_async is not None:
+            response = await generate_async(prompt)
+        else:
+            # Eski SDK: senkron çağrıyı default thread pool'a taşı
+            response = await asyncio.to_thread(model.generate_content, prompt)
+
+        self._record_usage(response, usage)
+        return response.text if response else ""
+
+    async def stream(self, user_text: str, ielts_level: int, usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        model, prompt = await self._model_and_prompt_async(user_text, ielts_level)
+
+        generate_async = getattr(model, "generate_content_async", None)
+        if generate_async is None:
+            # Eski SDK: stream yok, tüm yanıtı tek parça olarak ver
+            response = await asyncio.to_thread(model.generate_content, prompt)
+            self._record_usage(response, usage)
+            if response and response.text:
+                yield response.text
+            return
+
+        response = await generate_async(prompt, stream=True)
+        last_chunk = None
+        async for chunk in response:
+            last_chunk = chunk
+            if chunk.text:
+                yield chunk.text
+
+        # Stream'de usage_metadata son parçada toplam olarak gelir
+        self._record_usage(last_chunk, usage)
+
+    def generate_sync(self, user_text: str, ielts_level: int) -> str:
+        model, prompt = self._model_and_prompt(user_text, ielts_level)
+        response = model.generate_content(prompt)
+        self._record_usage(response)
+        return response.text if response else ""
+
+    async def generate_levels(
+        self, user_text: str, ielts_levels: Tuple[int, ...], usage: Optional[Dict[str, int]] = None
+    ) -> str:
+        """
+        Seviye kümesinin prompt'u her zaman inline gönderilir (statik kısım kümeye göre
+        değişir); şema modunda çıktı şeması istek bazında değiştirilir
+        """
+        if not self.initialized:
+            await asyncio.to_thread(self.initialize)
+        with REWRITE_STAGE_SECONDS.time(stage="prompt_build"):
+            prompt = get_multi_level_prompt(user_text, ielts_levels)
+        config = self._multi_level_config()
+
+        generate_async = getattr(self.model, "generate_content_async", None)
+        if generate_async is not None:
+            response = await generate_async(prompt, generation_config=config)
+        else:
+            response = await asyncio.to_thread(self.model.generate_content, prompt, generation_config=config)
+
+        self._record_usage(response, usage)
+        return response.text if response else ""
+
+    def _multi_level_config(self) -> Dict[str, Any]:
+        """Çok seviyeli üretimin generation config'i (initialize'dan sonra değişmez)"""
+        if self._levels_generation_config is None:
+            config = dict(self.generation_config)
+            if self.structured_output == "schema":
+                config["response_schema"] = multi_level_output_schema()
+            self._levels_generation_config = config
+        return self._levels_generation_config
+
+    def _record_usage(self, response, usage: Optional[Dict[str, int]] = None) -> None:
+        """Yanıttaki usage_metadata token sayılarını metriklere ve usage'a ekler (eski SDK'larda yok)"""
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is None:
+            return
+
+        for token_type, field in (
+            ("prompt", "prompt_token_count"),
+            ("candidates", "candidates_token_count"),
+            ("cached", "cached_content_token_count"),
+        ):
+            count = getattr(metadata, field, 0) or 0
+            if count:
+                LLM_TOKENS.inc(count, backend=self.name, model=self.model_name, type=token_type)
+            if usage is not None:
+                usage[token_type] = count
+        if usage is not None:
+            usage["total"] = getattr(metadata, "total_token_count", 0) or usage["prompt"] + usage["candidates"]
+
+    def _model_and_prompt(self, user_text: str, ielts_level: int):
+        """
+        İstek için kullanılacak (model, prompt) çiftini döndürür
+
+        inline modda tam prompt varsayılan model'e gönderilir; diğer modlarda statik
+        kısım seviye model'inde durur ve sadece küçük kullanıcı kısmı gönderilir.
+        """
+        self.initialize()
+        with REWRITE_STAGE_SECONDS.time(stage="prompt_build"):
+            if self.prompt_mode != "inline":
+                model = self._level_model(ielts_level)
+                if model is not None:
+                    return model, get_user_prompt(user_text)
+
+            return self.model, get_rewrite_prompt(user_text, ielts_level)
+
+    async def _model_and_prompt_async(self, user_text: str, ielts_level: int):
+        """_model_and_prompt; SDK yüklemesi veya context cache oluşturmak gerekiyorsa thread'de yapar"""
+        if not self.initialized or (
+            self.prompt_mode == "cached_content" and not self._level_model_ready(ielts_level)
+        ):
+            return await asyncio.to_thread(self._model_and_prompt, user_text, ielts_level)
+        return self._model_and_prompt(user_text, ielts_level)
+
+    def _level_model_ready(self, ielts_level: int) -> bool:
+        return (
+            ielts_level in self._level_models
+            and self._level_model_expiry.get(ielts_level, 0) > time.monotonic()
+        )
+
+    def _level_model(self, ielts_level: int):
+        """Seviyenin statik prefix'ini taşıyan model; oluşturulamazsa None (inline'a düşülür)"""
+        if self._level_model_ready(ielts_level):
+            return self._level_models[ielts_level]
+
+        with self._level_model_lock:
+            if self._level_model_ready(ielts_level):
+                return self._level_models[ielts_level]
+
+            if self.prompt_mode == "cached_content":
+                try:
+                    model = self._refresh_cached_content_model(ielts_level)
+                    # Cache sunucu tarafında silinmeden önce yenile
+                    self._level_models[ielts_level] = model
+                    self._level_model_expiry[ielts_level] = time.monotonic() + self.context_cache_ttl * 0.9
+                    return model
+                except Exception as e:
+                    # Örn. prefix sağlayıcının minimum cache boyutunun altında
+                    logger.warning(f"Context cache could not be created ({e}), falling back to system_instruction")
+                    self.prompt_mode = "system_instruction"
+
+            try:
+                model = self._genai.GenerativeModel(
+                    self.model_name,
+                    system_instruction=get_static_prefix(ielts_level),
+                    generation_config=self.generation_config
+                )
+            except Exception as e:
+                logger.warning(f"System instruction model could not be created ({e}), using inline prompts")
+                self.prompt_mode = "inline"
+                return None
+
+            self._level_models[ielts_level] = model
+            self._level_model_expiry[ielts_level] = float("inf")
+            return model
+
+    def _refresh_cached_content_model(self, ielts_level: int):
+        """Mevcut context cache'in TTL'ini uzatır; olmazsa yenisini oluşturup eskisini siler.
+
+        Her yenilemede yeni cache oluşturup eskisini bırakmak, eski cache TTL
+        dolana kadar sağlayıcı tarafında depolama ücreti biriktirir.
+        """
+        previous = self._level_caches.get(ielts_level)
+        if previous is not None:
+            try:
+                previous.update(ttl=timedelta(seconds=self.context_cache_ttl))
+                return self._level_models[ielts_level]
+            except Exception as e:
+                # Örn. cache sunucu tarafında zaten silinmiş
+                logger.info(f"Context cache TTL could not be extended ({e}), creating a new one")
+
+        model = self._create_cached_content_model(ielts_level)
+
+        if previous is not None:
+            try:
+                previous.delete()
+            except Exception as e:
+                logger.debug(f"Previous context cache could not be deleted: {e}")
+        return model
+
+    def _create_cached_content_model(self, ielts_level: int):
+        """Seviyenin statik prefix'ini Gemini context cache'ine yükler ve ona bağlı model döndürür"""
+        caching = _sdk_caching_module()
+        model_name = self.model_name if self.model_name.startswith("models/") else f"models/{self.model_name}"
+
+        cached_content = caching.CachedContent.create(
+            model=model_name,
+            display_name=f"ielts-rewrite-band-{ielts_level}",
+            system_instruction=get_static_prefix(ielts_level),
+            ttl=timedelta(seconds=self.context_cache_ttl),
+        )
+        logger.info(f"Created Gemini context cache for IELTS level {ielts_level}: {cached_content.name}")
+        self._level_caches[ielts_level] = cached_content
+
+        return self._genai.GenerativeModel.from_cached_content(
+            cached_content=cached_content,
+            generation_config=self.generation_config
+        )
+
+
+# ========================
+# Fake (ağsız test / benchmark)
+# ========================
+
+class FakeBackendError(RuntimeError):
+    """FakeBackend'in failure profiline göre ürettiği hata (geçici 5xx gibi davranır)"""
+
+    retryable = True
+
+
+class FakeBackend(LLMBackend):
+    """
+    Ağa çıkmadan Gemini'yi taklit eden backend
+
+    Ayarlanabilir gecikme (ortalama + jitter), hata oranı ve bozuk JSON oranıyla
+    pipeline'ın geri kalanını (cache, singleflight, parse, routing) çalıştırmak için.
+    Çıktı, kullanıcı metninden türetilmiş geçerli bir rewrite JSON'udur.
+    """
+
+    def __init__(
+        self,
+        name: str = "fake",
+        model_name: str = "fake-model",
+        latency_ms: float = 800.0,
+        latency_jitter_ms: float = 200.0,
+        failure_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        stream_chunks: int = 8,
+        seed: Optional[int] = None,
+    ):
+        self.name = name
+        self.model_name = model_name
+        self.generation_config = dict(DEFAULT_GENERATION_CONFIG)
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self.stream_chunks = max(1, stream_chunks)
+        self._random = random.Random(seed)
+
+        self.calls = 0
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            **super().describe(),
+            "latency_ms": self.latency_ms,
+            "latency_jitter_ms": self.latency_jitter_ms,
+            "failure_rate": self.failure_rate,
+            "malformed_rate": self.malformed_rate,
+        }
+
+    def _latency_seconds(self) -> float:
+        latency = self._random.gauss(self.latency_ms, self.latency_jitter_ms)
+        return max(0.0, latency) / 1000
+
+    def _respond(self, output: Dict[str, Any], prompt: str, usage: Optional[Dict[str, int]] = None) -> str:
+        self.calls += 1
+
+        if self._random.random() < self.failure_rate:
+            raise FakeBackendError("Fake backend failure")
+
+        text = "```json\n" + json.dumps(output, ensure_ascii=False, indent=2) + "\n```"
+
+        if self._random.random() < self.malformed_rate:
+            # max_output_tokens'ta kesilmiş yanıt gibi
+            text = text[: len(text) // 2]
+
+        if usage is not None:
+            # Gemini'nin usage_metadata'sı gibi (~4 karakter / token)
+            usage["prompt"] = len(prompt) // 4
+            usage["candidates"] = len(text) // 4
+            usage["cached"] = 0
+            usage["total"] = usage["prompt"] + usage["candidates"]
+        return text
+
+    @staticmethod
+    def fake_output(user_text: str, ielts_level: int) -> Dict[str, Any]:
+        """Kullanıcı metninden deterministik, şemaya uygun bir model çıktısı"""
+        return {
+            "grammar_corrections": [],
+            "rewritten_text": f"[Band {ielts_level}] {user_text}",
+            "new_words": [
+                {"english_word": "serene", "turkish_meaning": "huzurlu"},
+                {"english_word": "contemplate", "turkish_meaning": "derin düşünmek"},
+            ],
+            "writing_tips": ["Try combining short sentences into complex structures."],
+            "strengths": ["The meaning is clear."],
+            "weaknesses": ["Limited vocabulary range."],
+            "overall_feedback": f"Fake feedback for IELTS Band {ielts_level}.",
+        }
+
+    @classmethod
+    def fake_multi_level_output(cls, user_text: str, ielts_levels: Tuple[int, ...]) -> Dict[str, Any]:
+        """fake_output'un çok seviyeli karşılığı (ortak analiz + seviye başına rewrite)"""
+        outputs = [cls.fake_output(user_text, ielts_level) for ielts_level in ielts_levels]
+        shared = {key: value for key, value in outputs[0].items() if key not in ("rewritten_text", "new_words")}
+        return {
+            **shared,
+            "overall_feedback": f"Fake feedback for IELTS Bands {', '.join(map(str, ielts_levels))}.",
+            "levels": [
+                {"ielts_level": ielts_level, "rewritten_text": output["rewritten_text"], "new_words": output["new_words"]}
+                for ielts_level, output in zip(ielts_levels, outputs)
+            ],
+        }
+
+    async def generate(self, user_text: str, ielts_level: int, usage: Optional[Dict[str, int]] = None) -> str:
+        await asyncio.sleep(self._latency_seconds())
+        return self._respond(self.fake_output(user_text, ielts_level), get_rewrite_prompt(user_text, ielts_level), usage)
+
+    async def stream(self, user_text: str, ielts_level: int, usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        total = self._latency_seconds()
+        text = self._respond(self.fake_output(user_text, ielts_level), get_rewrite_prompt(user_text, ielts_level), usage)
+
+        step = max(1, -(-len(text) // self.stream_chunks))
+        for i in range(0, len(text), step):
+            await asyncio.sleep(total / self.stream_chunks)
+            yield text[i:i + step]
+
+    def generate_sync(self, user_text: str, ielts_level: int) -> str:
+        time.sleep(self._latency_seconds())
+        return self._respond(self.fake_output(user_text, ielts_level), get_rewrite_prompt(user_text, ielts_level))
+
+    async def generate_levels(
+        self, user_text: str, ielts_levels: Tuple[int, ...], usage: Optional[Dict[str, int]] = None
+    ) -> str:
+        # Çıktı seviye sayısıyla uzar
+        await asyncio.sleep(self._latency_seconds() * (1 + 0.5 * (len(ielts_levels) - 1)))
+        return self._respond(
+            self.fake_multi_level_output(user_text, ielts_levels),
+            get_multi_level_prompt(user_text, ielts_levels),
+            usage,
+        )
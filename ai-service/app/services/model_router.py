@@ -0,0 +1,197 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.services.llm_backends import FakeBackend, GeminiBackend, LLMBackend
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """
+    Bir backend'in son window_seconds içindeki gecikme ve hata istatistikleri
+
+    Kayıtlar (zaman, gecikme, başarılı mı) olarak tutulur; eski kayıtlar
+    okunurken ve yazılırken atılır. En fazla max_samples kayıt saklanır.
+    """
+
+    def __init__(self, window_seconds: float = 300.0, max_samples: int = 1000):
+        self.window_seconds = window_seconds
+        self._samples: Deque[Tuple[float, float, bool]] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, latency, ok))
+            self._expire(now)
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+
+    def _snapshot(self) -> List[Tuple[float, float, bool]]:
+        with self._lock:
+            self._expire(time.monotonic())
+            return list(self._samples)
+
+    @property
+    def count(self) -> int:
+        return len(self._snapshot())
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Başarılı isteklerin q (0-1) persentil gecikmesi (saniye), veri yoksa None"""
+        latencies = sorted(latency for _, latency, ok in self._snapshot() if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, max(0, math.ceil(q * len(latencies)) - 1))
+        return latencies[index]
+
+    def error_rate(self) -> float:
+        samples = self._snapshot()
+        if not samples:
+            return 0.0
+        return sum(1 for _, _, ok in samples if not ok) / len(samples)
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.percentile(0.50)
+        p95 = self.percentile(0.95)
+        return {
+            "samples": self.count,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_rate": round(self.error_rate(), 4),
+        }
+
+
+class ModelRouter:
+    """
+    Her isteği uygun model konfigürasyonuna yönlendirir
+
+    Kurallar (sırayla):
+    1. Uzun metinler (>= long_text_chars) ve yüksek seviyeler (>= strong_min_level)
+       "strong" backend'e, diğerleri "default" backend'e gider.
+    2. Seçilen backend sağlıksızsa (p95 > max_p95_ms veya hata oranı > max_error_rate,
+       en az min_samples kayıtla) ve "fast" backend sağlıklıysa fast'e gidilir.
+
+    strong/fast tanımlı değilse ilgili kural atlanır.
+    """
+
+    def __init__(
+        self,
+        default: LLMBackend,
+        fast: Optional[LLMBackend] = None,
+        strong: Optional[LLMBackend] = None,
+        long_text_chars: int = 4000,
+        strong_min_level: int = 9,
+        max_p95_ms: float = 15000.0,
+        max_error_rate: float = 0.5,
+        min_samples: int = 20,
+        window_seconds: float = 300.0,
+    ):
+        self.default = default
+        self.fast = fast
+        self.strong = strong
+        self.long_text_chars = long_text_chars
+        self.strong_min_level = strong_min_level
+        self.max_p95_ms = max_p95_ms
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+
+        self.backends: Dict[str, LLMBackend] = {
+            backend.name: backend for backend in (default, fast, strong) if backend is not None
+        }
+        self.trackers: Dict[str, LatencyTracker] = {
+            name: LatencyTracker(window_seconds=window_seconds) for name in self.backends
+        }
+        self.routed: Dict[str, int] = {name: 0 for name in self.backends}
+
+    @classmethod
+    def from_settings(cls, settings) -> "ModelRouter":
+        """Settings'teki backend ve routing ayarlarından router oluşturur"""
+        if settings.llm_backend == "fake":
+            default = FakeBackend(
+                name="default",
+                latency_ms=settings.fake_latency_ms,
+                latency_jitter_ms=settings.fake_latency_jitter_ms,
+                failure_rate=settings.fake_failure_rate,
+                malformed_rate=settings.fake_malformed_rate,
+            )
+            fast = strong = None
+        elif settings.llm_backend == "gemini":
+            def gemini(name: str, model_name: str) -> GeminiBackend:
+                return GeminiBackend(
+                    name=name,
+                    api_key=settings.gemini_api_key,
+                    model_name=model_name,
+                    prompt_mode=settings.gemini_prompt_mode,
+                    context_cache_ttl=settings.gemini_context_cache_ttl_seconds,
+                    structured_output=settings.gemini_structured_output,
+                )
+
+            default = gemini("default", settings.gemini_model)
+            fast = gemini("fast", settings.gemini_fast_model) if settings.gemini_fast_model else None
+            strong = gemini("strong", settings.gemini_strong_model) if settings.gemini_strong_model else None
+        else:
+            raise ValueError(f"Bilinmeyen LLM_BACKEND: {settings.llm_backend}")
+
+        return cls(
+            default=default,
+            fast=fast,
+            strong=strong,
+            long_text_chars=settings.router_long_text_chars,
+            strong_min_level=settings.router_strong_min_level,
+            max_p95_ms=settings.router_max_p95_ms,
+            max_error_rate=settings.router_max_error_rate,
+            min_samples=settings.router_min_samples,
+            window_seconds=settings.router_window_seconds,
+        )
+
+    def route(self, user_text: str, ielts_level: int) -> LLMBackend:
+        """İstek için backend seçer"""
+        backend = self.default
+        if self.strong is not None and (
+            len(user_text) >= self.long_text_chars or ielts_level >= self.strong_min_level
+        ):
+            backend = self.strong
+
+        if backend is not self.fast and self.fast is not None and not self.is_healthy(backend):
+            if self.is_healthy(self.fast):
+                logger.info(f"Backend '{backend.name}' is degraded, routing to '{self.fast.name}'")
+                backend = self.fast
+
+        self.routed[backend.name] += 1
+        return backend
+
+    def is_healthy(self, backend: LLMBackend) -> bool:
+        tracker = self.trackers[backend.name]
+        if tracker.count < self.min_samples:
+            return True
+
+        if tracker.error_rate() > self.max_error_rate:
+            return False
+
+        p95 = tracker.percentile(0.95)
+        return p95 is None or p95 * 1000 <= self.max_p95_ms
+
+    def record(self, backend: LLMBackend, latency: float, ok: bool) -> None:
+        """Backend çağrısının sonucunu kaydeder (parse edilemeyen yanıtlar da hata sayılır)"""
+        self.trackers[backend.name].record(latency, ok)
+
+    def tracker(self, backend: LLMBackend) -> LatencyTracker:
+        return self.trackers[backend.name]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                **backend.describe(),
+                "routed": self.routed[name],
+                "healthy": self.is_healthy(backend),
+                **self.trackers[name].stats(),
+            }
+            for name, backend in self.backends.items()
+        }
@@ -0,0 +1,74 @@
+import copy
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet
+
+from app.models import MultiLevelRewriteOutput, RewriteResponse
+
+# Modelin üretmediği, istekten / yerelde hesaplanan alanlar
+_EXCLUDED_FIELDS: Dict[str, FrozenSet[str]] = {
+    "RewriteResponse": frozenset({"original_text", "ielts_level", "lexical_stats", "alignment", "truncated"}),
+    "GrammarCorrection": frozenset({"start", "end"}),
+}
+
+# Gemini response_schema'nın (OpenAPI alt kümesi) kabul ettiği anahtarlar
+_ALLOWED_KEYS = {"type", "format", "description", "nullable", "enum", "items", "properties", "required"}
+
+
+def _convert(schema: Dict[str, Any], defs: Dict[str, Any], name: str = "") -> Dict[str, Any]:
+    """Pydantic JSON schema düğümünü $ref'siz, sadece izin verilen anahtarlı hale getirir"""
+    if "$ref" in schema:
+        ref_name = schema["$ref"].rsplit("/", 1)[-1]
+        return _convert(defs[ref_name], defs, ref_name)
+
+    # Optional[X] -> anyOf [X, null]
+    if "anyOf" in schema:
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        converted = _convert(options[0], defs, name)
+        if len(options) < len(schema["anyOf"]):
+            converted["nullable"] = True
+        return converted
+
+    result = {key: value for key, value in schema.items() if key in _ALLOWED_KEYS}
+    if "items" in schema:
+        result["items"] = _convert(schema["items"], defs)
+    if "properties" in schema:
+        excluded = _EXCLUDED_FIELDS.get(schema.get("title", name), frozenset())
+        result["properties"] = {
+            key: _convert(value, defs)
+            for key, value in schema["properties"].items()
+            if key not in excluded
+        }
+        result["required"] = [key for key in schema.get("required", []) if key not in excluded]
+        # Liste alanları da her zaman üretilsin (boş liste olabilir)
+        result["required"] += [
+            key for key, value in result["properties"].items()
+            if key not in result["required"] and value.get("type") == "array"
+        ]
+    return result
+
+
+@lru_cache(maxsize=None)
+def _rewrite_output_schema() -> Dict[str, Any]:
+    schema = RewriteResponse.model_json_schema()
+    return _convert(schema, schema.get("$defs", {}), "RewriteResponse")
+
+
+def rewrite_output_schema() -> Dict[str, Any]:
+    """
+    Modelden beklenen çıktının response_schema'sı (RewriteResponse'tan üretilir)
+
+    İstekten gelen (original_text, ielts_level) ve yerelde hesaplanan alanlar
+    (lexical_stats, hizalama, düzeltme konumları) şemada yoktur. Her çağrıda yeni kopya döner.
+    """
+    return copy.deepcopy(_rewrite_output_schema())
+
+
+@lru_cache(maxsize=None)
+def _multi_level_output_schema() -> Dict[str, Any]:
+    schema = MultiLevelRewriteOutput.model_json_schema()
+    return _convert(schema, schema.get("$defs", {}), "MultiLevelRewriteOutput")
+
+
+def multi_level_output_schema() -> Dict[str, Any]:
+    """Çok seviyeli rewrite çıktısının response_schema'sı (MultiLevelRewriteOutput'tan üretilir)"""
+    return copy.deepcopy(_multi_level_output_schema())
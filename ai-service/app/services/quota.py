@@ -0,0 +1,163 @@
+import asyncio
+import math
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.metrics import ADMISSION_REJECTED, GEMINI_QUOTA_TOKENS, GEMINI_QUOTA_WAIT_SECONDS
+from app.services.admission import AdmissionRejected
+
+
+class TokenBucket:
+    """
+    Dakikalık kotayı saniyeye yayarak dolan kova
+
+    reserve kovayı eksiye düşürebilir (borç): sıradaki rezervasyon borç ödenene kadar
+    bekler, böylece istekler geliş sırasıyla ve kota hızında dağıtılır. Kova en fazla
+    burst_seconds'lık birikim tutar; rate, herhangi bir 60 saniyelik pencerede
+    kullanılan miktar per_minute * headroom'u aşmayacak şekilde seçilir.
+    """
+
+    def __init__(self, per_minute: float, headroom: float = 0.97, burst_seconds: float = 2.0):
+        self.per_minute = per_minute
+        self.rate = per_minute * headroom / (60.0 + burst_seconds)
+        self.capacity = self.rate * burst_seconds
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """amount'u ayırır ve kullanılabilmesi için beklenmesi gereken süreyi döndürür (saniye)"""
+        self._refill()
+        self._tokens -= amount
+        return max(0.0, -self._tokens / self.rate)
+
+    def refund(self, amount: float) -> None:
+        """Kullanılmayan (iptal / tahminden az harcanan) miktarı geri koyar; eksi değer ek harcamadır"""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+
+class QuotaReservation(NamedTuple):
+    requests: int
+    tokens: int
+
+
+class QuotaScheduler:
+    """
+    Bir modelin RPM / TPM kotasına göre isteklerin Gemini'ye gönderilme hızı
+
+    Her istek gönderilmeden önce bir istek ve tahmini token maliyeti kadar kovalardan
+    ayırır; kovalar boşsa kota açılana kadar bekler (max_wait'ten uzun sürecekse
+    AdmissionRejected). Tahmin: prompt karakterlerinden (get_rewrite_prompt ile aynı
+    uzunluk) ve beklenen çıktıdan. Yanıt gelince usage_metadata'daki gerçek sayıyla
+    fark kovaya geri konur / kovadan düşülür, tahmin katsayıları da gerçeğe yaklaştırılır.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        rpm: float = 0,
+        tpm: float = 0,
+        headroom: float = 0.97,
+        burst_seconds: float = 2.0,
+        max_wait: float = 20.0,
+        output_base_tokens: int = 500,
+    ):
+        self.model = model
+        self.max_wait = max_wait
+        self.requests = TokenBucket(rpm, headroom, burst_seconds) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, headroom, burst_seconds) if tpm > 0 else None
+
+        # Tahmin katsayıları (gerçek kullanımla güncellenir)
+        self.chars_per_token = 4.0
+        # Çıktı: sabit kısım (JSON alanları, geri bildirim) + kullanıcı metni başına oran
+        self.output_base_tokens = output_base_tokens
+        self.output_per_input_token = 1.5
+
+    def estimate(self, prompt_chars: int, user_chars: int) -> int:
+        """İsteğin tahmini toplam token maliyeti (prompt + çıktı)"""
+        prompt_tokens = prompt_chars / self.chars_per_token
+        output_tokens = self.output_base_tokens + self.output_per_input_token * user_chars / self.chars_per_token
+        return math.ceil(prompt_tokens + output_tokens)
+
+    async def acquire(self, prompt_chars: int, user_chars: int) -> QuotaReservation:
+        """
+        Kota açılana kadar bekler ve ayrılan miktarı döndürür
+
+        Raises:
+            AdmissionRejected: Kota max_wait içinde açılmayacak
+        """
+        reservation = QuotaReservation(
+            1 if self.requests is not None else 0,
+            self.estimate(prompt_chars, user_chars) if self.tokens is not None else 0,
+        )
+        wait = max(
+            self.requests.reserve(reservation.requests) if self.requests is not None else 0.0,
+            self.tokens.reserve(reservation.tokens) if self.tokens is not None else 0.0,
+        )
+        if wait > self.max_wait:
+            self.refund(reservation)
+            ADMISSION_REJECTED.inc(reason="quota")
+            raise AdmissionRejected(
+                "AI servisi kullanım kotasına ulaştı, lütfen daha sonra tekrar deneyin",
+                int(min(60, math.ceil(wait)))
+            )
+
+        GEMINI_QUOTA_WAIT_SECONDS.observe(wait, model=self.model)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Gönderilmeyen istek kotadan düşülmez
+                self.refund(reservation)
+                raise
+        return reservation
+
+    def reconcile(self, reservation: QuotaReservation, usage: Dict[str, int], prompt_chars: int, user_chars: int) -> None:
+        """
+        Tahmini gerçek kullanımla düzeltir
+
+        usage boşsa (hata, usage_metadata yok) tahmin harcanmış sayılır.
+        """
+        total = usage.get("total")
+        if not total or self.tokens is None:
+            return
+
+        GEMINI_QUOTA_TOKENS.inc(reservation.tokens, model=self.model, type="estimated")
+        GEMINI_QUOTA_TOKENS.inc(total, model=self.model, type="actual")
+        self.tokens.refund(reservation.tokens - total)
+
+        prompt_tokens = usage.get("prompt", 0)
+        if prompt_tokens:
+            self.chars_per_token = 0.9 * self.chars_per_token + 0.1 * (prompt_chars / prompt_tokens)
+        candidates = usage.get("candidates", 0)
+        if candidates and user_chars:
+            user_tokens = user_chars / self.chars_per_token
+            ratio = max(0.0, candidates - self.output_base_tokens) / user_tokens
+            self.output_per_input_token = 0.9 * self.output_per_input_token + 0.1 * ratio
+
+    def refund(self, reservation: QuotaReservation) -> None:
+        """Gönderilmeyen isteğin ayırdığı kotayı geri verir"""
+        if self.requests is not None:
+            self.requests.refund(reservation.requests)
+        if self.tokens is not None:
+            self.tokens.refund(reservation.tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rpm": self.requests.per_minute if self.requests is not None else None,
+            "tpm": self.tokens.per_minute if self.tokens is not None else None,
+            "requests_available": round(self.requests.available, 2) if self.requests is not None else None,
+            "tokens_available": round(self.tokens.available) if self.tokens is not None else None,
+            "chars_per_token": round(self.chars_per_token, 2),
+            "output_per_input_token": round(self.output_per_input_token, 2),
+        }
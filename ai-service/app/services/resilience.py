@@ -0,0 +1,352 @@
+import asyncio
+import logging
+import random
+import time
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+from app.metrics import (
+    CIRCUIT_BREAKER_REJECTIONS,
+    CIRCUIT_BREAKER_STATE,
+    LLM_ATTEMPTS,
+    LLM_HEDGES,
+    LLM_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Toplam bütçede bundan az süre kalmışsa tekrar deneme / hedge gönderilmez (yetişmeyecek istek kota harcar)
+_MIN_ATTEMPT_SECONDS = 1.0
+
+
+class MalformedResponseError(ValueError):
+    """Model yanıtı JSON değil veya şemaya uymuyor (tekrar denemek genelde düzeltir)"""
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """İstek bütçesi yerel beklemeler (kuyruk, kota) sırasında bitti; backend'e gönderilmedi"""
+
+
+class CircuitOpenError(Exception):
+    """Backend art arda hata verdi; devre açık, istek backend'e gönderilmeden reddedildi"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@lru_cache(maxsize=None)
+def _retryable_errors() -> Tuple[Type[BaseException], ...]:
+    """
+    Tekrar denenebilir hata tipleri; google.api_core'daki geçici hatalar (5xx ve 429)
+    kuruluysa eklenir. İlk hatada yüklenir (import'u açılış süresine eklenmesin)
+    """
+    errors: Tuple[Type[BaseException], ...] = (asyncio.TimeoutError, ConnectionError, MalformedResponseError)
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return errors
+    return errors + (exceptions.ServerError, exceptions.TooManyRequests)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Aynı isteği tekrar göndermenin anlamlı olduğu hatalar"""
+    return isinstance(error, _retryable_errors()) or getattr(error, "retryable", False)
+
+
+class CircuitBreaker:
+    """
+    Art arda failure_threshold hata sonrası devreyi açar
+
+    closed    - istekler geçer, art arda hatalar sayılır
+    open      - recovery_timeout boyunca istekler hemen CircuitOpenError alır
+    half_open - süre dolunca tek bir deneme isteği geçer; başarılıysa kapanır,
+                başarısızsa devre tekrar açılır
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        CIRCUIT_BREAKER_STATE.set_function(lambda: self._STATE_VALUES[self.state], backend=name)
+
+    def before_call(self) -> None:
+        """
+        Raises:
+            CircuitOpenError: Devre açıksa (veya half_open'da deneme isteği zaten gönderildiyse)
+        """
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.recovery_timeout - time.monotonic()
+            if remaining > 0:
+                self._reject(remaining)
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+            logger.info(f"Circuit '{self.name}' half-open, sending probe request")
+
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self._reject(1)
+            self._probe_in_flight = True
+
+    def _reject(self, retry_after: float) -> None:
+        CIRCUIT_BREAKER_REJECTIONS.inc(backend=self.name)
+        raise CircuitOpenError(
+            "AI servisi geçici olarak kullanılamıyor, lütfen daha sonra tekrar deneyin",
+            max(1, int(retry_after + 0.999))
+        )
+
+    def release_probe(self) -> None:
+        """Sonucu bilinmeyen deneme isteğini geri bırakır (sonraki istek yeniden deneyebilir)"""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit '{self.name}' closed")
+        self.state = self.CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit '{self.name}' opened after {self._failures} consecutive failures")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def stats(self):
+        return {"state": self.state, "consecutive_failures": self._failures}
+
+
+class AttemptClock:
+    """
+    Bir denemenin backend'de geçen süresi
+
+    Deneme, yerel beklemeler (admission kuyruğu, kota) bittikten sonra saati
+    başlatır; attempt_timeout ve breaker / hedge / routing'e bildirilen gecikme
+    o andan itibaren sayılır. Saat başlamadan biten denemeler kaydedilmez.
+    """
+
+    def __init__(self, policy: "ResiliencePolicy", deadline: Optional[float] = None):
+        self.policy = policy
+        self.deadline = deadline
+        self.started: Optional[float] = None
+        self._expires_at = 0.0
+
+    def start(self) -> None:
+        """
+        Raises:
+            DeadlineExceeded: Yerel beklemeler sırasında istek bütçesi bittiyse
+        """
+        remaining = self.policy.remaining(self.deadline)
+        if remaining <= 0:
+            raise DeadlineExceeded("İstek süresi backend'e gönderilmeden doldu")
+        self.started = time.perf_counter()
+        self._expires_at = time.monotonic() + min(self.policy.attempt_timeout, remaining)
+
+    def timeout(self) -> float:
+        """Denemenin kalan süresi: min(attempt_timeout, bütçe) - geçen süre"""
+        return max(0.0, self._expires_at - time.monotonic())
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Saati başlatır ve backend çağrısını denemenin süre sınırıyla bekler"""
+        self.start()
+        return await asyncio.wait_for(fn(), timeout=self.timeout())
+
+
+class ResiliencePolicy:
+    """
+    Tek bir LLM isteğini deadline, retry, hedging ve circuit breaker ile çalıştırır
+
+    - Her deneme backend'e gönderildiği andan itibaren (AttemptClock) attempt_timeout
+      ile, tüm denemeler (backoff dahil) total_timeout ile sınırlıdır; total_timeout çağıranın (backend) timeout'undan kısa tutulur ki
+      kimsenin beklemediği isteğe tekrar deneme gönderilmesin.
+    - Tekrar denenebilir hatalarda (timeout, 5xx/429, bozuk yanıt) en fazla
+      max_attempts deneme yapılır; aralarda jitter'lı üstel backoff beklenir.
+      Backoff sonrası bütçede yeterli süre kalmayacaksa tekrar denenmez.
+    - hedge_delay verilirse ilk deneme o süre içinde bitmezse ikinci bir istek
+      gönderilir; ilk geçerli yanıt alınır, diğeri iptal edilir.
+    - Bozuk yanıtlar devreyi açmaz (backend ayakta); diğer hatalar açar.
+    - neutral_errors (örn. admission reddi) ne devreyi ne on_attempt'i etkiler.
+
+    on_attempt(latency, ok) her tamamlanan denemeden sonra çağrılır (routing istatistikleri için).
+    """
+
+    def __init__(
+        self,
+        breaker: CircuitBreaker,
+        attempt_timeout: float = 30.0,
+        total_timeout: Optional[float] = None,
+        max_attempts: int = 3,
+        backoff_base: float = 0.25,
+        backoff_max: float = 4.0,
+        on_attempt: Optional[Callable[[float, bool], None]] = None,
+        neutral_errors: Tuple[Type[BaseException], ...] = (),
+    ):
+        self.breaker = breaker
+        self.attempt_timeout = attempt_timeout
+        self.total_timeout = total_timeout if total_timeout and total_timeout > 0 else None
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.on_attempt = on_attempt
+        self.neutral_errors = neutral_errors
+
+    def backoff(self, attempt: int) -> float:
+        """attempt. denemeden sonra beklenecek süre (full jitter)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+
+    def deadline(self) -> Optional[float]:
+        """Şimdi başlayan isteğin toplam bütçesinin bittiği an (time.monotonic); sınır yoksa None"""
+        return time.monotonic() + self.total_timeout if self.total_timeout is not None else None
+
+    @staticmethod
+    def remaining(deadline: Optional[float]) -> float:
+        """Bütçede kalan süre (sınır yoksa sonsuz)"""
+        return deadline - time.monotonic() if deadline is not None else float("inf")
+
+    async def run(self, attempt: Callable[[AttemptClock], Awaitable[T]], hedge_delay: Optional[float] = None) -> T:
+        """
+        attempt, backend çağrısını kendisine verilen AttemptClock.call ile yapar
+
+        Raises:
+            CircuitOpenError: Devre açıksa
+            Son denemenin hatası: Tüm denemeler başarısızsa, hata tekrar denenemezse
+                veya toplam bütçe bittiyse
+        """
+        deadline = self.deadline()
+        number = 1
+        while True:
+            self.breaker.before_call()
+            try:
+                result = await self._hedged(attempt, hedge_delay, deadline)
+            except asyncio.CancelledError:
+                # İstemci gitti: half_open deneme hakkını bir sonraki isteğe bırak
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                await self.handle_failure(e, number, deadline=deadline)
+                number += 1
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    async def handle_failure(
+        self, error: Exception, number: int, can_retry: bool = True, deadline: Optional[float] = None
+    ) -> None:
+        """
+        number. denemenin hatasını devreye işler; tekrar denenecekse backoff kadar bekler
+
+        Raises:
+            error: Tekrar denenmeyecekse (son deneme, kalıcı hata, can_retry=False veya
+                backoff sonrası deadline'a _MIN_ATTEMPT_SECONDS'tan az kalacaksa)
+        """
+        if isinstance(error, MalformedResponseError):
+            self.breaker.record_success()
+        elif isinstance(error, self.neutral_errors + (DeadlineExceeded,)):
+            self.breaker.release_probe()
+        else:
+            self.breaker.record_failure()
+
+        if not can_retry or number >= self.max_attempts or not is_retryable(error):
+            raise error
+
+        delay = self.backoff(number)
+        if self.remaining(deadline) - delay < _MIN_ATTEMPT_SECONDS:
+            logger.warning(
+                f"LLM attempt {number}/{self.max_attempts} on '{self.breaker.name}' failed "
+                f"({type(error).__name__}: {error}), request budget exhausted, not retrying"
+            )
+            raise error
+
+        LLM_RETRIES.inc(backend=self.breaker.name)
+        logger.warning(
+            f"LLM attempt {number}/{self.max_attempts} on '{self.breaker.name}' failed "
+            f"({type(error).__name__}: {error}), retrying in {delay:.2f}s"
+        )
+        await asyncio.sleep(delay)
+
+    def record_attempt(self, started: float, error: Optional[BaseException] = None) -> None:
+        """Deneme sonucunu metriklere ve on_attempt'e bildirir"""
+        if error is None:
+            result = "ok"
+        elif isinstance(error, self.neutral_errors + (DeadlineExceeded,)):
+            return
+        elif isinstance(error, asyncio.TimeoutError):
+            result = "timeout"
+        elif isinstance(error, MalformedResponseError):
+            result = "malformed"
+        else:
+            result = "error"
+
+        LLM_ATTEMPTS.inc(backend=self.breaker.name, result=result)
+        if self.on_attempt is not None:
+            self.on_attempt(time.perf_counter() - started, error is None)
+
+    async def _timed_attempt(
+        self, attempt: Callable[[AttemptClock], Awaitable[T]], deadline: Optional[float] = None
+    ) -> T:
+        clock = AttemptClock(self, deadline)
+        try:
+            result = await attempt(clock)
+        except Exception as e:
+            if clock.started is not None:
+                self.record_attempt(clock.started, e)
+            raise
+        # İptal edilen (kaybeden hedge) denemeler kaydedilmez
+        if clock.started is not None:
+            self.record_attempt(clock.started)
+        return result
+
+    async def _hedged(
+        self,
+        attempt: Callable[[AttemptClock], Awaitable[T]],
+        hedge_delay: Optional[float],
+        deadline: Optional[float] = None,
+    ) -> T:
+        if hedge_delay is None:
+            return await self._timed_attempt(attempt, deadline)
+
+        name = self.breaker.name
+        primary = asyncio.ensure_future(self._timed_attempt(attempt, deadline))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            # Hedge de yaklaşık hedge_delay (p95) sürer; bütçe yetmeyecekse gönderilmez
+            if not done and self.remaining(deadline) >= max(hedge_delay, _MIN_ATTEMPT_SECONDS):
+                LLM_HEDGES.inc(backend=name, result="fired")
+                logger.info(f"LLM call on '{name}' slower than {hedge_delay:.2f}s, sending hedged request")
+                tasks.add(asyncio.ensure_future(self._timed_attempt(attempt, deadline)))
+
+            # İlk geçerli yanıtı al; biri hata verirse diğerini bekle
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            LLM_HEDGES.inc(backend=name, result="won")
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
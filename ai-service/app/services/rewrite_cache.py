@@ -0,0 +1,180 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from app.prompts.ielts_prompts import get_multi_level_prompt, get_rewrite_prompt
+
+# Prompt versiyonunu hesaplarken kullanıcı metni yerine konan işaret
+_PROMPT_MARKER = "\x00__USER_TEXT__\x00"
+
+_HORIZONTAL_WS = re.compile(r"[^\S\n]+")
+_EXTRA_NEWLINES = re.compile(r"\n{3,}")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Cache key için kullanıcı metnini normalize eder
+
+    - Unicode NFC
+    - CRLF / CR -> LF
+    - Satır içi boşluklar tek boşluğa indirilir, satır sonu boşlukları silinir
+    - 2'den fazla boş satır paragraf ayırıcısına (\\n\\n) indirilir
+
+    Paragraf yapısı korunur çünkü model çıktısını etkiler.
+    """
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = _HORIZONTAL_WS.sub(" ", text)
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    text = _EXTRA_NEWLINES.sub("\n\n", text)
+    return text.strip()
+
+
+@lru_cache(maxsize=None)
+def get_prompt_version(ielts_level: int) -> str:
+    """
+    Seviyeye ait prompt şablonunun kısa hash'i
+
+    Prompt metni değiştiğinde versiyon da değişir, eski cache kayıtları
+    otomatik olarak geçersiz kalır.
+    """
+    template = get_rewrite_prompt(_PROMPT_MARKER, ielts_level)
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def get_multi_level_prompt_version(ielts_levels: Tuple[int, ...]) -> str:
+    """
+    Seviye kümesinin birleşik prompt şablonunun kısa hash'i
+
+    Birleşik üretimin çıktısı (ör. "Bands 6, 8" için yazılmış feedback) tek seviyeli
+    rewrite'tan farklıdır; bu versiyonla oluşan key'ler /rewrite key'leriyle çakışmaz.
+    """
+    template = get_multi_level_prompt(_PROMPT_MARKER, ielts_levels)
+    return "levels-" + hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+def make_cache_key(
+    user_text: str,
+    ielts_level: int,
+    model_name: str,
+    generation_config: Dict[str, Any],
+    prompt_version: Optional[str] = None,
+) -> str:
+    """
+    Rewrite sonucunu belirleyen tüm girdilerden içerik adresli key üretir
+
+    prompt_version verilmezse seviyenin tek seviyeli prompt versiyonu kullanılır
+    """
+    payload = json.dumps(
+        [
+            normalize_text(user_text),
+            ielts_level,
+            model_name,
+            generation_config,
+            prompt_version or get_prompt_version(ielts_level),
+        ],
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RewriteCache:
+    """
+    Rewrite sonuçları için sınırlı (LRU + TTL + byte limiti) bellek içi cache
+
+    Değerler JSON string olarak saklanır: byte boyutu kesin ölçülür ve
+    cache'ten dönen her sonuç çağırana ait bağımsız bir kopyadır.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max(1, max_bytes)
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (expires_at, size, payload)
+        self._entries: "OrderedDict[str, Tuple[float, int, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # Sayaçlar
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Kayıt varsa ve süresi dolmadıysa sonucu döndürür, yoksa None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, size, payload = entry
+            if expires_at <= time.monotonic():
+                self._remove(key, size)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return json.loads(payload)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Sonucu cache'e yazar; limitler aşılırsa en eski kayıtları çıkarır"""
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        size = len(payload.encode("utf-8")) + len(key)
+
+        # Tek başına limiti aşan kayıt hiç cache'lenmez
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, size, payload)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str, size: int) -> None:
+        del self._entries[key]
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss sayaçları ve doluluk bilgisi"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
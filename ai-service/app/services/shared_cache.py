@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rewrite_cache (
+    key TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    payload TEXT NOT NULL
+)
+"""
+
+
+def default_shared_cache_path() -> str:
+    """Aynı makinedeki tüm worker'ların ortak kullandığı varsayılan dosya"""
+    return os.path.join(tempfile.gettempdir(), "letter-to-stars-rewrite-cache.sqlite3")
+
+
+class SharedRewriteCache:
+    """
+    Worker process'leri arasında paylaşılan rewrite cache'i (SQLite, WAL modu)
+
+    Her worker'ın bellek içi RewriteCache'i (L1) kaçırdığında buraya (L2) bakılır;
+    böylece worker sayısı artınca hit oranı düşmez. WAL modunda okuyucular yazarı
+    beklemez. Bağlantılar thread başına açılır (async taraf asyncio.to_thread ile çağırır).
+
+    Cache hiçbir zaman isteği düşürmez: SQLite hataları loglanır ve miss sayılır.
+    Okunamayan kayıtlar (bozuk JSON veya validate'ten geçmeyen, örn. eski şemayla
+    yazılmış) silinir ve miss sayılır.
+    Boyut limiti her prune_every yazmada bir uygulanır; en eski kayıtlar silinir.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int,
+        ttl_seconds: float,
+        prune_every: int = 100,
+        validate: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    ):
+        self.path = path
+        self.max_bytes = max(1, max_bytes)
+        self.ttl_seconds = ttl_seconds
+        self.prune_every = max(1, prune_every)
+        self.validate = validate
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        # Sayaçlar (bu process'e ait)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+        # Şemayı ve WAL modunu baştan kur (hata varsa burada görünsün)
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Kayıt varsa ve süresi dolmadıysa sonucu döndürür, yoksa None"""
+        try:
+            row = self._connection().execute(
+                "SELECT payload FROM rewrite_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"Shared cache read failed: {str(e)}")
+            return None
+
+        if row is None:
+            self._count("misses")
+            return None
+
+        try:
+            value = json.loads(row[0])
+            if not isinstance(value, dict):
+                raise ValueError(f"beklenen JSON object, gelen {type(value).__name__}")
+            if self.validate is not None:
+                self.validate(value)
+        except ValueError as e:  # pydantic ValidationError da ValueError'dır
+            self._count("errors")
+            logger.warning(f"Shared cache entry is unreadable, dropping it: {str(e).splitlines()[0][:200]}")
+            self._discard(key)
+            return None
+
+        self._count("hits")
+        return value
+
+    def _discard(self, key: str) -> None:
+        try:
+            self._connection().execute("DELETE FROM rewrite_cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache delete failed: {str(e)}")
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Sonucu yazar; aynı key varsa üzerine yazar"""
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        size = len(payload.encode("utf-8")) + len(key)
+        if size > self.max_bytes:
+            return
+
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO rewrite_cache (key, expires_at, size, payload) VALUES (?, ?, ?, ?)",
+                (key, time.time() + self.ttl_seconds, size, payload)
+            )
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % self.prune_every == 0
+            if prune:
+                self._prune(conn)
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"Shared cache write failed: {str(e)}")
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """Süresi dolanları, sonra byte limitini aşan en eski kayıtları siler"""
+        conn.execute("DELETE FROM rewrite_cache WHERE expires_at <= ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM rewrite_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # expires_at = yazılma zamanı + sabit TTL, yani en küçükler en eski kayıtlar
+        excess = total - self.max_bytes
+        rows = conn.execute("SELECT key, size FROM rewrite_cache ORDER BY expires_at").fetchall()
+        doomed = []
+        for key, size in rows:
+            if excess <= 0:
+                break
+            doomed.append((key,))
+            excess -= size
+        conn.executemany("DELETE FROM rewrite_cache WHERE key = ?", doomed)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM rewrite_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """Bu process'in hit/miss sayaçları ve paylaşılan dosyanın doluluğu"""
+        try:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM rewrite_cache"
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "errors": self.errors,
+        }
@@ -0,0 +1,66 @@
+import asyncio
+import copy
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Aynı key ile eş zamanlı gelen async çağrıları tek bir çalışmada birleştirir
+
+    İlk çağrı (leader) işi bir Task olarak başlatır; iş bitene kadar aynı key ile
+    gelen çağrılar (follower) yeni iş başlatmak yerine aynı Task'ı bekler.
+    Task shield'lı beklendiği için leader'ın bağlantısı koparsa diğerleri etkilenmez.
+    Her çağıran sonucun kendi kopyasını alır.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # key -> şu an o işi bekleyen follower sayısı
+        self._waiters: Dict[str, int] = {}
+
+        # Sayaçlar
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """key için çalışan iş varsa onu bekler, yoksa fn()'i başlatır"""
+        self.calls += 1
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        else:
+            self.collapsed += 1
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+            logger.info(f"Coalesced identical in-flight request (waiters: {self._waiters[key]})")
+
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+            self._waiters.pop(key, None)
+
+        # Kimse beklemiyorsa "exception was never retrieved" uyarısını engelle
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "in_flight": self.in_flight,
+        }
@@ -0,0 +1,280 @@
+import bisect
+import re
+from collections import Counter
+from itertools import accumulate
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Kelime, boşluk ve tek noktalama işareti; birlikte metnin tamamını kapsar
+_TOKEN = re.compile(r"\w+|\s+|[^\w\s]")
+# Tek " " dışındaki boşluklar (çoklu boşluk, satır sonu, tab)
+_IRREGULAR_SPACE = re.compile(r"\s\s|[^\S ]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Bu boyuta kadar olan aralıklar doğrudan LCS tablosuyla (en iyi eşleşme) eşlenir;
+# daha büyükleri anchor'larla bölünür (süre kareye çıkmasın)
+_LCS_MAX_CELLS = 256
+
+# (op, a_start, a_end, b_start, b_end); op: equal | replace | delete | insert
+Opcode = Tuple[str, int, int, int, int]
+
+
+def tokenize(text: str) -> Tuple[List[str], List[int]]:
+    """
+    Metni tokenlara böler
+
+    Returns:
+        (karşılaştırma anahtarları, token başlangıç indeksleri + len(text))
+        Boşluklar tek " " anahtarıyla karşılaştırılır (farklı boşluklar eşit sayılır)
+    """
+    tokens = _TOKEN.findall(text)
+    offsets = [0]
+    offsets.extend(accumulate(map(len, tokens)))
+    if _IRREGULAR_SPACE.search(text) is None:
+        return tokens, offsets
+    # Boşluklar tek boşluğa indirgenince token sınırları değişmez, sadece içerikleri
+    return _TOKEN.findall(_WHITESPACE.sub(" ", text)), offsets
+
+
+def _unique_positions(tokens: Sequence[str], lo: int, hi: int) -> Tuple[Counter, Dict[str, int]]:
+    """Aralıktaki token sayıları ve tek geçen tokenlar -> indeks"""
+    window = tokens[lo:hi]
+    counts = Counter(window)
+    last = dict(zip(window, range(lo, hi)))
+    return counts, {token: last[token] for token, count in counts.items() if count == 1}
+
+
+def _longest_increasing(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """a sırasındaki (i, j) çiftlerinden j'si artan en uzun alt dizi (patience sorting, O(k log k))"""
+    tails: List[int] = []
+    tail_index: List[int] = []
+    previous = [-1] * len(pairs)
+    for index, (_, j) in enumerate(pairs):
+        position = bisect.bisect_left(tails, j)
+        if position == len(tails):
+            tails.append(j)
+            tail_index.append(index)
+        else:
+            tails[position] = j
+            tail_index[position] = index
+        previous[index] = tail_index[position - 1] if position else -1
+
+    result = []
+    index = tail_index[-1] if tail_index else -1
+    while index >= 0:
+        result.append(pairs[index])
+        index = previous[index]
+    result.reverse()
+    return result
+
+
+def _lcs_pairs(a: Sequence[str], alo: int, ahi: int, b: Sequence[str], blo: int, bhi: int) -> List[Tuple[int, int]]:
+    """Küçük aralık için klasik LCS tablosu ile eşleşen (i, j) çiftleri"""
+    n, m = ahi - alo, bhi - blo
+    table = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n - 1, -1, -1):
+        row, below = table[i], table[i + 1]
+        token = a[alo + i]
+        for j in range(m - 1, -1, -1):
+            row[j] = below[j + 1] + 1 if token == b[blo + j] else max(below[j], row[j + 1])
+
+    pairs = []
+    i = j = 0
+    while i < n and j < m:
+        if a[alo + i] == b[blo + j]:
+            pairs.append((alo + i, blo + j))
+            i += 1
+            j += 1
+        elif table[i + 1][j] >= table[i][j + 1]:
+            i += 1
+        else:
+            j += 1
+    return pairs
+
+
+def _matching_blocks(a: Sequence[str], b: Sequence[str]) -> List[Tuple[int, int, int]]:
+    """
+    Patience diff: eşleşen bloklar (i, j, uzunluk), i ve j artan sırada
+
+    Her aralıkta ortak önek / sonek eşlenir; küçük aralıklar LCS tablosuyla, büyükler
+    iki tarafta da tek geçen tokenlardan sırası korunan en uzun dizi (anchor) ile
+    bölünür ve aradaki boşluklar aynı şekilde işlenir. Doğal metinde neredeyse doğrusal.
+    Bitişik bloklar birleştirilmez (diff_tokens birleştirir).
+    """
+    blocks: List[Tuple[int, int, int]] = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+
+        start = alo
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            alo += 1
+            blo += 1
+        if alo > start:
+            blocks.append((start, blo - (alo - start), alo - start))
+        end = ahi
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+        if ahi < end:
+            blocks.append((ahi, bhi, end - ahi))
+        if alo == ahi or blo == bhi:
+            continue
+
+        if (ahi - alo) * (bhi - blo) <= _LCS_MAX_CELLS:
+            blocks.extend((i, j, 1) for i, j in _lcs_pairs(a, alo, ahi, b, blo, bhi))
+            continue
+
+        counts_a, unique_a = _unique_positions(a, alo, ahi)
+        counts_b, unique_b = _unique_positions(b, blo, bhi)
+        anchors = _longest_increasing(sorted(
+            (i, unique_b[token]) for token, i in unique_a.items() if token in unique_b
+        ))
+        if not anchors:
+            # Tek geçen ortak token yok (histogram diff): en az geçen ortak token'ın
+            # geçişleri sırayla eşlenir
+            common = [token for token in counts_a if token in counts_b]
+            if not common:
+                continue
+            token = min(common, key=lambda token: counts_a[token] + counts_b[token])
+            anchors = list(zip(
+                [i for i in range(alo, ahi) if a[i] == token],
+                [j for j in range(blo, bhi) if b[j] == token],
+            ))
+
+        # Anchor'lar eşleşir; aralarındaki boşluklar ayrıca işlenir
+        previous_i, previous_j = alo, blo
+        for i, j in anchors:
+            blocks.append((i, j, 1))
+            if i > previous_i or j > previous_j:
+                stack.append((previous_i, i, previous_j, j))
+            previous_i, previous_j = i + 1, j + 1
+        stack.append((previous_i, ahi, previous_j, bhi))
+
+    blocks.sort()
+    return blocks
+
+
+def diff_tokens(a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+    """İki token dizisinin farkı; difflib.SequenceMatcher.get_opcodes ile aynı biçim (token indeksleri)"""
+    opcodes: List[Opcode] = []
+    i = j = 0
+    equal_i = equal_j = -1  # Açık equal span'ın başlangıcı
+    for block_i, block_j, size in _matching_blocks(a, b):
+        if block_i > i or block_j > j:
+            if equal_i >= 0:
+                opcodes.append(("equal", equal_i, i, equal_j, j))
+            opcodes.append((_change_op(block_i - i, block_j - j), i, block_i, j, block_j))
+            equal_i, equal_j = block_i, block_j
+        elif equal_i < 0:
+            equal_i, equal_j = block_i, block_j
+        i, j = block_i + size, block_j + size
+    if equal_i >= 0:
+        opcodes.append(("equal", equal_i, i, equal_j, j))
+    if i < len(a) or j < len(b):
+        opcodes.append((_change_op(len(a) - i, len(b) - j), i, len(a), j, len(b)))
+    return opcodes
+
+
+def _change_op(a_length: int, b_length: int) -> str:
+    if a_length and b_length:
+        return "replace"
+    return "delete" if a_length else "insert"
+
+
+def align_texts(original: str, rewritten: str) -> List[Opcode]:
+    """
+    Orijinal ve yeniden yazılmış metnin karakter indeksli hizalaması
+
+    Spanlar iki metni de baştan sona kesintisiz kapsar. İki değişiklik arasında kalan
+    tek boşluk ayrı bir equal span olmaz, değişikliklerle birleşir ("went to" ->
+    "visited the" tek replace); iki silme / iki ekleme arasındaki boşluk ayrı kalır.
+    """
+    a, a_offsets = tokenize(original)
+    b, b_offsets = tokenize(rewritten)
+    opcodes = diff_tokens(a, b)
+
+    spans: List[Opcode] = []
+    for index, (op, i1, i2, j1, j2) in enumerate(opcodes):
+        span = (op, a_offsets[i1], a_offsets[i2], b_offsets[j1], b_offsets[j2])
+        previous = spans[-1] if spans else None
+        if previous is not None and previous[0] != "equal":
+            absorb = op != "equal" or (
+                i2 - i1 == 1
+                and a[i1] == " "
+                and index + 1 < len(opcodes)
+                and not (previous[0] == opcodes[index + 1][0] and previous[0] in ("delete", "insert"))
+            )
+            if absorb:
+                spans[-1] = (
+                    _change_op(span[2] - previous[1], span[4] - previous[3]),
+                    previous[1], span[2], previous[3], span[4],
+                )
+                continue
+        spans.append(span)
+    return spans
+
+
+def _overlaps(changed: Sequence[Tuple[int, int]], starts: Sequence[int], start: int, end: int) -> bool:
+    """
+    [start, end) değişen bir aralıkla kesişiyor mu
+
+    changed sıralı ve çakışmasızdır; sıfır genişlikli aralık (ekleme) ifadenin içinde
+    veya sınırındaysa kesişiyor sayılır.
+    """
+    index = bisect.bisect_right(starts, end) - 1
+    while index >= 0:
+        changed_start, changed_end = changed[index]
+        if changed_end < start:
+            return False
+        if changed_start < end and changed_end > start:
+            return True
+        if changed_start == changed_end and start <= changed_start <= end:
+            return True
+        index -= 1
+    return False
+
+
+def _phrase_pattern(phrase: str) -> Optional["re.Pattern[str]"]:
+    words = phrase.split()
+    if not words:
+        return None
+    return re.compile(r"\s+".join(re.escape(word) for word in words), re.IGNORECASE)
+
+
+def locate_phrases(
+    text: str,
+    phrases: Sequence[str],
+    changed: Sequence[Tuple[int, int]] = (),
+) -> List[Optional[Tuple[int, int]]]:
+    """
+    Metindeki ifadelerin (örn. grammar düzeltmelerinin "original"i) yeri (start, end)
+
+    İfadeler metindeki sırayla gelir; arama bir öncekinin bittiği yerden başlar.
+    İfade birden fazla geçiyorsa değişen bir aralıkla (changed: align_texts'in equal
+    olmayan orijinal aralıkları) kesişen geçiş tercih edilir. Birebir bulunamazsa
+    büyük/küçük harf ve boşluk farkı gözetilmeden aranır; yine yoksa None.
+    """
+    starts = [start for start, _ in changed]
+    located: List[Optional[Tuple[int, int]]] = []
+    cursor = 0
+    for phrase in phrases:
+        matches: List[Tuple[int, int]] = []
+        if phrase:
+            index = text.find(phrase)
+            while index >= 0:
+                matches.append((index, index + len(phrase)))
+                index = text.find(phrase, index + 1)
+            if not matches:
+                pattern = _phrase_pattern(phrase)
+                if pattern is not None:
+                    matches = [match.span() for match in pattern.finditer(text)]
+
+        if not matches:
+            located.append(None)
+            continue
+
+        after = [match for match in matches if match[0] >= cursor] or matches
+        best = next((match for match in after if _overlaps(changed, starts, *match)), after[0])
+        located.append(best)
+        cursor = best[1]
+    return located
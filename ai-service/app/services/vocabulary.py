@@ -0,0 +1,98 @@
+import math
+from typing import Dict, List, Optional, Sequence, Set
+
+from app.metrics import NEW_WORDS_FILTERED
+from app.models import LexicalStats, Word
+from app.services.lexicon import RARE_BAND, UNKNOWN_BAND, Lexicon, band_for_rank, tokenize
+
+# Bu bandlardaki kelimeler "ileri seviye" sayılır (sözlükte olmayanlar sayılmaz)
+_ADVANCED_BANDS = ("B2", "C1", RARE_BAND)
+
+
+def _difficulty(lexicon: Lexicon, tokens: Sequence[str]) -> float:
+    """Kelime / ifadenin zorluğu: en nadir token'ın frekans sırası (sözlükte yoksa sonsuz)"""
+    ranks = [lexicon.word_rank(token) for token in tokens]
+    return max((math.inf if rank is None else rank) for rank in ranks)
+
+
+def refine_new_words(
+    words: Sequence[Word],
+    original_text: str,
+    lexicon: Lexicon,
+    min_rank: int,
+) -> List[Word]:
+    """
+    Modelin önerdiği new_words'ü prompt kurallarına göre süzer ve zordan kolaya sıralar
+
+    Atılanlar:
+    - Orijinal metinde (çekimli hali dahil) geçen kelimeler ve ifadeler
+    - Frekans sırası min_rank'ten küçük (çok yaygın) kelimeler
+    - Aynı köke sahip tekrarlar
+    """
+    original_tokens = tokenize(original_text)
+    original_lemmas: Set[str] = set(original_tokens)
+    original_lemmas.update(lexicon.lemmatize(token) for token in original_tokens)
+    original_phrase = f" {' '.join(original_tokens)} "
+
+    kept = []
+    seen: Set[str] = set()
+    for position, word in enumerate(words):
+        tokens = tokenize(word.english_word)
+        if not tokens:
+            continue
+
+        if len(tokens) == 1:
+            lemma = lexicon.lemmatize(tokens[0])
+            key = lemma
+            in_original = tokens[0] in original_lemmas or lemma in original_lemmas
+        else:
+            key = " ".join(lexicon.lemmatize(token) for token in tokens)
+            in_original = f" {' '.join(tokens)} " in original_phrase
+
+        if in_original:
+            NEW_WORDS_FILTERED.inc(reason="in_original")
+            continue
+        if key in seen:
+            NEW_WORDS_FILTERED.inc(reason="duplicate")
+            continue
+
+        difficulty = _difficulty(lexicon, tokens)
+        if difficulty < min_rank:
+            NEW_WORDS_FILTERED.inc(reason="too_common")
+            continue
+
+        seen.add(key)
+        kept.append((-difficulty, position, word))
+
+    # Zordan kolaya; eşitlikte modelin sırası korunur
+    kept.sort(key=lambda item: (item[0], item[1]))
+    return [word for _, _, word in kept]
+
+
+def lexical_stats(text: str, lexicon: Lexicon) -> LexicalStats:
+    """Metnin sözlüğe göre kelime istatistikleri (sadece sözlüğün ulaşabildiği bandlar raporlanır)"""
+    tokens = tokenize(text)
+    bands: Dict[str, int] = {band: 0 for band in lexicon.bands + [UNKNOWN_BAND]}
+    lemmas: Set[str] = set()
+    rank_total = 0
+    ranked = 0
+
+    for token in tokens:
+        lemma = lexicon.lemmatize(token)
+        lemmas.add(lemma)
+        rank: Optional[int] = lexicon.rank(lemma)
+        bands[band_for_rank(rank)] += 1
+        if rank is not None:
+            rank_total += rank
+            ranked += 1
+
+    count = len(tokens)
+    advanced = sum(bands.get(band, 0) for band in _ADVANCED_BANDS)
+    return LexicalStats(
+        word_count=count,
+        unique_lemmas=len(lemmas),
+        lexical_diversity=round(len(lemmas) / count, 4) if count else 0.0,
+        average_rank=round(rank_total / ranked, 1) if ranked else None,
+        advanced_ratio=round(advanced / count, 4) if count else 0.0,
+        cefr_distribution=bands,
+    )
@@ -0,0 +1,93 @@
+"""
+Metin diff benchmark'ı: text_diff (token seviyesinde patience diff) ile
+difflib.SequenceMatcher'ın (token ve karakter seviyesinde) süresi ve eşleşen token sayısı
+
+Metinler seed kelime listesinden frekansa göre (Zipf) üretilir; yeniden yazım kelimelerin
+bir kısmını değiştirir / siler / araya kelime ekler. difflib tokenlarda karesel
+olduğundan büyük boyutlarda tek ölçüm yapılır.
+
+    python -m benchmarks.bench_diff
+    python -m benchmarks.bench_diff --sizes 1000 10000 --edit-rate 0.2
+"""
+import argparse
+import difflib
+import random
+import time
+from typing import List, Tuple
+
+from benchmarks.common import print_table, time_per_call
+from app.services.lexicon import SEED_PATH, _read_word_list
+from app.services.text_diff import align_texts, diff_tokens, tokenize
+
+
+def make_texts(chars: int, edit_rate: float, seed: int = 24) -> Tuple[str, str]:
+    """chars uzunluğunda orijinal metin ve kelimelerin edit_rate'i değişmiş yeniden yazımı"""
+    rnd = random.Random(seed)
+    words = _read_word_list(SEED_PATH)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+
+    sentences: List[str] = []
+    length = 0
+    while length < chars:
+        sentence = " ".join(rnd.choices(words, weights, k=rnd.randint(6, 18)))
+        sentence = sentence[0].upper() + sentence[1:] + rnd.choice(".!?.")
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    original = " ".join(sentences)[:chars]
+
+    rewritten: List[str] = []
+    for word in original.split(" "):
+        roll = rnd.random()
+        if roll < edit_rate / 3:
+            continue
+        if roll < edit_rate * 2 / 3:
+            rewritten.append(rnd.choice(words))
+        else:
+            rewritten.append(word)
+            if roll < edit_rate:
+                rewritten.append(rnd.choice(words))
+    return original, " ".join(rewritten)
+
+
+def _best_ms(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 10000], help="Orijinal metin uzunlukları (karakter)")
+    parser.add_argument("--edit-rate", type=float, default=0.12, help="Değiştirilen kelime oranı")
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes:
+        original, rewritten = make_texts(size, args.edit_rate)
+        a, _ = tokenize(original)
+        b, _ = tokenize(rewritten)
+
+        matched = sum(i2 - i1 for op, i1, i2, _, _ in diff_tokens(a, b) if op == "equal")
+        difflib_tokens = difflib.SequenceMatcher(None, a, b, autojunk=False)
+        difflib_matched = sum(block.size for block in difflib_tokens.get_matching_blocks())
+
+        rows.append([
+            size,
+            len(a),
+            f"{time_per_call(lambda: align_texts(original, rewritten)) / 1000:.2f}",
+            f"{_best_ms(lambda: difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes(), 1 if size > 2000 else 3):.2f}",
+            f"{_best_ms(lambda: difflib.SequenceMatcher(None, original, rewritten).get_opcodes(), 1 if size > 2000 else 3):.2f}",
+            f"{matched} / {difflib_matched}",
+        ])
+
+    print_table(
+        ["karakter", "token", "align_texts ms", "difflib token ms", "difflib karakter ms", "eşleşen token (biz / difflib)"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+JSON çıkarma benchmark'ı: eski regex temizleme + json.loads yolu ile
+extract_json_object ve (stream simülasyonu ile) IncrementalJsonExtractor karşılaştırması
+
+    python -m benchmarks.bench_json_extract
+"""
+import json
+import re
+
+from benchmarks.common import load_model_outputs, print_table, time_per_call
+from app.services.json_extractor import IncrementalJsonExtractor, extract_json_object
+
+STREAM_CHUNK_CHARS = 64
+
+
+def legacy_parse(text: str):
+    """GeminiService'in eski yolu: iki re.sub, strip, json.loads"""
+    text = re.sub(r'```json\s*', '', text)
+    text = re.sub(r'```\s*', '', text)
+    text = text.strip()
+    return json.loads(text)
+
+
+def incremental_parse(text: str):
+    extractor = IncrementalJsonExtractor()
+    for i in range(0, len(text), STREAM_CHUNK_CHARS):
+        extractor.feed(text[i:i + STREAM_CHUNK_CHARS])
+    return extractor.result()
+
+
+def _run(fn, text):
+    try:
+        fn(text)
+    except ValueError:
+        return None
+    return time_per_call(lambda: fn(text))
+
+
+def _fmt(us):
+    return "FAIL" if us is None else f"{us:.1f}"
+
+
+def main():
+    rows = []
+    for output in load_model_outputs():
+        text = output["text"]
+        legacy = _run(legacy_parse, text)
+        extract = _run(extract_json_object, text)
+        incremental = _run(incremental_parse, text)
+        speedup = f"{legacy / extract:.1f}x" if legacy and extract else "-"
+        rows.append([output["name"], len(text), _fmt(legacy), _fmt(extract), _fmt(incremental), speedup])
+
+    print_table(
+        ["output", "chars", "legacy_us", "extract_us", f"incremental_{STREAM_CHUNK_CHARS}_us", "speedup"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Frekans sözlüğü benchmark'ı: dosyayı açma (mmap) süresi, tek kelime lookup / lemmatize
+ve bir rewrite sonucu için new_words süzme + kelime istatistikleri
+
+    python -m benchmarks.bench_lexicon
+    python -m benchmarks.bench_lexicon --lexicon /path/to/full-lexicon.bin
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import load_model_outputs, print_table, time_per_call
+from app.models import Word
+from app.services.json_extractor import extract_json_object
+from app.services.lexicon import SEED_PATH, Lexicon, _read_word_list, build_lexicon, tokenize
+from app.services.vocabulary import lexical_stats, refine_new_words
+
+USER_TEXT = (
+    "Yesterday I goes to the park with my friends and we was very happy. "
+    "The weather were nice and we played football for two hours. After that we eat "
+    "some food and talked about our school and our teachers. "
+) * 8
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lexicon", help="Hazır sözlük dosyası (varsayılan: seed listesinden geçici dosya)")
+    args = parser.parse_args()
+
+    path = args.lexicon
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "lexicon.bin")
+        started = time.perf_counter()
+        build_lexicon(_read_word_list(SEED_PATH), path)
+        print(f"build: {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    started = time.perf_counter()
+    lexicon = Lexicon(path)
+    print(f"load: {(time.perf_counter() - started) * 1e6:.1f} µs  ({len(lexicon)} kelime, {os.path.getsize(path)} byte)")
+    print()
+
+    output = extract_json_object(load_model_outputs()[0]["text"])
+    new_words = [Word(**word) for word in output["new_words"]]
+    tokens = tokenize(USER_TEXT)
+
+    rows = [
+        ["rank (var olan kelime)", f"{time_per_call(lambda: lexicon.rank('people')):.2f}"],
+        ["rank (olmayan kelime)", f"{time_per_call(lambda: lexicon.rank('serene')):.2f}"],
+        ["lemmatize (kural dışı)", f"{time_per_call(lambda: lexicon.lemmatize('went')):.2f}"],
+        ["lemmatize (ek)", f"{time_per_call(lambda: lexicon.lemmatize('studies')):.2f}"],
+        [f"tokenize ({len(tokens)} kelime)", f"{time_per_call(lambda: tokenize(USER_TEXT)):.2f}"],
+        [
+            f"refine_new_words ({len(new_words)} kelime)",
+            f"{time_per_call(lambda: refine_new_words(new_words, USER_TEXT, lexicon, 1000)):.2f}",
+        ],
+        [f"lexical_stats ({len(tokens)} kelime)", f"{time_per_call(lambda: lexical_stats(USER_TEXT, lexicon)):.2f}"],
+    ]
+    print_table(["işlem", "µs/çağrı"], rows)
+
+
+if __name__ == "__main__":
+    main()
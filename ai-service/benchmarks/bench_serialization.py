@@ -0,0 +1,120 @@
+"""
+Yanıt serialization ve sıkıştırma benchmark'ı
+
+Serialization: FastAPI'nin varsayılan yolu (response_model ile tekrar doğrulama +
+JSONResponse) ile FastJSONResponse (doğrulanmış model pydantic-core ile, dict orjson ile)
+karşılaştırılır. Sıkıştırma: tek rewrite yanıtı ve batch yanıtı için gzip / brotli ile
+wire boyutu ve sıkıştırma süresi.
+
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --batch-items 200
+"""
+import argparse
+import asyncio
+import gzip
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from benchmarks.common import load_model_outputs, print_table, time_per_call
+from app.compression import brotli
+from app.models import BatchRewriteItemResult, BatchRewriteResponse, RewriteResponse
+from app.responses import FastJSONResponse
+from app.services.json_extractor import extract_json_object
+
+USER_TEXT = (
+    "Yesterday I goes to the park with my friends and we was very happy. "
+    "The weather were nice and we played football for two hours. "
+) * 6
+
+
+def default_fastapi_response(field, content) -> JSONResponse:
+    """FastAPI'nin response_model'li endpoint'ler için yaptığı: doğrula + serialize + json.dumps"""
+    serialized = asyncio.run(serialize_response(field=field, response_content=content))
+    return JSONResponse(serialized)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-items", type=int, default=50)
+    args = parser.parse_args()
+
+    responses = [
+        RewriteResponse(**extract_json_object(record["text"]), original_text=USER_TEXT, ielts_level=7)
+        for record in load_model_outputs()
+    ]
+    single = responses[0]
+    # Kayıtlı çıktılar sırayla kullanılır (aynı öğenin tekrarı sıkıştırma oranını şişirir)
+    batch = BatchRewriteResponse(
+        results=[
+            BatchRewriteItemResult(index=index, status_code=200, result=responses[index % len(responses)])
+            for index in range(args.batch_items)
+        ],
+        succeeded=args.batch_items,
+        failed=0,
+    )
+    stats = {
+        "cache": {"enabled": True, "hits": 120, "misses": 40, "entries": 512, "bytes": 1 << 20},
+        "router": {
+            name: {"model": "gemini-2.0-flash", "routed": 10, "p50_ms": 812.4, "p95_ms": 2410.0}
+            for name in ("default", "fast", "strong")
+        },
+    }
+
+    single_field = create_response_field("response", RewriteResponse)
+    batch_field = create_response_field("response", BatchRewriteResponse)
+
+    # asyncio.run'ın kendi maliyeti "önce" sütunundan düşülür
+    loop_overhead = time_per_call(lambda: asyncio.run(asyncio.sleep(0)))
+
+    rows = []
+    for label, before, after in (
+        (
+            "rewrite (model)",
+            lambda: default_fastapi_response(single_field, single),
+            lambda: FastJSONResponse(single),
+        ),
+        (
+            f"batch {args.batch_items} öğe (model)",
+            lambda: default_fastapi_response(batch_field, batch),
+            lambda: FastJSONResponse(batch),
+        ),
+        (
+            "stats (dict)",
+            lambda: JSONResponse(jsonable_encoder(stats)),
+            lambda: FastJSONResponse(stats),
+        ),
+    ):
+        overhead = loop_overhead if "model" in label else 0.0
+        before_us = time_per_call(before) - overhead
+        after_us = time_per_call(after)
+        rows.append([label, f"{before_us:.1f}", f"{after_us:.1f}", f"{before_us / after_us:.1f}x"])
+    print("Serialization (µs/yanıt)")
+    print_table(["yanıt", "FastAPI varsayılan", "FastJSONResponse", "hızlanma"], rows)
+    print()
+
+    rows = []
+    for label, body in (
+        ("rewrite", FastJSONResponse(single).body),
+        (f"batch {args.batch_items} öğe", FastJSONResponse(batch).body),
+    ):
+        rows.append([label, "identity", len(body), "-", "-"])
+        for level in (1, 6):
+            compressed = gzip.compress(body, compresslevel=level, mtime=0)
+            elapsed = time_per_call(lambda: gzip.compress(body, compresslevel=level, mtime=0))
+            rows.append(["", f"gzip -{level}", len(compressed), f"{len(compressed) / len(body):.2f}", f"{elapsed:.1f}"])
+        if brotli is not None:
+            for quality in (4, 11):
+                compressed = brotli.compress(body, quality=quality)
+                elapsed = time_per_call(lambda: brotli.compress(body, quality=quality))
+                rows.append(["", f"br q{quality}", len(compressed), f"{len(compressed) / len(body):.2f}", f"{elapsed:.1f}"])
+    print("Sıkıştırma (wire byte'ları)")
+    print_table(["yanıt", "encoding", "byte", "oran", "µs"], rows)
+    if brotli is None:
+        print("\n(Brotli kurulu değil: br satırları atlandı)")
+
+
+if __name__ == "__main__":
+    main()
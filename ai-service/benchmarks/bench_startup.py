@@ -0,0 +1,120 @@
+"""
+Açılış süresi bütçesi: app.main import'u, ilk /health cevabı ve warm-up sonrası /ready
+
+Her ölçüm yeni bir Python process'inde yapılır (import cache'i olmadan, deploy sonrası
+container açılışı gibi). Gemini backend'i ağa çıkmadan kurulur (warm-up probe kapalı).
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --budget-ms 1200     # bütçe aşılırsa exit code 1
+
+Bütçe import + ilk /health süresine uygulanır. google.generativeai import sırasında
+yüklenmişse (lazy init bozulmuş) de exit code 1 döner.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.common import print_table
+
+SERVICE_DIR = Path(__file__).parent.parent
+
+# import + ilk /health için varsayılan bütçe (tests/test_startup.py de kullanır)
+DEFAULT_BUDGET_MS = 1500
+
+# Child process'te çalışır; sonuçları tek satır JSON olarak yazar
+_CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import app.main as main
+imported = time.perf_counter()
+lazy = "google.generativeai" not in sys.modules
+
+async def run():
+    import httpx
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        assert (await client.get("/health")).status_code == 200
+        health = time.perf_counter()
+        async with main.app.router.lifespan_context(main.app):
+            deadline = time.perf_counter() + 60
+            while (await client.get("/ready")).status_code != 200:
+                if time.perf_counter() > deadline:
+                    sys.exit("/ready 60 saniyede hazır olmadı")
+                await asyncio.sleep(0.005)
+            ready = time.perf_counter()
+    return health, ready
+
+health, ready = asyncio.run(run())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "health_ms": (health - started) * 1000,
+    "ready_ms": (ready - started) * 1000,
+    "lazy": lazy,
+}))
+"""
+
+
+def measure_once() -> dict:
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "gemini",
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "benchmark"),
+        "WARMUP_ENABLED": "true",
+        "WARMUP_PROBE_ENABLED": "false",
+        "REWRITE_CACHE_SHARED_ENABLED": "false",
+    }
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD],
+        cwd=SERVICE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="import + ilk /health için bütçe")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+
+    rows = []
+    for key, label in (
+        ("import_ms", "import app.main"),
+        ("health_ms", "ilk /health"),
+        ("ready_ms", "/ready (warm-up sonrası)"),
+        ("process_ms", "process toplam"),
+    ):
+        values = [run[key] for run in runs]
+        rows.append([label, f"{statistics.median(values):.0f}", f"{min(values):.0f}", f"{max(values):.0f}"])
+    print_table(["ölçüm", "medyan ms", "min ms", "max ms"], rows)
+
+    failures = []
+    health = statistics.median(run["health_ms"] for run in runs)
+    if health > args.budget_ms:
+        failures.append(f"ilk /health {health:.0f} ms > bütçe {args.budget_ms:.0f} ms")
+    if not all(run["lazy"] for run in runs):
+        failures.append("google.generativeai app.main import'unda yükleniyor (lazy init bozulmuş)")
+
+    print()
+    for failure in failures:
+        print(f"HATA: {failure}")
+    if not failures:
+        print(f"OK: ilk /health {health:.0f} ms (bütçe {args.budget_ms:.0f} ms)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Validation benchmark'ı: eski elle yazılmış _validate_response döngüleri + main.py'de
+RewriteResponse oluşturma yolu ile tek geçişli derlenmiş TypeAdapter yolunun karşılaştırması
+
+    python -m benchmarks.bench_validation
+"""
+from benchmarks.common import load_model_outputs, print_table, time_per_call
+from app.models import RewriteResponse
+from app.services.gemini_service import _RESPONSE_ADAPTER
+from app.services.json_extractor import extract_json_object
+
+USER_TEXT = "I went to park yesterday. It was nice."
+IELTS_LEVEL = 8
+
+
+def legacy_validate(data):
+    """GeminiService._validate_response'un eski hali"""
+    if not isinstance(data, dict):
+        return False
+    if "rewritten_text" not in data or "new_words" not in data:
+        return False
+    if not isinstance(data["rewritten_text"], str):
+        return False
+    if not isinstance(data["grammar_corrections"], list):
+        return False
+    for correction in data["grammar_corrections"]:
+        if not isinstance(correction, dict):
+            return False
+        if "original" not in correction or "corrected" not in correction or "explanation" not in correction:
+            return False
+    for key in ("writing_tips", "strengths", "weaknesses"):
+        if not isinstance(data[key], list):
+            return False
+        for item in data[key]:
+            if not isinstance(item, str):
+                return False
+    if not isinstance(data["overall_feedback"], str):
+        return False
+    if not isinstance(data["new_words"], list):
+        return False
+    for word in data["new_words"]:
+        if not isinstance(word, dict):
+            return False
+        if "english_word" not in word or "turkish_meaning" not in word:
+            return False
+    return True
+
+
+def legacy_path(data, keep_corrections=False):
+    """
+    Eski yol: elle doğrulama, ardından main.py'de RewriteResponse ile ikinci doğrulama
+
+    Eski main.py grammar_corrections'ı response'a koymuyordu; keep_corrections=True
+    aynı çıktıyı üreten (adil) karşılaştırmayı ölçer.
+    """
+    if not legacy_validate(data):
+        raise ValueError("invalid")
+    return RewriteResponse(
+        original_text=USER_TEXT,
+        grammar_corrections=data["grammar_corrections"] if keep_corrections else [],
+        rewritten_text=data["rewritten_text"],
+        new_words=data["new_words"],
+        writing_tips=data["writing_tips"],
+        strengths=data["strengths"],
+        weaknesses=data["weaknesses"],
+        overall_feedback=data["overall_feedback"],
+        ielts_level=IELTS_LEVEL,
+    )
+
+
+def compiled_path(data):
+    """Yeni yol: tek derlenmiş validation geçişi"""
+    return _RESPONSE_ADAPTER.validate_python(
+        {**data, "original_text": USER_TEXT, "ielts_level": IELTS_LEVEL}
+    )
+
+
+def main():
+    rows = []
+    for output in load_model_outputs():
+        data = extract_json_object(output["text"])
+        legacy = time_per_call(lambda: legacy_path(data))
+        legacy_full = time_per_call(lambda: legacy_path(data, keep_corrections=True))
+        compiled = time_per_call(lambda: compiled_path(data))
+        rows.append([
+            output["name"],
+            len(data.get("grammar_corrections", [])) + len(data.get("new_words", [])),
+            f"{legacy:.1f}",
+            f"{legacy_full:.1f}",
+            f"{compiled:.1f}",
+            f"{legacy_full / compiled:.1f}x",
+        ])
+
+    print_table(
+        ["output", "list_items", "legacy_us", "legacy_with_corrections_us", "compiled_us", "speedup"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
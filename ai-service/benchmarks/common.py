@@ -0,0 +1,41 @@
+"""
+Benchmark script'leri için ortak yardımcılar
+
+Script'ler ai-service dizininden modül olarak çalıştırılır:
+    python -m benchmarks.bench_json_extract
+"""
+import json
+import os
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, List
+
+DATA_DIR = Path(__file__).parent / "data"
+
+# app.config.Settings import sırasında API key ister; benchmark'lar ağa çıkmaz
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+
+def load_model_outputs() -> List[Dict[str, str]]:
+    """data/model_outputs.jsonl'deki kayıtlı model çıktılarını yükler"""
+    with open(DATA_DIR / "model_outputs.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def time_per_call(fn: Callable[[], object], min_time: float = 0.2) -> float:
+    """fn'in tek çağrısının ortalama süresini mikrosaniye olarak döndürür"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2))
+    best = min(timer.repeat(repeat=5, number=number))
+    return best / number * 1e6
+
+
+def print_table(headers: List[str], rows: List[List[object]]) -> None:
+    """Sonuçları hizalı düz metin tablo olarak yazdırır"""
+    cells = [headers] + [[str(c) for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for index, row in enumerate(cells):
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+        if index == 0:
+            print("  ".join("-" * width for width in widths))
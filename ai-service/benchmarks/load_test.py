@@ -0,0 +1,486 @@
+"""
+ai-service yük testi: concurrency taraması ile throughput / gecikme / event loop lag / bellek
+
+Varsayılan olarak FastAPI app'i aynı process içinde, HTTP katmanı olmadan doğrudan
+ASGI arayüzünden çağırır ve Gemini yerine FakeBackend kullanır (LLM_BACKEND=fake),
+böylece ölçülen şey main.py + gemini_service.py'nin kendi maliyeti ve concurrency
+davranışıdır. --url ile yerelde çalışan bir uvicorn'a da yük verilebilir.
+
+Kullanım (ai-service dizininden):
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --latency-ms 800 --concurrency 1,8,32,128 --duration 10
+    python -m benchmarks.load_test --path /rewrite/stream
+    python -m benchmarks.load_test --save fake-200ms          # baselines/fake-200ms.json
+    python -m benchmarks.load_test --compare fake-200ms       # regresyonda exit code 1
+    python -m benchmarks.load_test --url http://127.0.0.1:8001
+
+Ölçümler (her concurrency seviyesi için):
+    rps        - saniyede başarılı istek
+    rejected   - 429 alan istekler (istemci Retry-After kadar bekleyip tekrar dener)
+    p50/95/99  - istek gecikmesi (ms)
+    ttfb_p50   - ilk response byte'ına kadar geçen süre (stream endpoint'i için anlamlı)
+    lag_p99    - event loop gecikmesi: 10 ms'lik uykunun ne kadar geç uyandığı (ms, sadece in-process)
+    rss_mb     - process'in en yüksek RSS'i (MB, worker başına)
+    heap_mb    - tracemalloc ile ölçülen en yüksek Python heap (MB, --tracemalloc ile)
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.common import print_table
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+# Baseline karşılaştırmasında kontrol edilen metrikler: (metrik, büyüdükçe kötü mü)
+COMPARED_METRICS = [("rps", False), ("p95_ms", True), ("p99_ms", True), ("lag_p99_ms", True)]
+# Bu kadar mutlak farkın altındaki değişimler gürültü sayılır (birkaç ms'lik lag %50 oynayabilir)
+NOISE_FLOOR = {"rps": 1.0, "p95_ms": 25.0, "p99_ms": 60.0, "lag_p99_ms": 10.0}
+
+SAMPLE_TEXT = (
+    "Yesterday I go to the park with my friend. We was very happy because the weather "
+    "is beautiful. We eat ice cream and talk about our school."
+)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32,64,128",
+                        help="Virgülle ayrılmış eş zamanlı istemci sayıları")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seviye başına ölçüm süresi (sn)")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Seviye başına ısınma süresi (sn)")
+    parser.add_argument("--path", default="/rewrite", choices=["/rewrite", "/rewrite/stream"])
+    parser.add_argument("--level", type=int, default=7, help="İsteklerin IELTS seviyesi")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="FakeBackend ortalama gecikmesi")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="FakeBackend gecikme sapması")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="FakeBackend hata oranı")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="GEMINI_MAX_CONCURRENCY (varsayılan: Settings'teki değer)")
+    parser.add_argument("--repeat-texts", action="store_true",
+                        help="Hep aynı metni gönder (cache/singleflight yolunu ölçmek için)")
+    parser.add_argument("--cache", action="store_true", help="Rewrite cache'i açık bırak")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Python heap'ini ölç (yavaşlatır, sadece in-process)")
+    parser.add_argument("--url", default=None, help="In-process yerine bu adresteki sunucuya yük ver")
+    parser.add_argument("--save", metavar="NAME", help="Sonuçları baselines/NAME.json olarak kaydet")
+    parser.add_argument("--compare", metavar="NAME", help="Sonuçları baselines/NAME.json ile karşılaştır")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Karşılaştırmada izin verilen göreli kötüleşme (0.15 = %%15)")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """app import edilmeden önce FakeBackend ve cache ayarlarını ortama yazar"""
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LATENCY_JITTER_MS"] = str(args.jitter_ms)
+    os.environ["FAKE_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ["REWRITE_CACHE_ENABLED"] = "true" if args.cache else "false"
+    if args.max_concurrency is not None:
+        os.environ["GEMINI_MAX_CONCURRENCY"] = str(args.max_concurrency)
+
+
+# ========================
+# İstemciler
+# ========================
+
+class AsgiClient:
+    """FastAPI app'ini HTTP sunucusu olmadan doğrudan ASGI arayüzünden çağırır"""
+
+    def __init__(self, app):
+        self.app = app
+        self._lifespan_queue: Optional[asyncio.Queue] = None
+        self._lifespan_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Lifespan startup'ını çalıştırır (startup event'leri varsa)"""
+        self._lifespan_queue = asyncio.Queue()
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def send(message):
+            await events.put(message)
+
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}
+        self._lifespan_task = asyncio.ensure_future(self.app(scope, self._lifespan_queue.get, send))
+        await self._lifespan_queue.put({"type": "lifespan.startup"})
+        message = await events.get()
+        if message["type"] != "lifespan.startup.complete":
+            raise RuntimeError(f"Lifespan startup başarısız: {message}")
+        self._events = events
+
+    async def close(self) -> None:
+        if self._lifespan_task is None:
+            return
+        await self._lifespan_queue.put({"type": "lifespan.shutdown"})
+        await self._events.get()
+        await self._lifespan_task
+
+    async def post(self, path: str, body: bytes) -> Tuple[int, float, bytes, Dict[str, str]]:
+        """(status, ilk byte'a kadar geçen süre, body, header'lar) döndürür"""
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"loadtest"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("loadtest", 80),
+        }
+        request_sent = False
+        disconnect = asyncio.Event()
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        started = time.perf_counter()
+        status = 0
+        headers: Dict[str, str] = {}
+        ttfb: Optional[float] = None
+        chunks: List[bytes] = []
+
+        async def send(message):
+            nonlocal status, ttfb
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers.update((k.decode().lower(), v.decode()) for k, v in message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                if ttfb is None and message.get("body"):
+                    ttfb = time.perf_counter() - started
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    disconnect.set()
+
+        await self.app(scope, receive, send)
+        disconnect.set()
+        if ttfb is None:
+            ttfb = time.perf_counter() - started
+        return status, ttfb, b"".join(chunks), headers
+
+
+class HttpClient:
+    """Yerel bir sunucuya bağımlılıksız minimal HTTP/1.1 istemcisi (istek başına bağlantı)"""
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.base_path = parts.path.rstrip("/")
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def post(self, path: str, body: bytes) -> Tuple[int, float, bytes, Dict[str, str]]:
+        started = time.perf_counter()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            head = (
+                f"POST {self.base_path}{path} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n"
+            )
+            writer.write(head.encode() + body)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            ttfb = time.perf_counter() - started
+            status = int(status_line.split()[1]) if status_line else 0
+            head_bytes, _, payload = (await reader.read()).partition(b"\r\n\r\n")
+            headers = {}
+            for line in head_bytes.decode("latin-1").split("\r\n"):
+                name, sep, value = line.partition(":")
+                if sep:
+                    headers[name.strip().lower()] = value.strip()
+            return status, ttfb, payload, headers
+        finally:
+            writer.close()
+
+
+# ========================
+# Ölçüm
+# ========================
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+def max_rss_mb() -> Optional[float]:
+    """Process'in şimdiye kadarki en yüksek RSS'i (MB)"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux KB, macOS byte döndürür
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+async def monitor_loop_lag(samples: List[float], stop: asyncio.Event, interval: float = 0.01) -> None:
+    """interval'lık uykunun ne kadar geç uyandığını kaydeder (event loop'u bloklayan iş göstergesi)"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+async def run_level(
+    client,
+    path: str,
+    level: int,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    repeat_texts: bool,
+    measure_lag: bool,
+    measure_heap: bool,
+) -> Dict[str, Any]:
+    """concurrency adet kapalı döngü istemciyle warmup + duration boyunca yük verir"""
+    latencies: List[float] = []
+    ttfbs: List[float] = []
+    errors = 0
+    rejected = 0
+    counter = 0
+    loop = asyncio.get_running_loop()
+    measure_from = loop.time() + warmup
+    deadline = measure_from + duration
+
+    def next_body() -> bytes:
+        nonlocal counter
+        counter += 1
+        # Benzersiz metinler cache / singleflight'ı atlatır
+        text = SAMPLE_TEXT if repeat_texts else f"{SAMPLE_TEXT} ({counter})"
+        return json.dumps({"user_text": text, "ielts_level": level}).encode()
+
+    async def worker() -> None:
+        nonlocal errors, rejected
+        while loop.time() < deadline:
+            body = next_body()
+            started = loop.time()
+            retry_after = 0.0
+            try:
+                status, ttfb, payload, headers = await client.post(path, body)
+                ok = status == 200 and (path != "/rewrite/stream" or b"event: result" in payload)
+                if status == 429:
+                    retry_after = float(headers.get("retry-after", 1))
+            except Exception:
+                status, ok, ttfb = 0, False, 0.0
+            finished = loop.time()
+
+            if started >= measure_from:
+                if ok:
+                    latencies.append(finished - started)
+                    ttfbs.append(ttfb)
+                elif status == 429:
+                    rejected += 1
+                else:
+                    errors += 1
+
+            # Gerçek istemciler gibi Retry-After'a uy (reddedilen istemci döngüyü meşgul etmesin)
+            if retry_after:
+                await asyncio.sleep(min(retry_after, max(0.0, deadline - loop.time())))
+
+    lag_samples: List[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.ensure_future(monitor_loop_lag(lag_samples, stop)) if measure_lag else None
+
+    if measure_heap:
+        tracemalloc.reset_peak()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    stop.set()
+    if monitor is not None:
+        await monitor
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rejected": rejected,
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "ttfb_p50_ms": ms(percentile(ttfbs, 0.50)),
+        "lag_p99_ms": ms(percentile(lag_samples, 0.99)) if measure_lag else None,
+        "lag_max_ms": ms(max(lag_samples)) if lag_samples else None,
+        "rss_mb": round(max_rss_mb(), 1) if resource is not None else None,
+        "heap_mb": round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1) if measure_heap else None,
+    }
+
+
+# ========================
+# Baseline
+# ========================
+
+def save_baseline(name: str, report: Dict[str, Any]) -> Path:
+    BASELINE_DIR.mkdir(exist_ok=True)
+    path = BASELINE_DIR / f"{name}.json"
+    path.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    return path
+
+
+def compare_baseline(name: str, report: Dict[str, Any], tolerance: float) -> List[str]:
+    """Baseline'a göre tolerance'tan fazla kötüleşen metrikleri döndürür"""
+    baseline = json.loads((BASELINE_DIR / f"{name}.json").read_text(encoding="utf-8"))
+
+    for key in ("path", "latency_ms", "jitter_ms", "max_concurrency"):
+        if baseline["config"].get(key) != report["config"].get(key):
+            print(f"UYARI: baseline '{key}' farklı: {baseline['config'].get(key)} != {report['config'].get(key)}")
+
+    previous = {row["concurrency"]: row for row in baseline["levels"]}
+    regressions = []
+    for row in report["levels"]:
+        old = previous.get(row["concurrency"])
+        if old is None:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS:
+            before, after = old.get(metric), row.get(metric)
+            if not before or after is None:
+                continue
+            if abs(after - before) < NOISE_FLOOR[metric]:
+                continue
+            change = (after - before) / before
+            worse = change > tolerance if higher_is_worse else change < -tolerance
+            if worse:
+                regressions.append(
+                    f"c={row['concurrency']} {metric}: {before} -> {after} ({change:+.0%})"
+                )
+    return regressions
+
+
+# ========================
+# Main
+# ========================
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    if args.url:
+        client = HttpClient(args.url)
+        max_concurrency = args.max_concurrency
+    else:
+        if args.tracemalloc:
+            tracemalloc.start()
+
+        configure_environment(args)
+        import logging
+        from app.main import app, gemini_service
+
+        # Uygulama her isteği INFO seviyesinde loglar; ölçümü log I/O'su domine etmesin
+        logging.disable(logging.INFO)
+        client = AsgiClient(app)
+        max_concurrency = gemini_service.max_concurrency
+
+    await client.start()
+    try:
+        rows = []
+        for concurrency in levels:
+            result = await run_level(
+                client,
+                path=args.path,
+                level=args.level,
+                concurrency=concurrency,
+                duration=args.duration,
+                warmup=args.warmup,
+                repeat_texts=args.repeat_texts,
+                measure_lag=args.url is None,
+                measure_heap=args.tracemalloc and args.url is None,
+            )
+            rows.append(result)
+            print(
+                f"c={concurrency:<5} {result['rps']:>8} req/s  p95 {result['p95_ms']} ms  "
+                f"errors {result['errors']}  rejected {result['rejected']}",
+                file=sys.stderr,
+            )
+    finally:
+        await client.close()
+
+    return {
+        "config": {
+            "target": args.url or "in-process",
+            "path": args.path,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "failure_rate": args.failure_rate,
+            "max_concurrency": max_concurrency,
+            "duration": args.duration,
+            "cache": args.cache,
+            "repeat_texts": args.repeat_texts,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "levels": rows,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+
+    columns = ["concurrency", "requests", "errors", "rejected", "rps", "p50_ms", "p95_ms", "p99_ms",
+               "ttfb_p50_ms", "lag_p99_ms", "rss_mb", "heap_mb"]
+    config = report["config"]
+    print(
+        f"\n{config['target']} {config['path']}  fake latency {config['latency_ms']}±{config['jitter_ms']} ms  "
+        f"max concurrency {config['max_concurrency']}  {config['duration']}s/level\n"
+    )
+    print_table(columns, [[row[c] if row[c] is not None else "-" for c in columns] for row in report["levels"]])
+
+    if args.save:
+        print(f"\nBaseline kaydedildi: {save_baseline(args.save, report)}")
+
+    if args.compare:
+        regressions = compare_baseline(args.compare, report, args.tolerance)
+        if regressions:
+            print(f"\nBaseline '{args.compare}' ile karşılaştırmada regresyon (tolerans {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nBaseline '{args.compare}' ile karşılaştırma: regresyon yok (tolerans {args.tolerance:.0%})")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+
+from app.services.idempotency import (
+    IdempotencyConflict,
+    IdempotencyInProgress,
+    IdempotencyManager,
+    IdempotencyStore,
+    StoredResponse,
+)
+
+OK = StoredResponse(200, b'{"ok": true}')
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "idempotency.sqlite3")
+
+
+def make_store(path, lease_seconds=30.0):
+    return IdempotencyStore(path, ttl_seconds=60.0, lease_seconds=lease_seconds)
+
+
+def make_manager(path, wait_timeout=5.0, lease_seconds=30.0):
+    return IdempotencyManager(make_store(path, lease_seconds), wait_timeout=wait_timeout, poll_interval=0.01)
+
+
+class Work:
+    """Çağrı sayısını tutan, isteğe bağlı gecikmeli iş"""
+
+    def __init__(self, response=OK, delay=0.0):
+        self.response = response
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.response
+
+
+def test_concurrent_claims_in_one_process_run_once(db_path):
+    manager = make_manager(db_path)
+    work = Work(delay=0.1)
+
+    async def run():
+        return await asyncio.gather(*(manager.execute("k", "fp", work) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert work.calls == 1
+    assert all(response == OK for response, _ in results)
+    assert sorted(replayed for _, replayed in results) == [False, True, True, True, True]
+
+
+def test_concurrent_claims_across_workers_run_once(db_path):
+    # Aynı dosyayı paylaşan iki worker: bekleyen taraf SQLite'ı poll eder
+    first, second = make_manager(db_path), make_manager(db_path)
+    work = Work(delay=0.1)
+
+    async def run():
+        return await asyncio.gather(first.execute("k", "fp", work), second.execute("k", "fp", work))
+
+    results = asyncio.run(run())
+    assert work.calls == 1
+    assert [response for response, _ in results] == [OK, OK]
+
+
+def test_completed_response_is_replayed(db_path):
+    manager = make_manager(db_path)
+    work = Work()
+    asyncio.run(manager.execute("k", "fp", work))
+
+    response, replayed = asyncio.run(manager.execute("k", "fp", work))
+    assert (response, replayed) == (OK, True)
+    assert work.calls == 1
+
+
+def test_different_body_under_same_key_is_rejected(db_path):
+    manager = make_manager(db_path)
+    asyncio.run(manager.execute("k", "fp-1", Work()))
+
+    with pytest.raises(IdempotencyConflict):
+        asyncio.run(manager.execute("k", "fp-2", Work()))
+
+
+def test_different_body_while_pending_is_rejected(db_path):
+    store = make_store(db_path)
+    assert store.claim("k", "fp-1", "a") == ("owner", None)
+
+    with pytest.raises(IdempotencyConflict):
+        store.claim("k", "fp-2", "b")
+
+
+@pytest.mark.parametrize("status_code", [400, 422, 500, 503])
+def test_only_2xx_responses_are_replayed(db_path, status_code):
+    manager = make_manager(db_path)
+    work = Work(StoredResponse(status_code, b"{}"))
+
+    asyncio.run(manager.execute("k", "fp", work))
+    response, replayed = asyncio.run(manager.execute("k", "fp", work))
+
+    assert work.calls == 2
+    assert response.status_code == status_code
+    assert replayed is False
+
+
+def test_failed_work_releases_the_key(db_path):
+    manager = make_manager(db_path)
+
+    async def failing():
+        raise RuntimeError("backend down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(manager.execute("k", "fp", failing))
+
+    work = Work()
+    assert asyncio.run(manager.execute("k", "fp", work)) == (OK, False)
+    assert work.calls == 1
+
+
+def test_stale_owner_cannot_write(db_path):
+    store = make_store(db_path, lease_seconds=0.0)
+    assert store.claim("k", "fp", "stale") == ("owner", None)
+    # Lease doldu: başka bir istek key'i yeniden sahiplenir
+    assert store.claim("k", "fp", "current") == ("owner", None)
+
+    assert store.complete("k", "stale", StoredResponse(200, b"stale")) is False
+    store.release("k", "stale")
+
+    assert store.complete("k", "current", OK) is True
+    assert store.claim("k", "fp", "other") == ("done", OK)
+
+
+def test_result_is_not_stored_after_lease_is_lost(db_path):
+    manager = make_manager(db_path, lease_seconds=0.05)
+    other = make_store(db_path, lease_seconds=30.0)
+
+    async def slow_work():
+        await asyncio.sleep(0.1)
+        # İş sürerken lease doldu ve başka bir worker key'i aldı
+        assert other.claim("k", "fp", "other") == ("owner", None)
+        return StoredResponse(200, b"late")
+
+    response, replayed = asyncio.run(manager.execute("k", "fp", slow_work))
+    assert (response.body, replayed) == (b"late", False)
+    assert other.claim("k", "fp", "third") == ("pending", None)
+
+
+def test_wait_timeout_raises_in_progress(db_path):
+    store = make_store(db_path)
+    assert store.claim("k", "fp", "elsewhere") == ("owner", None)
+    manager = IdempotencyManager(make_store(db_path), wait_timeout=0.1, poll_interval=0.01)
+    work = Work()
+
+    with pytest.raises(IdempotencyInProgress) as error:
+        asyncio.run(manager.execute("k", "fp", work))
+    assert error.value.retry_after == 1
+    assert work.calls == 0
@@ -0,0 +1,197 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.models import RewriteResponse
+from app.services.admission import AdmissionRejected
+from app.services.job_queue import JobRunner, JobStore
+from app.services.llm_backends import FakeBackend
+
+MAX_QUEUED = 100
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def make_store(path, lease_seconds=30.0):
+    return JobStore(path, lease_seconds=lease_seconds, result_ttl_seconds=60.0)
+
+
+def response(user_text, ielts_level):
+    output = FakeBackend.fake_output(user_text, ielts_level)
+    return RewriteResponse(**output, original_text=user_text, ielts_level=ielts_level)
+
+
+class Process:
+    """JobRunner'a verilen rewrite fonksiyonu; sırayla verilen sonuçları / hataları döndürür"""
+
+    def __init__(self, *outcomes, delay=0.0):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = False
+
+    async def __call__(self, user_text, ielts_level, caller):
+        self.calls += 1
+        outcome = self.outcomes[min(self.calls, len(self.outcomes)) - 1] if self.outcomes else None
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return response(user_text, ielts_level)
+
+
+async def run_job(store, process, max_attempts=3, wait=5.0, before_start=None):
+    """Bir iş ekler, runner'ı çalıştırır ve iş bitene (veya wait dolana) kadar bekler"""
+    runner = JobRunner(
+        store, process, concurrency=1, max_queued=MAX_QUEUED, max_attempts=max_attempts, poll_interval=0.01
+    )
+    job_id = await runner.submit("I go to school yesterday.", 7, user_id="u1")
+    if before_start is not None:
+        before_start(job_id)
+    runner.start()
+    try:
+        return await runner.get(job_id, wait=wait)
+    finally:
+        await runner.stop()
+
+
+def test_job_completes(db_path):
+    process = Process()
+    job = asyncio.run(run_job(make_store(db_path), process))
+
+    assert job["state"] == "done"
+    assert job["status_code"] == 200
+    assert job["attempts"] == 1
+    assert RewriteResponse.model_validate_json(job["result"]).ielts_level == 7
+
+
+def test_crashed_workers_job_is_recovered_after_lease_expiry(db_path):
+    store = make_store(db_path, lease_seconds=0.05)
+    process = Process()
+
+    def crash(job_id):
+        # Başka bir worker işi aldı ve sonucu yazmadan öldü
+        assert store.claim_next("crashed-worker", max_attempts=3)[0] == job_id
+
+    job = asyncio.run(run_job(store, process, before_start=crash))
+
+    assert job["state"] == "done"
+    assert job["attempts"] == 2
+    assert process.calls == 1
+
+
+def test_job_crashing_every_worker_fails_after_max_attempts(db_path):
+    store = make_store(db_path, lease_seconds=0.0)
+    job_id = store.enqueue("text", 7, MAX_QUEUED)
+
+    assert store.claim_next("first", max_attempts=2)[0] == job_id
+    assert store.claim_next("second", max_attempts=2)[0] == job_id
+    assert store.claim_next("third", max_attempts=2) is None
+
+    job = store.get(job_id)
+    assert job["state"] == "failed"
+    assert job["status_code"] == 500
+    assert job["attempts"] == 2
+
+
+def test_transient_errors_are_retried_until_max_attempts(db_path):
+    busy = AdmissionRejected("busy", retry_after=0)
+    process = Process(busy, busy, busy)
+    job = asyncio.run(run_job(make_store(db_path), process, max_attempts=3))
+
+    assert job["state"] == "failed"
+    assert job["status_code"] == 429
+    assert job["attempts"] == 3
+    assert process.calls == 3
+
+
+def test_transient_error_then_success(db_path):
+    process = Process(AdmissionRejected("busy", retry_after=0), None)
+    job = asyncio.run(run_job(make_store(db_path), process))
+
+    assert job["state"] == "done"
+    assert job["attempts"] == 2
+
+
+def test_permanent_error_is_not_retried(db_path):
+    process = Process(ValueError("AI yanıtı beklenen formatta değil"))
+    job = asyncio.run(run_job(make_store(db_path), process))
+
+    assert job["state"] == "failed"
+    assert job["status_code"] == 422
+    assert process.calls == 1
+
+
+def test_result_is_discarded_after_lease_is_lost(db_path, monkeypatch):
+    store = make_store(db_path, lease_seconds=0.05)
+    thief = make_store(db_path, lease_seconds=30.0)
+
+    def renew(job_id, owner):
+        raise sqlite3.OperationalError("database is locked")
+
+    # Lease uzatılamıyor (örn. disk hatası); iş sürerken başka worker işi alır
+    monkeypatch.setattr(store, "renew", renew)
+
+    class Stolen(Process):
+        async def __call__(self, user_text, ielts_level, caller):
+            await asyncio.sleep(0.1)
+            assert thief.claim_next("thief", max_attempts=3) is not None
+            return await super().__call__(user_text, ielts_level, caller)
+
+    job = asyncio.run(run_job(store, Stolen(), wait=0.5))
+
+    assert job["state"] == "running"
+    assert job["result"] is None
+    assert job["attempts"] == 2
+
+
+def test_work_is_cancelled_when_heartbeat_sees_lost_lease(db_path, monkeypatch):
+    store = make_store(db_path, lease_seconds=0.05)
+    monkeypatch.setattr(store, "renew", lambda job_id, owner: False)
+    process = Process(delay=5.0)
+
+    job = asyncio.run(run_job(store, process, wait=0.3))
+
+    assert process.cancelled
+    # Lease'i kaybeden worker sonuç yazmaz (iş dolan lease'le tekrar alınır)
+    assert job["state"] != "done"
+    assert job["result"] is None
+
+
+def test_release_owned_requeues_only_the_owners_jobs(db_path):
+    store = make_store(db_path)
+    mine = store.enqueue("mine", 7, MAX_QUEUED, user_id="a")
+    other = store.enqueue("other", 7, MAX_QUEUED, user_id="b")
+    assert store.claim_next("me", max_attempts=3)[0] == mine
+    assert store.claim_next("someone-else", max_attempts=3)[0] == other
+
+    assert store.release_owned("me") == 1
+
+    released = store.get(mine)
+    assert released["state"] == "queued"
+    # Düzgün kapanışta geri bırakılan iş deneme sayılmaz
+    assert released["attempts"] == 0
+    assert store.get(other)["state"] == "running"
+
+
+def test_only_lease_owner_can_finish_or_requeue(db_path):
+    store = make_store(db_path)
+    job_id = store.enqueue("text", 7, MAX_QUEUED)
+    store.claim_next("owner", max_attempts=3)
+
+    assert store.finish(job_id, "intruder", 200, "{}", None) is False
+    assert store.retry_later(job_id, "intruder", 0) is False
+    assert store.get(job_id)["state"] == "running"
+
+    assert store.finish(job_id, "owner", 200, "{}", None) is True
+    assert store.get(job_id)["state"] == "done"
+    # Bitmiş iş tekrar yazılmaz
+    assert store.finish(job_id, "owner", 500, None, "late") is False
+    assert store.retry_later(job_id, "owner", 0) is False
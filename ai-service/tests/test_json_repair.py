@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from app.services.json_repair import parse_with_repair, repair_json_text
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"a": 1,}', {"a": 1}),
+        ('{"a": [1, 2,]}', {"a": [1, 2]}),
+        ('{"a": [1, 2, ], "b": {"c": true,},}', {"a": [1, 2], "b": {"c": True}}),
+    ],
+)
+def test_trailing_commas_are_removed(text, expected):
+    repaired, truncated = repair_json_text(text)
+    assert json.loads(repaired) == expected
+    assert truncated is False
+
+
+def test_unclosed_string_value_is_dropped_with_its_member():
+    # Yarım string tam bir metin gibi görünür; üye tamamen atılır
+    repaired, truncated = repair_json_text('{"a": "done", "rewritten_text": "The cat sat on')
+    assert json.loads(repaired) == {"a": "done"}
+    assert truncated is True
+
+
+def test_unclosed_key_is_dropped():
+    repaired, truncated = repair_json_text('{"a": 1, "ove')
+    assert json.loads(repaired) == {"a": 1}
+    assert truncated is True
+
+
+def test_member_without_value_is_dropped():
+    repaired, _ = repair_json_text('{"a": 1, "b": ')
+    assert json.loads(repaired) == {"a": 1}
+
+
+def test_unclosed_array_keeps_complete_elements():
+    repaired, truncated = repair_json_text('{"a": ["x", "y"')
+    assert json.loads(repaired) == {"a": ["x", "y"]}
+    assert truncated is True
+
+
+def test_unclosed_array_drops_truncated_last_string():
+    repaired, _ = repair_json_text('{"tips": ["one", "two", "thr')
+    assert json.loads(repaired) == {"tips": ["one", "two"]}
+
+
+def test_unclosed_array_drops_truncated_last_object():
+    repaired, _ = repair_json_text('{"words": [{"w": "a", "m": "b"}, {"w": "c", "m": "d')
+    assert json.loads(repaired) == {"words": [{"w": "a", "m": "b"}]}
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        # "12" aslında "123"ün kesilmiş hali olabilir
+        ('{"a": 12', {}),
+        ('{"a": [1, 2', {"a": [1]}),
+        ('{"a": 1, "b": tr', {"a": 1}),
+        ('{"a": 1, "b": nul', {"a": 1}),
+    ],
+)
+def test_truncated_last_value_is_dropped(text, expected):
+    repaired, truncated = repair_json_text(text)
+    assert json.loads(repaired) == expected
+    assert truncated is True
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"a": 12 ', {"a": 12}),
+        ('{"a": true', {"a": True}),
+        ('{"a": null', {"a": None}),
+    ],
+)
+def test_complete_last_primitive_is_kept(text, expected):
+    repaired, _ = repair_json_text(text)
+    assert json.loads(repaired) == expected
+
+
+def test_nested_objects_are_closed():
+    repaired, truncated = repair_json_text('{"a": {"b": [1, 2 ], "c": "x"')
+    assert json.loads(repaired) == {"a": {"b": [1, 2], "c": "x"}}
+    assert truncated is True
+
+
+def test_text_without_object_returns_none():
+    assert repair_json_text("no json here") == (None, False)
+
+
+def test_parse_with_repair_reports_result():
+    assert parse_with_repair('{"a": 1}') == ({"a": 1}, "clean")
+    assert parse_with_repair('```json\n{"a": 1,}\n```') == ({"a": 1}, "repaired")
+    assert parse_with_repair('{"a": 1, "b": "cut') == ({"a": 1}, "truncated")
+
+
+def test_parse_with_repair_raises_when_unrepairable():
+    with pytest.raises(ValueError):
+        parse_with_repair("not json at all")
@@ -0,0 +1,63 @@
+import pytest
+
+from app.services.output_schema import multi_level_output_schema, rewrite_output_schema
+
+# Gemini response_schema'nın kabul ettiği anahtarlar
+ALLOWED_KEYS = {"type", "format", "description", "nullable", "enum", "items", "properties", "required"}
+
+
+def _nodes(schema):
+    """Şemadaki tüm tip düğümleri (properties altındaki alan adları düğüm değildir)"""
+    yield schema
+    if "items" in schema:
+        yield from _nodes(schema["items"])
+    for value in schema.get("properties", {}).values():
+        yield from _nodes(value)
+
+
+@pytest.fixture(params=[rewrite_output_schema, multi_level_output_schema], ids=["rewrite", "multi_level"])
+def schema(request):
+    return request.param()
+
+
+def test_schema_has_no_refs(schema):
+    for node in _nodes(schema):
+        assert "$ref" not in node
+        assert "$defs" not in node
+        assert "anyOf" not in node
+
+
+def test_schema_uses_only_allowed_keys(schema):
+    for node in _nodes(schema):
+        assert set(node) <= ALLOWED_KEYS, set(node) - ALLOWED_KEYS
+
+
+def test_required_fields_exist(schema):
+    for node in _nodes(schema):
+        assert set(node.get("required", [])) <= set(node.get("properties", {}))
+
+
+def test_rewrite_schema_excludes_request_and_local_fields():
+    properties = rewrite_output_schema()["properties"]
+    for field in ("original_text", "ielts_level", "lexical_stats", "alignment", "truncated"):
+        assert field not in properties
+    assert {"rewritten_text", "grammar_corrections", "new_words", "overall_feedback"} <= set(properties)
+
+
+def test_grammar_correction_positions_are_excluded():
+    correction = rewrite_output_schema()["properties"]["grammar_corrections"]["items"]
+    assert "start" not in correction["properties"]
+    assert "end" not in correction["properties"]
+
+
+def test_array_fields_are_required():
+    schema = rewrite_output_schema()
+    arrays = [key for key, value in schema["properties"].items() if value.get("type") == "array"]
+    assert arrays
+    assert set(arrays) <= set(schema["required"])
+
+
+def test_schema_is_a_fresh_copy():
+    schema = rewrite_output_schema()
+    schema["properties"].clear()
+    assert rewrite_output_schema()["properties"]
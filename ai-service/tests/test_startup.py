@@ -0,0 +1,14 @@
+import statistics
+
+from benchmarks.bench_startup import DEFAULT_BUDGET_MS, measure_once
+
+RUNS = 3
+
+
+def test_import_is_lazy_and_within_budget():
+    # Her ölçüm yeni bir process'te; medyan tek seferlik disk / CPU gürültüsünü eler
+    runs = [measure_once() for _ in range(RUNS)]
+
+    assert all(run["lazy"] for run in runs), "google.generativeai app.main import'unda yükleniyor"
+    health = statistics.median(run["health_ms"] for run in runs)
+    assert health <= DEFAULT_BUDGET_MS, f"ilk /health {health:.0f} ms > bütçe {DEFAULT_BUDGET_MS} ms"
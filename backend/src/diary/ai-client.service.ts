@@ -13,6 +13,8 @@ export interface AIRewriteResponse {
     original: string;
     corrected: string;
     explanation: string;
+    start?: number | null;
+    end?: number | null;
   }>;
   writing_tips: string[];
   strengths: string[];
@@ -23,22 +25,35 @@ export interface AIRewriteResponse {
     turkish_meaning: string;
   }>;
   ielts_level: number;
+  truncated?: boolean;
 }
 
 @Injectable()
 export class AiClientService {
   private readonly logger = new Logger(AiClientService.name);
   private readonly aiServiceUrl: string;
+  private readonly timeoutMs: number;
 
   constructor(private configService: ConfigService) {
     // AI Service URL'i environment'tan al
     this.aiServiceUrl = this.configService.get<string>('AI_SERVICE_URL') || 'http://localhost:8001';
+    // AI servisi yavaşladığında isteklerin sonsuza kadar beklememesi için
+    this.timeoutMs = Number(this.configService.get<string>('AI_SERVICE_TIMEOUT_MS')) || 60000;
   }
 
   /**
    * FastAPI servisine istek gönderir
+   *
+   * idempotencyKey verilirse aynı key'le tekrar gönderilen istek (ör. timeout sonrası)
+   * AI servisinde yeniden üretilmez, ilk isteğin sonucu döner.
+   * userId verilirse AI servisi Gemini kapasitesini kullanıcılar arasında adil paylaştırır.
    */
-  async rewriteText(userText: string, ieltsLevel: number): Promise<AIRewriteResponse> {
+  async rewriteText(
+    userText: string,
+    ieltsLevel: number,
+    idempotencyKey?: string,
+    userId?: string,
+  ): Promise<AIRewriteResponse> {
 
     try {
         
@@ -48,13 +63,36 @@ export class AiClientService {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                ...(idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}),
+                ...(userId ? { 'X-User-Id': userId } : {}),
             },
             body: JSON.stringify({
                 user_text: userText,
                 ielts_level: ieltsLevel,
             }),
+            signal: AbortSignal.timeout(this.timeoutMs),
         });
 
+        if (response.status === 429) {
+            // AI servisi aşırı yüklü: kuyruğa girmeden reddetti
+            const retryAfter = response.headers.get('Retry-After') ?? '1';
+            this.logger.warn(`AI service overloaded, retry after ${retryAfter}s`);
+            throw new HttpException(
+                `AI servisi şu an yoğun, lütfen ${retryAfter} saniye sonra tekrar deneyin`,
+                HttpStatus.TOO_MANY_REQUESTS,
+            );
+        }
+
+        if (response.status === 409) {
+            // Aynı key'li ilk istek AI servisinde hâlâ işleniyor
+            const retryAfter = response.headers.get('Retry-After') ?? '1';
+            this.logger.warn(`AI request still in progress, retry after ${retryAfter}s`);
+            throw new HttpException(
+                `Metniniz hâlâ işleniyor, lütfen ${retryAfter} saniye sonra tekrar deneyin`,
+                HttpStatus.CONFLICT,
+            );
+        }
+
         if (!response.ok) {
             // HTTP hatası
             const error = await response.text();
@@ -77,6 +115,13 @@ export class AiClientService {
             throw error;
         }
 
+        if (error instanceof Error && error.name === 'TimeoutError') {
+            throw new HttpException(
+                'AI servisi zamanında yanıt vermedi',
+                HttpStatus.GATEWAY_TIMEOUT,
+            );
+        }
+
         throw new HttpException(
             'AI servisiyle iletişim hatası',
             HttpStatus.INTERNAL_SERVER_ERROR,
@@ -1,4 +1,5 @@
 import { Injectable, NotFoundException, ConflictException, ForbiddenException } from '@nestjs/common';
+import { createHash } from 'crypto';
 import { PrismaService } from '../prisma/prisma.service';
 import { AiClientService } from './ai-client.service';
 import { CreateDiaryDto } from './dto/create-diary.dto';
@@ -34,9 +35,15 @@ export class DiaryService {
     }
 
     // 2. AI servisine gönder
+    // Aynı gün aynı metin tekrar gönderilirse (ör. timeout sonrası) AI servisi ilk sonucu döndürür
+    const idempotencyKey = createHash('sha256')
+      .update(`${userId}:${today.toISOString()}:${dto.ieltsLevel}:${dto.originalText}`)
+      .digest('hex');
     const aiResponse = await this.aiClient.rewriteText(
       dto.originalText,
       dto.ieltsLevel,
+      `diary-${idempotencyKey}`,
+      userId,
     );
 
     // 3. Database'e kaydet
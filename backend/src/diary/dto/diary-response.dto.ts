@@ -7,6 +7,8 @@ export class GrammarCorrectionDto {
   original: string;
   corrected: string;
   explanation: string;
+  start?: number | null;
+  end?: number | null;
 }
 
 export class DiaryResponseDto {
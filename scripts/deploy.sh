@@ -17,7 +17,7 @@ DEPLOY_BRANCH="${DEPLOY_BRANCH:-main}"
 BASE_URL="${BASE_URL:-https://lettertostars.mustafaerhanportakal.com}"
 FRONTEND_HEALTH_URL="${FRONTEND_HEALTH_URL:-$BASE_URL/}"
 BACKEND_HEALTH_URL="${BACKEND_HEALTH_URL:-$BASE_URL/api/health}"
-AI_HEALTH_URL="${AI_HEALTH_URL:-$BASE_URL/ai/health}"
+AI_HEALTH_URL="${AI_HEALTH_URL:-$BASE_URL/ai/ready}"
 
 HEALTH_RETRIES="${HEALTH_RETRIES:-10}"
 HEALTH_SLEEP_SECONDS="${HEALTH_SLEEP_SECONDS:-2}"